@@ -0,0 +1,86 @@
+"""Benchmark the diff engine against the difflib based one it replaced.
+
+Takes the lines of some text files (the README by default) and diffs them the way the string tanks do: against themselves (e.g. LowerCase on text that is already lower case), against their lower cased version, against a tokenized version with a space around every punctuation mark, and against a shuffled version of their words (a worst case). Reports the time per string for both engines, and checks that the new diffs reconstruct the target and are never longer than the old ones.
+
+Usage: python benchmarks/diff.py [text_file ...]
+"""
+import wtrwrks.string_manipulations.diff as di
+import difflib
+import json
+import os
+import random
+import re
+import sys
+import time
+
+
+def difflib_diff_string(source_string, target_string):
+  """The difflib based get_diff_string the new engine replaced."""
+  source_string = list(source_string)
+  target_string = list(target_string)
+  matcher = difflib.SequenceMatcher(None, source_string, target_string)
+
+  tag_map = {'delete': 'd', 'insert': 'i', 'replace': 'i'}
+  diff_string = []
+  for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    if tag == 'equal':
+      continue
+    substring = ''
+    if tag in ('insert', 'replace'):
+      substring = ''.join(target_string[j1:j2])
+    diff_string.append((tag_map[tag], i1, i2, substring))
+  return json.dumps(diff_string)
+
+
+def diff_size(diff_string):
+  """The number of characters deleted and inserted by a diff."""
+  return sum([(i2 - i1) + len(substring) for _, i1, i2, substring in json.loads(diff_string)])
+
+
+def shuffle_words(line):
+  words = line.split(' ')
+  random.Random(0).shuffle(words)
+  return ' '.join(words)
+
+
+def time_engine(get_diff_string, pairs, repeats=3):
+  """Get the best time per string, in microseconds, of a few runs over all the pairs."""
+  best = None
+  for _ in xrange(repeats):
+    start = time.time()
+    diffs = [get_diff_string(source, target) for source, target in pairs]
+    elapsed = time.time() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return 1e6 * best / len(pairs), diffs
+
+
+if __name__ == '__main__':
+  file_names = sys.argv[1:] or [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'README.md')]
+  lines = []
+  for file_name in file_names:
+    with open(file_name) as text_file:
+      lines.extend([line.strip() for line in text_file if line.strip()])
+
+  cases = [
+    ('identical', lambda line: line),
+    ('lower case', lambda line: line.lower()),
+    ('tokenize', lambda line: re.sub(r'\s*([^\w\s])\s*', r' \1 ', line).strip()),
+    ('shuffled', shuffle_words),
+  ]
+
+  print '{} lines, {:.1f} characters on average'.format(len(lines), sum(map(len, lines)) / float(len(lines)))
+  print '{:>12} {:>14} {:>14} {:>9} {:>12}'.format('case', 'difflib (us)', 'myers (us)', 'speedup', 'size ratio')
+  for name, make_target in cases:
+    pairs = [(make_target(line), line) for line in lines]
+    old_time, old_diffs = time_engine(difflib_diff_string, pairs)
+    new_time, new_diffs = time_engine(di.get_diff_string, pairs)
+
+    for (source, target), diff_string in zip(pairs, new_diffs):
+      assert di.reconstruct(source, diff_string) == target
+    old_size = sum(map(diff_size, old_diffs))
+    new_size = sum(map(diff_size, new_diffs))
+    assert all([diff_size(new) <= diff_size(old) for new, old in zip(new_diffs, old_diffs)])
+
+    print '{:>12} {:>14.1f} {:>14.1f} {:>9.1f} {:>12.3f}'.format(
+      name, old_time, new_time, old_time / new_time, new_size / float(max(old_size, 1))
+    )
@@ -0,0 +1,99 @@
+"""Benchmark packing token batches with the Pack tank against the row by row implementation it replaced.
+
+Makes batches of sentences of random lengths padded out to a fixed length (i.e. token indices with a default value of 0, like StringTransform outputs), packs and unpacks them, and reports the time each takes along with the fraction of the padding that is left after packing. The old implementation is only run up to a million tokens since it's so much slower.
+
+Usage: python benchmarks/pack.py [max_num_tokens]
+"""
+import wtrwrks.tanks.pack as pk
+import numpy as np
+import sys
+import time
+
+
+def loop_pack(a, default_val):
+  """The row by row pour of the Pack tank the vectorised one replaced (without the ends)."""
+  row_dim, col_dim = a.shape[-2:]
+  is_default = a == default_val
+  all_pack_rows = []
+  for two_d_slice, cur_is_default in zip(a.reshape([-1, row_dim, col_dim]), is_default.reshape([-1, row_dim, col_dim])):
+    grouped_rows = []
+    rows = []
+    tally = 0
+    for row_num, num in enumerate(np.sum(~cur_is_default, axis=-1)):
+      if num + tally > col_dim:
+        grouped_rows.append(rows)
+        rows = []
+        tally = 0
+      rows.append(row_num)
+      tally += num
+    grouped_rows.append(rows)
+
+    pack_rows = []
+    for old_rows in grouped_rows:
+      pack_row = []
+      for old_row in old_rows:
+        pack_row.extend(two_d_slice[old_row][~cur_is_default[old_row]].tolist())
+      pack_rows.append(pack_row + [default_val] * (col_dim - len(pack_row)))
+    all_pack_rows.append(pack_rows)
+
+  max_num_rows = max([len(pack_rows) for pack_rows in all_pack_rows])
+  target = [pack_rows + [[default_val] * col_dim] * (max_num_rows - len(pack_rows)) for pack_rows in all_pack_rows]
+  return np.array(target, dtype=a.dtype).reshape(list(a.shape[:-2]) + [max_num_rows, col_dim]), is_default
+
+
+def loop_unpack(target, is_default, default_val):
+  """The element by element pump of the Pack tank the vectorised one replaced."""
+  row_dim, col_dim = target.shape[-2:]
+  a = []
+  for two_d_slice, mask in zip(target.reshape([-1, row_dim, col_dim]), is_default.reshape([-1] + list(is_default.shape[-2:]))):
+    packed = two_d_slice[two_d_slice != default_val].flatten().tolist()
+    recon = []
+    for val in mask.flatten():
+      recon.append(default_val if val else packed.pop(0))
+    a.append(np.array(recon, dtype=target.dtype).reshape(is_default.shape[-2:]))
+  return np.stack(a).reshape(is_default.shape)
+
+
+def make_batches(num_tokens, batch_size=64, max_sent_len=128):
+  """Make batches of (about num_tokens) token indices, with sentence lengths drawn from a geometric distribution and padded with zeros."""
+  random_state = np.random.RandomState(0)
+  num_sents = max(num_tokens // (batch_size * max_sent_len), 1) * batch_size
+  lens = np.minimum(random_state.geometric(1. / 30, size=num_sents), max_sent_len)
+  a = random_state.randint(1, 30000, size=[num_sents, max_sent_len])
+  a[np.arange(max_sent_len) >= lens[:, np.newaxis]] = 0
+  return a.reshape([-1, batch_size, max_sent_len])
+
+
+def best_time(func, repeats=3):
+  """Get the best time, in seconds, of a few runs of func, along with its output."""
+  best = None
+  for _ in xrange(repeats):
+    start = time.time()
+    output = func()
+    elapsed = time.time() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, output
+
+
+if __name__ == '__main__':
+  max_num_tokens = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 7
+  max_loop_tokens = 10 ** 6
+  tank = pk.Pack.__new__(pk.Pack)
+
+  print '{:>10} {:>9} {:>11} {:>11} {:>13} {:>13}'.format('tokens', 'pad left', 'pack (s)', 'unpack (s)', 'old pack (s)', 'old unpack (s)')
+  num_tokens = 10 ** 4
+  while num_tokens <= max_num_tokens:
+    a = make_batches(num_tokens)
+    pack_time, outputs = best_time(lambda: tank._pour(a, 0))
+    unpack_time, pumped = best_time(lambda: tank._pump(outputs['target'], outputs['is_default'], 0, outputs['ends']))
+    assert (pumped['a'] == a).all()
+    padding = (outputs['target'] == 0).mean() / (a == 0).mean()
+
+    old_pack_time = old_unpack_time = float('nan')
+    if a.size <= max_loop_tokens:
+      old_pack_time, (target, is_default) = best_time(lambda: loop_pack(a, 0), repeats=1)
+      assert (target == outputs['target']).all()
+      old_unpack_time, _ = best_time(lambda: loop_unpack(target, is_default, 0), repeats=1)
+
+    print '{:>10} {:>9.3f} {:>11.4f} {:>11.4f} {:>13.4f} {:>13.4f}'.format(a.size, padding, pack_time, unpack_time, old_pack_time, old_unpack_time)
+    num_tokens *= 10
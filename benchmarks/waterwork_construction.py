@@ -0,0 +1,54 @@
+"""Benchmark the time and memory it takes to build large waterworks.
+
+Builds waterworks made of many independent chains of Add/Mul tanks (like a wide table with a small transform per column) and reports the build time, the time it takes to compile the plan and the increase in the peak memory of the process. Each size is run in a separate process so the memory numbers don't interfere with each other.
+
+Usage: python benchmarks/waterwork_construction.py [num_tanks ...]
+"""
+import wtrwrks.waterworks.waterwork as wa
+from wtrwrks.waterworks.empty import empty
+import multiprocessing
+import resource
+import sys
+import time
+
+
+def build(num_tanks, chain_len=4):
+  """Build a waterwork with num_tanks tanks, split into chains of length chain_len."""
+  with wa.Waterwork(eager=False) as ww:
+    for _ in xrange(num_tanks / chain_len):
+      tubes, _ = empty + 1.0
+      for _ in xrange(chain_len - 1):
+        tubes, _ = tubes['target'] * 2.0
+  return ww
+
+
+def run(num_tanks, queue):
+  """Build the waterwork and put the timings and memory usage on the queue."""
+  start_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+  start = time.time()
+  ww = build(num_tanks)
+  build_time = time.time() - start
+
+  start = time.time()
+  ww._get_plan()
+  plan_time = time.time() - start
+
+  end_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  queue.put((len(ww.tanks), build_time, plan_time, (end_mem - start_mem) / 1024.))
+
+
+if __name__ == '__main__':
+  sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+
+  print '{:>8} {:>10} {:>10} {:>10} {:>12}'.format('tanks', 'build (s)', 'plan (s)', 'mem (MB)', 'us / tank')
+  for size in sizes:
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(size, queue))
+    process.start()
+    num_tanks, build_time, plan_time, mem = queue.get()
+    process.join()
+
+    print '{:>8} {:>10.2f} {:>10.2f} {:>10.1f} {:>12.1f}'.format(
+      num_tanks, build_time, plan_time, mem, 1e6 * build_time / num_tanks
+    )
@@ -1,11 +1,14 @@
 """Functions which deal with differences between strings."""
 import difflib
 import json
+import numpy as np
 
 
 def get_diff_string(source_string, target_string):
   """Generate a string which can be used to transform one string into another.
 
+  Identical strings get an empty diff without looking at the characters again. Otherwise the common prefix and suffix are trimmed off and the shortest edit script between what's left is found with Myers' O(ND) algorithm, so the time grows with the length of the strings times the number of differences between them, rather than with the square of their lengths. Strings with too many differences for that to pay off are matched up with difflib instead.
+
   Parameters
   ----------
   source_string : str
@@ -19,36 +22,119 @@ def get_diff_string(source_string, target_string):
     A string that describes a sequence of operations on source_string to produce target_string.
 
   """
-  # Split up the strings into lists.
-  source_string = list(source_string)
-  target_string = list(target_string)
-
-  # Use a sequence matcher to identify all the common substrings of
-  # source_string an target_string.
-  matcher = difflib.SequenceMatcher(None, source_string, target_string)
-
-  tag_map = {
-    'delete': 'd',
-    'insert': 'i',
-    'replace': 'i'
-  }
-
-  # Get out the operation codes which list out all the operations that need to
-  # occur in order to transform source_string into target_string. 
-  diff_string = []
-  for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-    if tag == 'equal':
-      continue
+  if source_string == target_string:
+    return '[]'
 
-    substring = ''
-    if tag in ('insert', 'replace'):
-      substring = ''.join(target_string[j1:j2])
+  # Trim off the common prefix and suffix.
+  start = 0
+  end = min(len(source_string), len(target_string))
+  while start < end and source_string[start] == target_string[start]:
+    start += 1
+  source_end = len(source_string)
+  target_end = len(target_string)
+  while source_end > start and target_end > start and source_string[source_end - 1] == target_string[target_end - 1]:
+    source_end -= 1
+    target_end -= 1
 
-    diff_string.append((tag_map[tag], i1, i2, substring))
+  source_middle = source_string[start: source_end]
+  target_middle = target_string[start: target_end]
+  blocks = _matching_blocks(source_middle, target_middle)
+  if blocks is None:
+    # Strings this far apart are quicker to match up with difflib.
+    matcher = difflib.SequenceMatcher(None, list(source_middle), list(target_middle))
+    blocks = [tuple(block) for block in matcher.get_matching_blocks()[:-1]]
+
+  # Turn the gaps between the matching blocks into operations. A gap in the
+  # target is a deletion, anything else replaces that part of the source with
+  # that part of the target.
+  diff_string = []
+  i, j = 0, 0
+  for block_i, block_j, size in blocks + [(len(source_middle), len(target_middle), 0)]:
+    if block_j > j:
+      diff_string.append(('i', start + i, start + block_i, target_middle[j: block_j]))
+    elif block_i > i:
+      diff_string.append(('d', start + i, start + block_i, ''))
+    i, j = block_i + size, block_j + size
 
   return json.dumps(diff_string)
 
 
+def _matching_blocks(source_string, target_string, max_edits=32):
+  """Find the characters the two strings have in common using Myers' shortest edit script algorithm.
+
+  Parameters
+  ----------
+  source_string : str
+    The string being transformed.
+  target_string : str
+    The string it is transformed into.
+  max_edits : int
+    The number of single character insertions and deletions to search up to.
+
+  Returns
+  -------
+  list of 3-tuples or None
+    The (source index, target index, size) of each block of characters the strings have in common, in order. None if the strings are more than max_edits apart.
+
+  """
+  n, m = len(source_string), len(target_string)
+  max_d = min(n + m, max_edits)
+
+  # v[k] is the furthest index into the source reached on diagonal k (i.e.
+  # where the source index minus the target index is k), stored with an offset
+  # so negative diagonals fit in a list. The part of v each round used is kept
+  # to trace back the path.
+  offset = max_d + 1
+  v = [0] * (2 * max_d + 3)
+  trace = []
+  for d in xrange(max_d + 1):
+    for k in xrange(-d, d + 1, 2):
+      if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+        x = v[offset + k + 1]
+      else:
+        x = v[offset + k - 1] + 1
+      y = x - k
+      while x < n and y < m and source_string[x] == target_string[y]:
+        x += 1
+        y += 1
+      v[offset + k] = x
+      if x >= n and y >= m:
+        trace.append(v[offset - d: offset + d + 1])
+        return _trace_back(trace, n, m)
+    trace.append(v[offset - d: offset + d + 1])
+
+  return None
+
+
+def _trace_back(trace, n, m):
+  """Follow the furthest reaching paths found by _matching_blocks back from the end of both strings to get the diagonal runs along the way, which are the blocks of matching characters."""
+  blocks = []
+  x, y = n, m
+  for d in xrange(len(trace) - 1, 0, -1):
+    prev_v = trace[d - 1]
+    k = x - y
+
+    # prev_v only covers the diagonals -(d - 1) to d - 1.
+    if k == -d or (k != d and prev_v[k - 1 + d - 1] < prev_v[k + 1 + d - 1]):
+      prev_k = k + 1
+    else:
+      prev_k = k - 1
+    prev_x = prev_v[prev_k + d - 1]
+    prev_y = prev_x - prev_k
+
+    # Where the path got to after the insertion or deletion, before the run of
+    # matching characters.
+    mid_x = prev_x if prev_k == k + 1 else prev_x + 1
+    if x > mid_x:
+      blocks.append((mid_x, mid_x - k, x - mid_x))
+    x, y = prev_x, prev_y
+
+  if x > 0:
+    blocks.append((0, 0, x))
+  blocks.reverse()
+  return blocks
+
+
 def reconstruct(source_string, diff_string):
   """Generate a string which can be used to transform one string into another.
 
@@ -73,3 +159,102 @@ def reconstruct(source_string, diff_string):
       target_string[i1:i2] = substring
 
   return ''.join(target_string)
+
+
+def encode_diffs(diff_strings):
+  """Pack an array of diff strings into a single compact binary string. Only the diffs that change anything are stored, each as its position in the flattened array followed by its operations, with all the numbers written as varints. The identical strings' diffs are left implicit.
+
+  Parameters
+  ----------
+  diff_strings : np.ndarray of strs
+    The diff strings created by get_diff_string.
+
+  Returns
+  -------
+  str
+    The encoded diffs, which are an empty string if none of them change anything.
+
+  """
+  encoded = []
+  prev_index = -1
+  for index, diff_string in enumerate(np.asarray(diff_strings).flatten().tolist()):
+    if diff_string in ('[]', ''):
+      continue
+    ops = json.loads(diff_string)
+
+    # Each number is stored relative to the previous one so they stay small.
+    encoded.append(_varint(index - prev_index - 1) + _varint(len(ops)))
+    prev_index = index
+    end = 0
+    for tag, i1, i2, substring in ops:
+      if i1 < end or i2 < i1:
+        raise ValueError("The operations of a diff string must be in order and not overlap. Got " + diff_string)
+      substring = substring.encode('utf-8')
+      encoded.append(_varint(i1 - end) + _varint(i2 - i1) + _varint(2 * len(substring) + (tag == 'i')) + substring)
+      end = i2
+
+  return ''.join(encoded)
+
+
+def decode_diffs(encoded, shape):
+  """Unpack the diff strings packed by encode_diffs.
+
+  Parameters
+  ----------
+  encoded : str
+    The encoded diffs.
+  shape : list of ints
+    The shape of the array of diff strings that was encoded.
+
+  Returns
+  -------
+  np.ndarray of unicode
+    The diff strings.
+
+  """
+  diff_strings = np.full(int(np.prod(shape)), '[]', dtype=np.object)
+  pos = 0
+  index = -1
+  while pos < len(encoded):
+    gap, pos = _read_varint(encoded, pos)
+    num_ops, pos = _read_varint(encoded, pos)
+    index += gap + 1
+
+    ops = []
+    end = 0
+    for _ in xrange(num_ops):
+      start, pos = _read_varint(encoded, pos)
+      width, pos = _read_varint(encoded, pos)
+      size, pos = _read_varint(encoded, pos)
+      size, is_insert = divmod(size, 2)
+
+      i1 = end + start
+      end = i1 + width
+      ops.append(('i' if is_insert else 'd', i1, end, encoded[pos: pos + size].decode('utf-8')))
+      pos += size
+    diff_strings[index] = json.dumps(ops)
+
+  return diff_strings.astype(np.unicode).reshape(shape)
+
+
+def _varint(num):
+  """Write a non negative int seven bits a byte, with the high bit set on every byte but the last."""
+  encoded = []
+  while num >= 0x80:
+    encoded.append(chr((num & 0x7f) | 0x80))
+    num >>= 7
+  encoded.append(chr(num))
+  return ''.join(encoded)
+
+
+def _read_varint(encoded, pos):
+  """Read the varint starting at pos, returning it along with the position after it."""
+  num = 0
+  shift = 0
+  while True:
+    byte = ord(encoded[pos])
+    pos += 1
+    num |= (byte & 0x7f) << shift
+    shift += 7
+    if byte < 0x80:
+      return num, pos
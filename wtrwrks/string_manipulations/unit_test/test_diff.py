@@ -22,5 +22,49 @@ class TestDiff(unittest.TestCase):
     reco = df.reconstruct(source, diff_string)
 
     self.assertEqual(target, reco)
+
+  def test_edge_cases(self):
+    self.assertEqual(df.get_diff_string(u'same', u'same'), '[]')
+    self.assertEqual(df.get_diff_string('', 'abc'), '[["i", 0, 0, "abc"]]')
+    self.assertEqual(df.get_diff_string('abc', ''), '[["d", 0, 3, ""]]')
+    self.assertEqual(df.get_diff_string('abcabc', 'abc'), '[["d", 3, 6, ""]]')
+    self.assertEqual(df.reconstruct(u'H\xe9llo W\xf6rld', df.get_diff_string(u'H\xe9llo W\xf6rld', u'hello world')), u'hello world')
+
+    # Strings far apart are matched up with difflib, and still reconstruct.
+    source = 'ab' * 100
+    target = 'ba' * 50 + 'cd' * 50
+    self.assertEqual(df.reconstruct(source, df.get_diff_string(source, target)), target)
+
+  def test_random(self):
+    rs = np.random.RandomState(0)
+    for _ in xrange(500):
+      source = ''.join(rs.choice(list('abc '), size=rs.randint(0, 30)))
+      target = list(source)
+      for _ in xrange(rs.randint(0, 6)):
+        position = rs.randint(0, len(target) + 1)
+        if rs.rand() < 0.5:
+          target.insert(position, rs.choice(list('abcd ')))
+        else:
+          target[position: position + 1] = []
+      target = ''.join(target)
+      self.assertEqual(df.reconstruct(source, df.get_diff_string(source, target)), target)
+
+  def test_encode_decode(self):
+    sources = np.array([['Hey Hey', 'same'], [u'\xe9t\xe9', ''], ['a' * 300, 'abc']])
+    targets = np.array([['hey hey', 'same'], [u'\xc9T\xc9', ''], ['b' * 300, 'abc']])
+    diff_strings = np.vectorize(df.get_diff_string)(sources, targets)
+
+    encoded = df.encode_diffs(diff_strings)
+    decoded = df.decode_diffs(encoded, diff_strings.shape)
+    self.assertEqual(decoded.tolist(), diff_strings.tolist())
+    self.assertLess(len(encoded), sum([len(d) for d in diff_strings.flatten()]))
+
+    # Only the diffs that change anything are stored.
+    self.assertEqual(df.encode_diffs(np.full([3, 4], '[]')), '')
+    self.assertEqual(df.decode_diffs('', [2]).tolist(), ['[]', '[]'])
+
+    with self.assertRaises(ValueError):
+      df.encode_diffs(['[["d", 3, 4, ""], ["d", 0, 1, ""]]'])
+
 if __name__ == "__main__":
   unittest.main()
@@ -17,6 +17,8 @@ class Add(ta.Tank):
   """
   slot_keys = ['a', 'b']
   tube_keys = ['target', 'smaller_size_array', 'a_is_smaller']
+  side_channel_keys = ['smaller_size_array', 'a_is_smaller']
+  alias_keys = {'smaller_size_array': ['a', 'b']}
 
   def _pour(self, a, b):
     """Execute the CatToIndex tank (operation) in the pour (forward) direction.
@@ -52,14 +54,18 @@ class Add(ta.Tank):
     # Copy whichever has a fewer number of elements and pass as output
     a_is_smaller = a.size < b.size
     if a_is_smaller:
-      smaller_size_array = ut.maybe_copy(a)
+      smaller_size_array = ut.pass_on(a)
     else:
-      smaller_size_array = ut.maybe_copy(b)
+      smaller_size_array = ut.pass_on(b)
 
     target = np.array(a + b)
 
     return {'target': target, 'smaller_size_array': smaller_size_array, 'a_is_smaller': a_is_smaller}
 
+  def _pour_forward(self, a, b):
+    """Add the arrays without copying the smaller one."""
+    return {'target': np.array(np.array(a) + np.array(b))}
+
   def _pump(self, target, smaller_size_array, a_is_smaller):
     """Execute the CatToIndex tank (operation) in the pump (backward) direction.
 
@@ -86,10 +92,10 @@ class Add(ta.Tank):
     """
     # reconstruct the other array from the smaller size array nd the target.
     if a_is_smaller:
-      a = ut.maybe_copy(smaller_size_array)
+      a = ut.pass_on(smaller_size_array)
       b = np.array(target - a)
     else:
       a = np.array(target - smaller_size_array)
-      b = ut.maybe_copy(smaller_size_array)
+      b = ut.pass_on(smaller_size_array)
 
     return {'a': a, 'b': b}
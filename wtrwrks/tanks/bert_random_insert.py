@@ -20,6 +20,8 @@ class BertRandomInsert(ta.Tank):
 
   slot_keys = ['a', 'ends', 'num_tries', 'random_seed']
   tube_keys = ['target', 'removed', 'num_tries', 'ends', 'random_seed']
+  alias_keys = {'ends': ['ends']}
+  deterministic = False
 
   def _pour(self, a, ends, num_tries, random_seed):
     """
@@ -88,7 +90,7 @@ class BertRandomInsert(ta.Tank):
     target = np.array(target)
     removed = np.array(removed)
 
-    return {'target': target, 'removed': removed, 'num_tries': num_tries, 'ends': ends, 'random_seed': random_seed}
+    return {'target': target, 'removed': removed, 'num_tries': num_tries, 'ends': ut.pass_on(ends), 'random_seed': random_seed}
 
   def _pump(self, target, removed, num_tries, ends, random_seed):
     """Execute the Shape tank (operation) in the pump (backward) direction.
@@ -117,6 +119,7 @@ class BertRandomInsert(ta.Tank):
 
     """
     mask = removed != '[NA]'
+    target = ut.writable(target)
     target[mask] = removed[mask]
 
     a = []
@@ -126,4 +129,4 @@ class BertRandomInsert(ta.Tank):
       a.append(row)
     a = np.stack(a)
 
-    return {'a': a, 'num_tries': num_tries, 'ends': ends, 'random_seed': random_seed}
+    return {'a': a, 'num_tries': num_tries, 'ends': ut.pass_on(ends), 'random_seed': random_seed}
@@ -6,7 +6,7 @@ from wtrwrks.waterworks.empty import empty
 
 
 def create_one_arg_bool_tank(np_func, class_name):
-  """Create a function which generates the tank instance corresponding to some single argument, boolean valued numpy function. (e.g. np.isnan). The operation will be reversible but in the most trivial and wasteful manner possible. It will just copy over the original array.
+  """Create a function which generates the tank instance corresponding to some single argument, boolean valued numpy function. (e.g. np.isnan). The operation will be reversible but in the most trivial manner possible. It will just pass on the original array.
 
   Parameters
   ----------
@@ -26,15 +26,20 @@ def create_one_arg_bool_tank(np_func, class_name):
   class TankClass(ta.Tank):
     slot_keys = ['a']
     tube_keys = ['target', 'a']
+    alias_keys = {'a': ['a']}
 
     def _pour(self, a):
-      return {'target': np_func(a), 'a': ut.maybe_copy(a)}
+      return {'target': np_func(a), 'a': ut.pass_on(a)}
 
     def _pump(self, target, a):
-      return {'a': ut.maybe_copy(a)}
+      return {'a': ut.pass_on(a)}
 
   TankClass.__name__ = class_name
 
+  # Make the class an attribute of this module, under its name, so that its
+  # tanks can be pickled.
+  globals()[class_name] = TankClass
+
   def func(a=empty, type_dict=None, waterwork=None, name=None):
     tank = TankClass(a=a, waterwork=waterwork, name=name)
     return tank.get_tubes(), tank.get_slots()
@@ -42,7 +47,7 @@ def create_one_arg_bool_tank(np_func, class_name):
 
 
 def create_two_arg_bool_tank(np_func, class_name, target_type=None):
-  """Create a function which generates the tank instance corresponding to some two argument, boolean valued numpy function. (e.g. np.equals). The operation will be reversible but in the most trivial and wasteful manner possible. It will just copy over the original array.
+  """Create a function which generates the tank instance corresponding to some two argument, boolean valued numpy function. (e.g. np.equals). The operation will be reversible but in the most trivial manner possible. It will just pass on the original array.
 
   Parameters
   ----------
@@ -62,15 +67,20 @@ def create_two_arg_bool_tank(np_func, class_name, target_type=None):
   class TankClass(ta.Tank):
     slot_keys = ['a', 'b']
     tube_keys = ['target', 'a', 'b']
+    alias_keys = {'a': ['a'], 'b': ['b']}
 
     def _pour(self, a, b):
-      return {'target': np_func(a, b), 'a': ut.maybe_copy(a), 'b': ut.maybe_copy(b)}
+      return {'target': np_func(a, b), 'a': ut.pass_on(a), 'b': ut.pass_on(b)}
 
     def _pump(self, target, a, b):
-      return {'a': ut.maybe_copy(a), 'b': ut.maybe_copy(b)}
+      return {'a': ut.pass_on(a), 'b': ut.pass_on(b)}
 
   TankClass.__name__ = class_name
 
+  # Make the class an attribute of this module, under its name, so that its
+  # tanks can be pickled.
+  globals()[class_name] = TankClass
+
   def func(a=empty, b=empty, type_dict=None, waterwork=None, name=None):
     tank = TankClass(a=a, b=b, waterwork=waterwork, name=name)
     return tank.get_tubes(), tank.get_slots()
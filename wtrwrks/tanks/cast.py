@@ -18,6 +18,7 @@ class Cast(ta.Tank):
 
   slot_keys = ['a', 'dtype']
   tube_keys = ['target', 'input_dtype', 'diff']
+  side_channel_keys = ['input_dtype', 'diff']
 
   def _pour(self, a, dtype):
     """Execute the Cast tank (operation) in the pour (forward) direction.
@@ -53,6 +54,10 @@ class Cast(ta.Tank):
       diff = np.zeros_like(target)
     return {'target': target, 'diff': diff, 'input_dtype': a.dtype}
 
+  def _pour_forward(self, a, dtype):
+    """Cast the array without saving the difference from the original."""
+    return {'target': np.array(a).astype(dtype)}
+
   def _pump(self, target, input_dtype, diff):
     """Execute the Cast tank (operation) in the pump (backward) direction.
 
@@ -22,6 +22,7 @@ class CatToIndex(ta.Tank):
   """
   slot_keys = ['cats', 'cat_to_index_map']
   tube_keys = ['target', 'cat_to_index_map', 'missing_vals', 'input_dtype']
+  side_channel_keys = ['cat_to_index_map', 'missing_vals', 'input_dtype']
 
   def _pour(self, cats, cat_to_index_map):
     """Execute the mapping in the pour (forward) direction .
@@ -30,8 +31,8 @@ class CatToIndex(ta.Tank):
     ----------
     cats : np.ndarray
       The categorical values to be mapped to indices
-    cat_to_index_map : dict
-      The map from categorical values to indices.
+    cat_to_index_map : dict or SortedKeys
+      The map from categorical values to indices, or its keys sorted by wtrwrks.tanks.utils.presort.
 
     Returns
     -------
@@ -40,47 +41,27 @@ class CatToIndex(ta.Tank):
         The result of the sum of 'a' and 'b'.
       'missing_vals': list
         The list of all the cats that were not found in cat_to_index_map.
-      'cat_to_index_map' : dict
-        The map from categorical values to indices.
+      'cat_to_index_map' : dict or SortedKeys
+        The map from categorical values to indices, or its keys sorted by wtrwrks.tanks.utils.presort.
     )
 
     """
-    cats = np.array(cats, copy=True)
-    shape = cats.shape
-    is_float = cats.dtype in (np.float64, np.float32)
-    nan_val = -1
-    if is_float:
-      for key, value in cat_to_index_map.iteritems():
-        if np.isnan(key):
-          nan_val = value
-          break
-    # Pull out all the cats which are not in the cat_to_index_map.
-    # If you have a nan not in a float, you're going to get
-    # unexpected results, so here we force nans not to show up in
-    # missing vals if they are in the cat_to_index_map.
+    cats = np.asarray(cats)
+    found, target, isnan = _map_to_indices(cats, cat_to_index_map)
+
+    # Pull out all the cats which are not in the cat_to_index_map. If you have
+    # a nan not in a float, you're going to get unexpected results, so here we
+    # force nans not to show up in missing vals.
     missing_vals = af.empty_array_like(cats)
-    if is_float:
-      isnan = np.array([True if str(v) == 'nan' else False for v in cats.flatten()]).reshape(cats.shape)
-      mask = (~np.isin(cats, cat_to_index_map.keys())) & (~isnan)
-      missing_vals[mask] = cats[mask]
-    else:
-      mask = ~np.isin(cats, cat_to_index_map.keys())
-      missing_vals[mask] = cats[mask]
-
-    # Map all the categorical values to indices, setting an index of -1
-    # every time an unsupported category is encoutered.
-    def safe_map(cat):
-      if cat in cat_to_index_map:
-        return cat_to_index_map[cat]
-      elif is_float and np.isnan(cat):
-        return nan_val
-      else:
-        return -1
-    target = np.vectorize(safe_map)(cats)
-    target = target.reshape(shape)
+    mask = ~found & ~isnan
+    missing_vals[mask] = cats[mask]
 
     return {'target': target, 'missing_vals': missing_vals, 'cat_to_index_map': cat_to_index_map, 'input_dtype': cats.dtype}
 
+  def _pour_forward(self, cats, cat_to_index_map):
+    """Map the categorical values to indices without collecting the missing values."""
+    return {'target': _map_to_indices(np.asarray(cats), cat_to_index_map)[1]}
+
   def _pump(self, target, missing_vals, cat_to_index_map, input_dtype):
     """Execute the mapping in the pump (backward) direction .
 
@@ -90,8 +71,8 @@ class CatToIndex(ta.Tank):
       The result of the sum of 'a' and 'b'.
     missing_vals: list
       The list of all the cats that were not found in cat_to_index_map.
-    cat_to_index_map : dict
-      The map from categorical values to indices.
+    cat_to_index_map : dict or SortedKeys
+      The map from categorical values to indices, or its keys sorted by wtrwrks.tanks.utils.presort.
 
 
     Returns
@@ -99,28 +80,105 @@ class CatToIndex(ta.Tank):
     dict(
       'cats' : np.ndarray
         The categorical values to be mapped to indices
-      'cat_to_index_map' : dict
-        The map from categorical values to indices.
+      'cat_to_index_map' : dict or SortedKeys
+        The map from categorical values to indices, or its keys sorted by wtrwrks.tanks.utils.presort.
     )
 
     """
     missing_vals = np.array(missing_vals)
-    # Convert the cat_to_index_map into an index_to_cat_map, while making
-    # sure it is one-to-one. Otherwise it isn't reversible.
-    index_to_cat_map = {}
-    for k, v in cat_to_index_map.iteritems():
-      if v in index_to_cat_map:
-        raise ValueError("cat_to_index_map must be one-to-one. " + str(v) + " appears twice.")
-      index_to_cat_map[v] = k
-
-    # Need to set the otypes variable for np.vectorize, otherwise it runs
-    # it once to figure out the output type of map_back. This screws up
-    # missing_vals.pop
-    # otype = str if not len(cat_to_index_map) else type(cat_to_index_map.keys()[0])
-    cats = np.array([index_to_cat_map[i] if i != -1 else index_to_cat_map[0] for i in target.flatten()])
-    cats = cats.reshape(target.shape)
-
+    target = np.asarray(target)
     mask = target == -1
+
+    keys = ut.sorted_keys(cat_to_index_map)
+    if keys is None:
+      cats = _map_to_cats(target, cat_to_index_map)
+    elif not len(keys.keys):
+      cats = np.array(missing_vals, copy=True)
+    else:
+      # Map the indices back with the cat_to_index_map's values sorted, which
+      # also makes sure it is one-to-one. Otherwise it isn't reversible. The
+      # -1's get a placeholder until the missing values are put back.
+      index_to_cat = keys.inverse()
+      found, positions = index_to_cat.find(target)
+      if (~found & ~mask).any():
+        raise ValueError(str(target[~found & ~mask].flatten()[0]) + " is not an index of the cat_to_index_map.")
+      cats = np.array(index_to_cat.values[positions])
+
+    # Make sure the missing values, which may be longer strings than any of
+    # the known categories, aren't truncated when they're put back.
+    cats = cats.astype(np.promote_types(cats.dtype, missing_vals.dtype), copy=False)
     cats[mask] = missing_vals[mask]
 
     return {'cats': cats, 'cat_to_index_map': cat_to_index_map}
+
+
+def _map_to_indices(cats, cat_to_index_map):
+  """Map all the categorical values to indices, setting an index of -1 every time an unsupported category is encoutered. The lookups are done on the sorted keys of the cat_to_index_map, which are only built once if the map was passed through wtrwrks.tanks.utils.presort.
+
+  Parameters
+  ----------
+  cats : np.ndarray
+    The categorical values to be mapped to indices
+  cat_to_index_map : dict or SortedKeys
+    The map from categorical values to indices, or its keys sorted by wtrwrks.tanks.utils.presort.
+
+  Returns
+  -------
+  3-tuple of np.ndarrays
+    Whether or not each value is in the cat_to_index_map, the indices and whether or not each value is a nan, all with the same shape as cats.
+
+  """
+  if cats.dtype.kind == 'f':
+    isnan = np.isnan(cats)
+  else:
+    isnan = np.zeros(cats.shape, dtype=bool)
+
+  keys = ut.sorted_keys(cat_to_index_map)
+  if keys is None:
+    return _map_to_indices_by_element(cats, cat_to_index_map, isnan)
+
+  # Nans are never equal to each other, so they get the index of the nan
+  # in the cat_to_index_map, if there is one, separately.
+  found, positions = keys.find(cats)
+  nan_val = -1
+  if keys.keys.dtype.kind == 'f' and len(keys.keys) and np.isnan(keys.keys[-1]):
+    nan_val = keys.values[-1]
+
+  if not len(keys.keys):
+    target = np.full(cats.shape, -1, dtype=np.int64)
+  else:
+    target = np.where(found, keys.values[positions], -1)
+  if isnan.any():
+    target[isnan] = nan_val
+  return found, target, isnan
+
+
+def _map_to_indices_by_element(cats, cat_to_index_map, isnan):
+  """Map the categorical values to indices one element at a time, for cat_to_index_maps whose keys can't be sorted (e.g. a mix of strings and numbers). See _map_to_indices."""
+  nan_val = -1
+  if isnan.any():
+    for key, value in cat_to_index_map.iteritems():
+      if type(key) in (float, np.float64, np.float32) and np.isnan(key):
+        nan_val = value
+        break
+
+  def safe_map(cat):
+    if cat in cat_to_index_map:
+      return cat_to_index_map[cat]
+    return -1
+  found = np.array([cat in cat_to_index_map for cat in cats.flatten()], dtype=bool).reshape(cats.shape)
+  target = np.array([safe_map(cat) for cat in cats.flatten()], dtype=np.int64).reshape(cats.shape)
+  target[isnan] = nan_val
+  return found, target, isnan
+
+
+def _map_to_cats(target, cat_to_index_map):
+  """Map the indices back to categorical values one element at a time, for cat_to_index_maps whose keys can't be sorted. The -1's are given the category of index 0 as a placeholder."""
+  index_to_cat_map = {}
+  for k, v in cat_to_index_map.iteritems():
+    if v in index_to_cat_map:
+      raise ValueError("cat_to_index_map must be one-to-one. " + str(v) + " appears twice.")
+    index_to_cat_map[v] = k
+
+  cats = np.array([index_to_cat_map[i] if i != -1 else index_to_cat_map[0] for i in target.flatten()])
+  return cats.reshape(target.shape)
@@ -16,6 +16,7 @@ class Clone(ta.Tank):
   """
   slot_keys = ['a']
   tube_keys = ['a', 'b']
+  alias_keys = {'a': ['a'], 'b': ['a']}
 
   def _pour(self, a):
     """Execute the Clone tank (operation) in the pour (forward) direction.
@@ -35,7 +36,9 @@ class Clone(ta.Tank):
     )
 
     """
-    return {'a': ut.maybe_copy(a), 'b': ut.maybe_copy(a)}
+    # Arrays are shared as read only views rather than copied. Anything that
+    # needs to change one of them will make its own copy.
+    return {'a': ut.share(a), 'b': ut.share(a)}
 
   def _pump(self, a, b):
     """Execute the Clone tank (operation) in the pump (backward) direction.
@@ -55,4 +58,4 @@ class Clone(ta.Tank):
     )
 
     """
-    return {'a': ut.maybe_copy(a)}
+    return {'a': ut.pass_on(a)}
@@ -0,0 +1,180 @@
+"""ColumnPartition tank definition."""
+import wtrwrks.waterworks.tank as ta
+import wtrwrks.tanks.utils as ut
+import numpy as np
+
+
+class ColumnPartition(ta.Tank):
+  """The defintion of the ColumnPartition tank. A Transpose tank, followed by a Partition tank, followed by an IterList tank and then a Transpose tank on each of the parts, fused into a single operation. When the two transposes just swap the first two axes, the parts are taken directly as column slices of the array, rather than copying the whole transposed array and transposing each part back. Outputs exactly the same tubes as the original tanks would, so it can be swapped in for them by the optimizer.
+
+  The slot_keys and tube_keys depend on the number of parts, so they're set on each instance rather than on the class. That way every ColumnPartition tank has the same (module level) class, and can be pickled, e.g. to be run on a process pool.
+
+  Attributes
+  ----------
+  num_parts: int
+    The number of parts the array is partitioned into.
+  slot_keys: list of strs
+    The names off all the tank's slots, i.e. inputs in the pour (forward) direction, or outputs in the pump (backward) direction
+  tubes: list of strs
+    The names off all the tank's tubes, i.e. outputs in the pour (forward) direction,
+
+  """
+  slot_keys = None
+  tube_keys = None
+
+  def __init__(self, num_parts, waterwork=None, name=None, **input_dict):
+    """Create a ColumnPartition tank with num_parts parts. See Tank for the other arguments."""
+    part_keys = [str(num) for num in xrange(num_parts)]
+    self.num_parts = num_parts
+    self.slot_keys = ['a', 'axes', 'indices'] + ['axes_' + k for k in part_keys]
+    self.tube_keys = ['axes', 'indices', 'missing_cols', 'missing_array'] + ['target_' + k for k in part_keys] + ['axes_' + k for k in part_keys]
+    self.alias_keys = dict([('target_' + k, ['a']) for k in part_keys] + [('indices', ['indices'])])
+    super(ColumnPartition, self).__init__(waterwork=waterwork, name=name, **input_dict)
+
+  def _save_dict(self):
+    save_dict = super(ColumnPartition, self)._save_dict()
+    save_dict['init_kwargs'] = {'num_parts': self.num_parts}
+    return save_dict
+
+  def _pour(self, a, axes, indices, **kwargs):
+    """Execute the ColumnPartition tank (operation) in the pour (forward) direction.
+
+    Parameters
+    ----------
+    a: np.ndarray
+      The array to take slices from.
+    axes: list of ints
+      The permutation of axes to apply to 'a' before partitioning it.
+    indices: np.ndarray
+      The index ranges of each slice. The first dimension can be of any size and the second dimension must be two.
+    kwargs: list of ints
+      The permutation of axes to apply to each of the slices, keyed by 'axes_<num>'.
+
+    Returns
+    -------
+    dict(
+      target_<num>: np.ndarray
+        The slices of the array.
+      axes_<num>: list of ints
+        The permutation of axes applied to each of the slices.
+      axes: list of ints
+        The permutation of axes to apply to 'a' before partitioning it.
+      indices: np.ndarray of ints
+        The index ranges of each slice. The first dimension can be of any size and the second dimension must be two.
+      missing_cols: np.ndarray of ints
+        The columns of the transposed array that were not selected by the slices defined by 'indices'
+      missing_array: np.ndarray
+        The slices of the transposed array that were not selected by the slices defined by 'indices'.
+    )
+
+    """
+    part_axes = [kwargs['axes_' + str(num)] for num in xrange(self.num_parts)]
+    indices = np.array(indices)
+    r_dict = {'axes': axes, 'indices': indices}
+
+    if _swaps_columns(a, axes, part_axes):
+      # Transposing, slicing and transposing back is just slicing the columns.
+      # The slices are views of 'a', so they're passed on read only.
+      a = np.asarray(a)
+      for num, col_range in enumerate(indices):
+        r_dict['target_' + str(num)] = ut.read_only(a[:, col_range[0]: col_range[1]])
+      transposed = np.transpose(a, axes=axes)
+    else:
+      transposed = np.array(np.transpose(a, axes=axes))
+      for num, col_range in enumerate(indices):
+        part = transposed[col_range[0]: col_range[1]]
+        r_dict['target_' + str(num)] = ut.read_only(np.transpose(part, axes=part_axes[num]))
+
+    r_dict['missing_cols'] = _missing_cols(transposed.shape[0], indices)
+    r_dict['missing_array'] = transposed[r_dict['missing_cols']]
+    for num, p_axes in enumerate(part_axes):
+      r_dict['axes_' + str(num)] = p_axes
+
+    return r_dict
+
+  def _pump(self, axes, indices, missing_cols, missing_array, **kwargs):
+    """Execute the ColumnPartition tank (operation) in the pump (backward) direction.
+
+    Parameters
+    ----------
+    axes: list of ints
+      The permutation of axes to apply to 'a' before partitioning it.
+    indices: np.ndarray of ints
+      The index ranges of each slice. The first dimension can be of any size and the second dimension must be two.
+    missing_cols: np.ndarray of ints
+      The columns of the transposed array that were not selected by the slices defined by 'indices'
+    missing_array: np.ndarray
+      The slices of the transposed array that were not selected by the slices defined by 'indices'.
+    kwargs: np.ndarrays and lists of ints
+      The slices of the array, keyed by 'target_<num>', and the permutation of axes applied to each of them, keyed by 'axes_<num>'.
+
+    Returns
+    -------
+    dict(
+      a: np.ndarray
+        The array to take slices from.
+      axes: list of ints
+        The permutation of axes to apply to 'a' before partitioning it.
+      indices: np.ndarray
+        The index ranges of each slice. The first dimension can be of any size and the second dimension must be two.
+      axes_<num>: list of ints
+        The permutation of axes applied to each of the slices.
+    )
+
+    """
+    target = [kwargs['target_' + str(num)] for num in xrange(self.num_parts)]
+    part_axes = [kwargs['axes_' + str(num)] for num in xrange(self.num_parts)]
+
+    # Get the total length of the partitioned dimension. Handling the empty
+    # array case.
+    if target or len(missing_cols):
+      max_index = np.max(np.concatenate([indices[:, 1] - 1, missing_cols.flatten()]))
+    else:
+      max_index = -1
+
+    if target and _swaps_columns(target[0], axes, part_axes):
+      # Fill the columns of the array directly, rather than filling the
+      # transposed array and transposing it back.
+      inner_dims = target[0].shape[2:]
+      a = np.zeros([target[0].shape[0], max_index + 1] + list(inner_dims), dtype=missing_array.dtype)
+      for subarray, col_range in zip(target, indices):
+        a[:, col_range[0]: col_range[1]] = subarray
+      for col_num, col in enumerate(missing_cols):
+        a[:, col] = missing_array[col_num]
+    else:
+      target = [np.transpose(t, axes=np.argsort(p_axes)) for t, p_axes in zip(target, part_axes)]
+      if target:
+        inner_dims = target[0].shape[1:]
+      else:
+        inner_dims = missing_array.shape[1:]
+
+      transposed = np.zeros([max_index + 1] + list(inner_dims), dtype=missing_array.dtype)
+      for subarray, col_range in zip(target, indices):
+        transposed[col_range[0]: col_range[1]] = subarray
+      for col_num, col in enumerate(missing_cols):
+        transposed[col] = missing_array[col_num]
+      a = np.transpose(transposed, axes=np.argsort(axes))
+
+    r_dict = {'a': a, 'axes': axes, 'indices': ut.pass_on(indices)}
+    for num, p_axes in enumerate(part_axes):
+      r_dict['axes_' + str(num)] = p_axes
+
+    return r_dict
+
+
+def _missing_cols(num_cols, indices):
+  """Find the columns not covered by any of the index ranges."""
+  all_ranges = [np.arange(col_range[0], col_range[1]) for col_range in indices]
+  return np.setdiff1d(np.arange(num_cols, dtype=int), np.concatenate(all_ranges, axis=0))
+
+
+def _swaps_columns(a, axes, part_axes):
+  """Whether the axes of the array and of all the parts just swap the first two dimensions of 'a', in which case the transposes cancel out."""
+  ndim = np.ndim(a)
+  swap = [1, 0] + range(2, ndim)
+  if ndim < 2 or list(axes) != swap:
+    return False
+  for p_axes in part_axes:
+    if list(p_axes) != swap:
+      return False
+  return True
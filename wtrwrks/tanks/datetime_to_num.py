@@ -1,6 +1,7 @@
 """DatetimeToNum tank definition."""
 import wtrwrks.waterworks.waterwork_part as wp
 import wtrwrks.waterworks.tank as ta
+import wtrwrks.tanks.utils as ut
 import numpy as np
 import datetime
 
@@ -19,6 +20,8 @@ class DatetimeToNum(ta.Tank):
 
   slot_keys = ['a', 'zero_datetime', 'num_units', 'time_unit']
   tube_keys = ['target', 'zero_datetime', 'num_units', 'time_unit', 'diff']
+  side_channel_keys = ['zero_datetime', 'num_units', 'time_unit', 'diff']
+  alias_keys = {'zero_datetime': ['zero_datetime']}
 
   def _pour(self, a, zero_datetime, num_units, time_unit):
     """Execute the DatetimeToNum tank (operation) in the pour (forward) direction.
@@ -64,6 +67,12 @@ class DatetimeToNum(ta.Tank):
 
     return {'target': target, 'zero_datetime': zero_datetime, 'num_units': num_units, 'time_unit': time_unit, 'diff': diff}
 
+  def _pour_forward(self, a, zero_datetime, num_units, time_unit):
+    """Convert the datetimes to numbers without saving the information lost to the time resolution."""
+    a = np.array(a, dtype=np.datetime64)
+    zero_datetime = np.array(zero_datetime, dtype=np.datetime64)
+    return {'target': (a - zero_datetime)/np.timedelta64(num_units, time_unit)}
+
   def _pump(self, target, zero_datetime, num_units, time_unit, diff):
     """Execute the DatetimeToNum tank (operation) in the pump (backward) direction.
 
@@ -101,4 +110,4 @@ class DatetimeToNum(ta.Tank):
     if diff.size:
        a = a + diff
 
-    return {'a': a, 'zero_datetime': zero_datetime, 'num_units': num_units, 'time_unit': time_unit}
+    return {'a': a, 'zero_datetime': ut.pass_on(zero_datetime), 'num_units': num_units, 'time_unit': time_unit}
@@ -17,6 +17,8 @@ class Div(ta.Tank):
   """
   slot_keys = ['a', 'b']
   tube_keys = ['target', 'smaller_size_array', 'a_is_smaller', 'missing_vals', 'remainder']
+  side_channel_keys = ['smaller_size_array', 'a_is_smaller', 'missing_vals', 'remainder']
+  alias_keys = {'smaller_size_array': ['a', 'b']}
 
   def _pour(self, a, b):
     """Execute the Div tank (operation) in the pour (forward) direction.
@@ -53,9 +55,9 @@ class Div(ta.Tank):
     # Find the array with fewer elements and save that.
     a_is_smaller = a.size < b.size
     if a_is_smaller:
-      smaller_size_array = ut.maybe_copy(a)
+      smaller_size_array = ut.pass_on(a)
     else:
-      smaller_size_array = ut.maybe_copy(b)
+      smaller_size_array = ut.pass_on(b)
 
     # Do the division
     target = np.array(a / b)
@@ -77,6 +79,15 @@ class Div(ta.Tank):
 
     return {'target': target, 'smaller_size_array': smaller_size_array, 'a_is_smaller': a_is_smaller, 'missing_vals': missing_vals, 'remainder': remainder}
 
+  def _pour_forward(self, a, b):
+    """Divide the arrays without copying the smaller one or saving the erased values and remainders."""
+    a = np.array(a)
+    b = np.array(b)
+    if a.dtype in (np.int32, np.int64) and b.dtype in (np.int32, np.int64):
+      if (b == 0).any():
+        raise ZeroDivisionError("Integer division by zero is not supported.")
+    return {'target': np.array(a / b)}
+
   def _pump(self, target, smaller_size_array, a_is_smaller, missing_vals, remainder):
     """Execute the Div tank (operation) in the pump (backward) direction.
 
@@ -106,14 +117,14 @@ class Div(ta.Tank):
     if a_is_smaller:
       # If a is the smaller of the two arrays, then it was the one that was
       # saved. So no need to worry about the remainder.
-      a = ut.maybe_copy(smaller_size_array)
+      a = ut.pass_on(smaller_size_array)
       b = np.array(a / target)
       b[(target == 0)] = missing_vals
     else:
       a = target * smaller_size_array
       if target.dtype in (np.int32, np.int64):
         a = np.array(a + remainder)
-      b = ut.maybe_copy(smaller_size_array)
+      b = ut.pass_on(smaller_size_array)
 
       # If b is the smaller array then it is the one that was saved. This means
       # a nan, negative infinity, or positive infinity, (i.e. zeros in b)
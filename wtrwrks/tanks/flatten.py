@@ -18,6 +18,7 @@ class Flatten(ta.Tank):
 
   slot_keys = ['a']
   tube_keys = ['target', 'shape']
+  alias_keys = {'target': ['a']}
 
   def _pour(self, a):
     """Execute the Flatten tank (operation) in the pour (forward) direction.
@@ -59,4 +60,4 @@ class Flatten(ta.Tank):
     )
 
     """
-    return {'a': target.reshape(shape)}
+    return {'a': ut.read_only(target.reshape(shape))}
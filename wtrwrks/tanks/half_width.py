@@ -25,6 +25,7 @@ class HalfWidth(ta.Tank):
   """
   slot_keys = ['strings']
   tube_keys = ['target', 'diff']
+  side_channel_keys = ['diff']
 
   def _pour(self, strings):
     """Execute the HalfWidth tank (operation) in the pour (forward) direction.
@@ -44,13 +45,14 @@ class HalfWidth(ta.Tank):
     )
 
     """
-    strings = np.array(strings)
-    target = np.vectorize(_half_width)(strings)
-
-    diff = np.vectorize(di.get_diff_string)(target, strings)
+    target, diff = ut.map_strings(_half_width, np.array(strings))
 
     return {'target': target, 'diff': diff}
 
+  def _pour_forward(self, strings):
+    """Half width the strings without calculating the diffs."""
+    return {'target': ut.map_unique(_half_width, np.array(strings))}
+
   def _pump(self, target, diff):
     """Execute the HalfWidth tank (operation) in the pump (backward) direction.
 
@@ -0,0 +1,160 @@
+"""Interp tank definition."""
+import wtrwrks.waterworks.tank as ta
+import wtrwrks.tanks.utils as ut
+import wtrwrks.utils.array_functions as af
+import numpy as np
+
+
+class Interp(ta.Tank):
+  """The defintion of the Interp tank. Maps an array through the piecewise linear function that goes through the points (xp, fp), clamping anything outside the range of xp. Each position of the array can have its own xp. Values that the inverse map doesn't give back exactly (e.g. those that were clamped, those on a flat piece, or those lost to rounding) are saved so the pump direction is exact.
+
+  Attributes
+  ----------
+  slot_keys: list of strs
+    The names off all the tank's slots, i.e. inputs in the pour (forward) direction, or outputs in the pump (backward) direction
+  tubes: list of strs
+    The names off all the tank's tubes, i.e. outputs in the pour (forward) direction,
+
+  """
+
+  slot_keys = ['a', 'xp', 'fp']
+  tube_keys = ['target', 'xp', 'fp', 'mask', 'missing_vals']
+  side_channel_keys = ['xp', 'fp', 'mask', 'missing_vals']
+  alias_keys = {'xp': ['xp'], 'fp': ['fp']}
+
+  def _pour(self, a, xp, fp):
+    """Execute the Interp tank (operation) in the pour (forward) direction.
+
+    Parameters
+    ----------
+    a: np.ndarray
+      The array to map.
+    xp: np.ndarray
+      The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+    fp: np.ndarray
+      The strictly increasing, one dimensional y coordinates of the points.
+
+    Returns
+    -------
+    dict(
+      target: np.ndarray
+        The mapped array.
+      xp: np.ndarray
+        The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+      fp: np.ndarray
+        The strictly increasing, one dimensional y coordinates of the points.
+      mask: np.ndarray of bools
+        Where the inverse map doesn't give back the values of 'a'.
+      missing_vals: np.ndarray
+        The values of 'a' where mask is True, and default values everywhere else.
+    )
+
+    """
+    a = np.asarray(a)
+    xp, fp = _check_points(xp, fp)
+
+    target = _interp(a, xp, fp)
+
+    # Find the values that don't survive the round trip.
+    mask = _inverse(target, xp, fp).astype(a.dtype) != a
+    missing_vals = af.empty_array_like(a)
+    missing_vals[mask] = a[mask]
+
+    return {'target': target, 'xp': ut.pass_on(xp), 'fp': ut.pass_on(fp), 'mask': mask, 'missing_vals': missing_vals}
+
+  def _pour_forward(self, a, xp, fp):
+    """Map the array without saving the values needed to undo it."""
+    xp, fp = _check_points(xp, fp)
+    return {'target': _interp(np.asarray(a), xp, fp)}
+
+  def _pump(self, target, xp, fp, mask, missing_vals):
+    """Execute the Interp tank (operation) in the pump (backward) direction.
+
+    Parameters
+    ----------
+    target: np.ndarray
+      The mapped array.
+    xp: np.ndarray
+      The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+    fp: np.ndarray
+      The strictly increasing, one dimensional y coordinates of the points.
+    mask: np.ndarray of bools
+      Where the inverse map doesn't give back the values of 'a'.
+    missing_vals: np.ndarray
+      The values of 'a' where mask is True, and default values everywhere else.
+
+    Returns
+    -------
+    dict(
+      a: np.ndarray
+        The array to map.
+      xp: np.ndarray
+        The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+      fp: np.ndarray
+        The strictly increasing, one dimensional y coordinates of the points.
+    )
+
+    """
+    a = _inverse(np.asarray(target), xp, fp).astype(missing_vals.dtype)
+    a[mask] = missing_vals[mask]
+
+    return {'a': a, 'xp': ut.pass_on(xp), 'fp': ut.pass_on(fp)}
+
+
+def _check_points(xp, fp):
+  """Cast the points to arrays and make sure they define a piecewise linear function."""
+  xp = np.asarray(xp)
+  fp = np.asarray(fp, dtype=np.float64)
+  if fp.ndim != 1 or len(fp) < 2 or len(xp) != len(fp):
+    raise ValueError("fp must be one dimensional with at least two points, and xp must have the same number of points along its first dimension. Got shapes " + str(xp.shape) + " and " + str(fp.shape))
+  if (np.diff(fp) <= 0).any():
+    raise ValueError("fp must be strictly increasing.")
+  return xp, fp
+
+
+def _take(xp, indices):
+  """Get xp[indices[...], ...], i.e. the x coordinate of the point with the given index at each position of the array."""
+  if xp.ndim == 1:
+    return xp[indices]
+  shape = np.broadcast(xp[0], indices).shape
+  xp = xp.reshape([len(xp)] + [1] * (len(shape) - xp.ndim + 1) + list(xp.shape[1:]))
+  xp = np.broadcast_to(xp, (len(xp),) + shape)
+  return np.take_along_axis(xp, indices[np.newaxis], axis=0)[0]
+
+
+def _num_less_equal(xp, a):
+  """Count the number of points whose x coordinate is less than or equal to each value of 'a', with a binary search that runs on every position at once."""
+  if xp.ndim == 1:
+    return np.searchsorted(xp, a, side='right')
+
+  num_points = len(xp)
+  low = np.zeros(a.shape, dtype=np.int64)
+  high = np.full(a.shape, num_points, dtype=np.int64)
+  for _ in xrange(int(np.ceil(np.log2(num_points + 1)))):
+    middle = (low + high) // 2
+    active = low < high
+    right = active & (_take(xp, np.minimum(middle, num_points - 1)) <= a)
+    low = np.where(right, middle + 1, low)
+    high = np.where(active & ~right, middle, high)
+  return low
+
+
+def _interp(a, xp, fp):
+  """Map 'a' through the piecewise linear function going through (xp, fp), clamping it to the range of xp."""
+  pieces = np.clip(_num_less_equal(xp, a) - 1, 0, len(fp) - 2)
+  x_0 = _take(xp, pieces)
+  width = _take(xp, pieces + 1) - x_0
+
+  # Values on a flat piece all go to its start.
+  has_width = width > 0
+  frac = np.where(has_width, (a - x_0) / np.where(has_width, width, 1), 0.)
+  frac = np.clip(frac, 0., 1.)
+  return fp[pieces] + frac * (fp[pieces + 1] - fp[pieces])
+
+
+def _inverse(target, xp, fp):
+  """Map the target back through the piecewise linear function going through (fp, xp)."""
+  pieces = np.clip(np.searchsorted(fp, target, side='right') - 1, 0, len(fp) - 2)
+  frac = (target - fp[pieces]) / (fp[pieces + 1] - fp[pieces])
+  x_0 = _take(xp, pieces)
+  return x_0 + frac * (_take(xp, pieces + 1) - x_0)
@@ -21,6 +21,7 @@ class Lemmatize(ta.Tank):
 
   slot_keys = ['strings', 'lemmatizer']
   tube_keys = ['target', 'lemmatizer', 'diff']
+  side_channel_keys = ['lemmatizer', 'diff']
 
   def _pour(self, strings, lemmatizer):
     """Execute the Lemmatize tank (operation) in the pour (forward) direction.
@@ -29,8 +30,8 @@ class Lemmatize(ta.Tank):
     ----------
     strings: np.ndarray of strings
       The array of strings to be lemmatized.
-    lemmatizer: func
-      A function which takes in a string and outputs a standardized version of that string
+    lemmatizer: func or CachedStringMap
+      A function which takes in a string and outputs a standardized version of that string. Wrap it in a CachedStringMap to keep its results across pours.
 
     Returns
     -------
@@ -44,13 +45,15 @@ class Lemmatize(ta.Tank):
     )
 
     """
-    strings = np.array(strings)
-    target = np.vectorize(lemmatizer)(strings)
-
-    diff = np.vectorize(di.get_diff_string)(target, strings)
+    # Lemmatize each unique word once, rather than every occurence of it.
+    target, diff = ut.map_strings(lemmatizer, np.array(strings))
 
     return {'target': target, 'diff': diff, 'lemmatizer': lemmatizer}
 
+  def _pour_forward(self, strings, lemmatizer):
+    """Lemmatize the strings without calculating the diffs."""
+    return {'target': ut.map_unique(lemmatizer, np.array(strings))}
+
   def _pump(self, target, diff, lemmatizer):
     """Execute the Lemmatize tank (operation) in the pump (backward) direction.
 
@@ -23,6 +23,7 @@ class LowerCase(ta.Tank):
 
   slot_keys = ['strings']
   tube_keys = ['target', 'diff']
+  side_channel_keys = ['diff']
 
   def _pour(self, strings):
     """Execute the LowerCase tank (operation) in the pour (forward) direction.
@@ -42,13 +43,14 @@ class LowerCase(ta.Tank):
     )
 
     """
-    strings = np.array(strings)
-    target = np.char.lower(strings)
-
-    diff = np.vectorize(di.get_diff_string)(target, strings)
+    target, diff = ut.map_strings(_lower, np.array(strings))
 
     return {'target': target, 'diff': diff}
 
+  def _pour_forward(self, strings):
+    """Lower case the strings without calculating the diffs."""
+    return {'target': np.char.lower(np.array(strings))}
+
   def _pump(self, target, diff):
     """Execute the LowerCase tank (operation) in the pump (backward) direction.
 
@@ -70,3 +72,7 @@ class LowerCase(ta.Tank):
     strings = np.vectorize(di.reconstruct)(target, diff)
 
     return {'strings': strings}
+
+
+def _lower(string):
+  return string.lower()
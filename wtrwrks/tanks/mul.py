@@ -18,6 +18,8 @@ class Mul(ta.Tank):
 
   slot_keys = ['a', 'b']
   tube_keys = ['target', 'smaller_size_array', 'a_is_smaller', 'missing_vals']
+  side_channel_keys = ['smaller_size_array', 'a_is_smaller', 'missing_vals']
+  alias_keys = {'smaller_size_array': ['a', 'b']}
 
   def _pour(self, a, b):
     """Execute the Mul tank (operation) in the pour (forward) direction.
@@ -53,9 +55,9 @@ class Mul(ta.Tank):
     # reconstruct the original shape of the larger array from the target.
     a_is_smaller = a.size < b.size
     if a_is_smaller:
-      smaller_size_array = ut.maybe_copy(a)
+      smaller_size_array = ut.pass_on(a)
     else:
-      smaller_size_array = ut.maybe_copy(b)
+      smaller_size_array = ut.pass_on(b)
 
     # Multiply them together and save all the values which were effectively
     # 'erased' by a corresponding zero in the smaller array. We don't need to
@@ -69,6 +71,10 @@ class Mul(ta.Tank):
 
     return {'target': target, 'smaller_size_array': smaller_size_array, 'a_is_smaller': a_is_smaller, 'missing_vals': missing_vals}
 
+  def _pour_forward(self, a, b):
+    """Multiply the arrays without copying the smaller one or saving the erased values."""
+    return {'target': np.array(np.array(a) * np.array(b))}
+
   def _pump(self, target, smaller_size_array, a_is_smaller, missing_vals):
     """Execute the Mul tank (operation) in the pump (backward) direction.
 
@@ -96,11 +102,11 @@ class Mul(ta.Tank):
     # Find the value of the larger array using target and the smaller array.
     # Fill in any missing values which occured when there was a zero involved.
     if a_is_smaller:
-      a = ut.maybe_copy(smaller_size_array)
+      a = ut.pass_on(smaller_size_array)
       b = np.array(target / a)
       b[target == 0] = missing_vals
     else:
       a = np.array(target / smaller_size_array)
-      b = ut.maybe_copy(smaller_size_array)
+      b = ut.pass_on(smaller_size_array)
       a[target == 0] = missing_vals
     return {'a': a, 'b': b}
@@ -19,6 +19,8 @@ class OneHot(ta.Tank):
 
   slot_keys = ['indices', 'depth']
   tube_keys = ['target', 'missing_vals']
+  side_channel_keys = ['missing_vals']
+  alias_keys = {'missing_vals': ['indices']}
 
   def _pour(self, indices, depth):
     """Execute the OneHot tank (operation) in the pour (forward) direction.
@@ -45,7 +47,7 @@ class OneHot(ta.Tank):
       target = np.zeros([depth], dtype=np.float64)
       missing_vals = -2
       if indices < 0 or indices >= depth:
-        missing_vals = indices
+        missing_vals = ut.pass_on(indices)
       else:
         target[indices] = 1.0
       return {'target': target, 'missing_vals': missing_vals}
@@ -84,7 +86,7 @@ class OneHot(ta.Tank):
 
     """
     if len(target.shape) == 1:
-      indices = missing_vals if not np.where(target > 0)[0] else np.where(target > 0)[0][0]
+      indices = ut.pass_on(missing_vals) if not np.where(target > 0)[0] else np.where(target > 0)[0][0]
 
       return {'indices': indices, 'depth': target.shape[0]}
     # Start the indices all as -1.
@@ -60,90 +60,62 @@ class Pack(ta.Tank):
     )
 
     """
-    a = np.array(a)
+    a = np.asarray(a)
     dtype = a.dtype
     outer_dims = list(a.shape[:-2])
     row_dim = a.shape[-2]
     col_dim = a.shape[-1]
 
-    pack_row_lens = []
-    all_pack_rows = []
-    all_ends = []
+    # Flatten any of the outer dimensions and work with the rows of all the two
+    # d slices at once, keeping track of which slice each row belongs to.
     is_default = a == default_val
-    reshaped_is_default = is_default.reshape([-1, row_dim, col_dim])
-
-    # Flatten any of the outer dimensions and work with two d arrays, since
-    # those will be the dimensions which affect the packing.
-    for slice_num, two_d_slice in enumerate(a.reshape([-1, row_dim, col_dim])):
-      cur_is_default = reshaped_is_default[slice_num]
-
-      # Find the number of non default vals on each row
-      num_non_defaults = np.sum(~cur_is_default, axis=-1)
-
-      grouped_rows = []
-      tally = 0
-      rows = []
-      slice_ends = []
-      ends = np.zeros([col_dim], dtype=bool)
-      # Assign each row from the two d slice to a group of rows adding rows
-      # until the total number of elements in that row is reached. Then start
-      # a new group of rows.
-      for row_num, num in enumerate(num_non_defaults):
-        if num + tally > col_dim:
-          grouped_rows.append(rows)
-          slice_ends.append(ends)
-          ends = np.zeros([col_dim], dtype=bool)
-          ends[num - 1] = True
-          rows = []
-          tally = 0
-        elif num:
-          ends[num + tally - 1] = True
-
-        rows.append(row_num)
-        tally += num
-
-      grouped_rows.append(rows)
-      slice_ends.append(ends)
-      # Create the new rows of the arrays by pulling out the non default values
-      # from the two d slice and adding them to the new row.
-      pack_rows = []
-      for new_row_num, old_rows in enumerate(grouped_rows):
-        pack_row = []
-        for old_row in old_rows:
-          # Pull out the non default values from this old row, add to pack_row
-          pack_row.extend(
-            two_d_slice[old_row][~cur_is_default[old_row]].tolist()
-          )
-
-        # Standardize the length of pack row by adding in default vals
-        pack_row = pack_row + [default_val] * (col_dim - len(pack_row))
-        pack_rows.append(np.array(pack_row, dtype=dtype))
-
-      pack_rows = np.stack(pack_rows)
-      pack_row_lens.append(pack_rows.shape[0])
-      all_pack_rows.append(pack_rows)
-      all_ends.append(slice_ends)
-    max_num_rows = max(pack_row_lens)
-
-    # Standardize the size of each newly created slice (pack_rows) so that they
-    # can all be added to one array. pack_rows slice is filled with several
-    # rows of all default_vals if it does not have the max_num_rows of filled
-    # Rows.
-    target = []
-    for slice_num, (pack_row_len, pack_rows) in enumerate(zip(pack_row_lens, all_pack_rows)):
-      rows_to_add = max_num_rows - pack_row_len
-      default_val_array = np.full([rows_to_add, col_dim], default_val, dtype=dtype)
-      target.append(np.concatenate([pack_rows, default_val_array]))
-
-      falses = np.zeros([rows_to_add, col_dim], dtype=bool)
-      all_ends[slice_num] = np.concatenate([all_ends[slice_num], falses])
+    non_default = ~is_default.reshape([-1, col_dim])
+    num_rows = non_default.shape[0]
+    num_slices = int(np.prod(outer_dims))
+
+    # Find the number of non default vals on each row, and the number that come
+    # before each row.
+    offsets = np.zeros([num_rows + 1], dtype=np.int64)
+    np.cumsum(non_default.sum(axis=-1), out=offsets[1:])
+
+    # Rows are added to a group of rows until the total number of elements
+    # would be more than col_dim. Then a new group is started. So the group
+    # starting at any row runs up to the first row that doesn't fit, or to the
+    # end of the row's slice. Following these from the first row gives the
+    # starts of all the groups.
+    rows = np.arange(num_rows)
+    slices = rows // max(row_dim, 1)
+    next_starts = np.searchsorted(offsets, offsets[:-1] + col_dim, side='right') - 1
+    next_starts = np.minimum(next_starts, (slices + 1) * row_dim)
+    starts = _follow(np.append(next_starts, num_rows))
+
+    # Number the groups within each slice, which gives each row's row in the
+    # packed slice.
+    is_start = np.zeros([num_rows], dtype=bool)
+    is_start[starts] = True
+    groups = np.cumsum(is_start) - 1
+    slice_starts = np.searchsorted(starts, np.arange(num_slices) * row_dim)
+    group_lens = np.diff(np.append(slice_starts, len(starts)))
+    max_num_rows = max(group_lens.max() if num_slices else 0, 1)
+    pack_rows = slices * max_num_rows + groups - slice_starts[slices]
+
+    # Scatter the non default values into their packed rows, right after the
+    # values of the rows that come before them in their group. Any left over
+    # space is filled with default_vals.
+    row_offsets = offsets[starts[groups]]
+    old_rows = np.nonzero(non_default)[0]
+    target = np.full([num_slices * max_num_rows, col_dim], default_val, dtype=dtype)
+    target[pack_rows[old_rows], np.arange(len(old_rows)) - row_offsets[old_rows]] = a.reshape([-1, col_dim])[non_default]
+
+    # Mark where each non empty row ends within its packed row.
+    filled = offsets[1:] > offsets[:-1]
+    ends = np.zeros([num_slices * max_num_rows, col_dim], dtype=bool)
+    ends[pack_rows[filled], (offsets[1:] - row_offsets - 1)[filled]] = True
 
     # Reshape the array so that you have an array with only the second to last
     # dimension differening in size from the original 'a'
-    target = np.stack(target)
     target = target.reshape(outer_dims + [max_num_rows, col_dim])
-
-    all_ends = np.stack(all_ends).reshape(outer_dims + [max_num_rows, col_dim])
+    all_ends = ends.reshape(outer_dims + [max_num_rows, col_dim])
 
     return {'target': target, 'is_default': is_default, 'default_val': default_val, 'ends': all_ends}
 
@@ -169,37 +141,53 @@ class Pack(ta.Tank):
     )
 
     """
-    target = np.array(target)
-    dtype = target.dtype
-    row_dim = target.shape[-2]
-    col_dim = target.shape[-1]
-
-    reshaped_target = target.reshape([-1, row_dim, col_dim])
-    reshaped_is_default = is_default.reshape([-1] + list(is_default.shape[-2:]))
-
-    a = []
-    for two_d_slice, mask in zip(reshaped_target, reshaped_is_default):
-      recon = []
-
-      # Remove any left over default_values
-      packed = two_d_slice[two_d_slice != default_val].flatten().tolist()
-
-      # Go along each value in the is_default, fill with either a default val
-      # or the next non default val depending on whether the original a had
-      # a default val in that location.
-      mask = mask.flatten()
-      for val in mask:
-        if val:
-          recon.append(default_val)
-        else:
-          recon.append(packed.pop(0))
-
-      # Reshape this slice to the original (row_dim, col_dim) from the original
-      # a.
-      recon = np.array(recon, dtype=dtype).reshape(is_default.shape[-2:])
-      a.append(recon)
-
-    a = np.stack(a)
-    a = a.reshape(is_default.shape)
+    target = np.asarray(target)
+    is_default = np.asarray(is_default)
+
+    # The non default values were packed in the same order as they appear in
+    # the original 'a', so taking them out of the target in order (and removing
+    # any left over default_values) puts them right back where they were.
+    a = np.full(is_default.shape, default_val, dtype=target.dtype)
+    a[~is_default] = target[target != default_val]
 
     return {'a': a, 'default_val': default_val}
+
+
+def _follow(next_indices):
+  """Get all the indices visited by starting at 0 and going to next_indices[index] until the last index is reached, without looping over every step in python. The steps are instead taken by pointer jumping, i.e. building tables that go 1, 2, 4, ... steps at once.
+
+  Parameters
+  ----------
+  next_indices : np.ndarray of ints
+    The index to go to from each index. Each must be greater than the index it's at, except the last one which must point to itself.
+
+  Returns
+  -------
+  np.ndarray of ints
+    The visited indices, in order, not including the last index.
+
+  """
+  end = len(next_indices) - 1
+  if end <= 0:
+    return np.zeros([0], dtype=np.int64)
+
+  jumps = [next_indices]
+  while jumps[-1][0] != end:
+    jumps.append(jumps[-1][jumps[-1]])
+
+  # Find the number of steps it takes to get to the end, taking the longest
+  # jumps that don't reach it first.
+  num_steps = 0
+  index = 0
+  for power in reversed(xrange(len(jumps))):
+    if jumps[power][index] != end:
+      index = jumps[power][index]
+      num_steps += 2 ** power
+
+  # Then take every number of steps up to that at once.
+  steps = np.arange(num_steps + 1)
+  visited = np.zeros([num_steps + 1], dtype=np.int64)
+  for power, jump in enumerate(jumps):
+    take = (steps >> power) & 1 == 1
+    visited[take] = jump[visited[take]]
+  return visited
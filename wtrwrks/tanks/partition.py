@@ -18,6 +18,7 @@ class Partition(ta.Tank):
 
   slot_keys = ['a', 'indices']
   tube_keys = ['target', 'indices', 'missing_cols', 'missing_array']
+  alias_keys = {'indices': ['indices']}
 
   def _pour(self, a, indices):
     """Execute the Partition tank (operation) in the pour (forward) direction.
@@ -116,4 +117,4 @@ class Partition(ta.Tank):
     for col_num, col in enumerate(missing_cols):
       a[col] = missing_array[col_num]
 
-    return {'a': a, 'indices': indices}
+    return {'a': a, 'indices': ut.pass_on(indices)}
@@ -19,6 +19,7 @@ class RandomChoice(ta.Tank):
 
   slot_keys = ['a', 'shape']
   tube_keys = ['target', 'a']
+  deterministic = False
 
   def _pour(self, a, shape, p):
     """
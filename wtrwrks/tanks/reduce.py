@@ -4,7 +4,7 @@ import wtrwrks.waterworks.tank as ta
 
 
 def create_one_arg_reduce_tank(np_func, class_name):
-  """Create a function which generates the tank instance corresponding to some single argument, reduceean valued numpy function. (e.g. np.isnan). The operation will be reversible but in the most trivial and wasteful manner possible. It will just copy over the original array.
+  """Create a function which generates the tank instance corresponding to some single argument, reduceean valued numpy function. (e.g. np.isnan). The operation will be reversible but in the most trivial manner possible. It will just pass on the original array.
 
   Parameters
   ----------
@@ -25,6 +25,7 @@ def create_one_arg_reduce_tank(np_func, class_name):
 
     slot_keys = ['a', 'axis']
     tube_keys = ['target', 'axis', 'a']
+    alias_keys = {'a': ['a'], 'axis': ['axis']}
 
     def _pour(self, a, axis):
       # If an empty tuple was given then set the axis to None
@@ -36,14 +37,18 @@ def create_one_arg_reduce_tank(np_func, class_name):
 
       # Reduce the array using the supplied numpy array function.
       target = np_func(a, axis=input_axis)
-      return {'target': target, 'a': ut.maybe_copy(a), 'axis': axis}
+      return {'target': target, 'a': ut.pass_on(a), 'axis': axis}
 
     def _pump(self, target, axis, a):
-      return {'a': ut.maybe_copy(a), 'axis': axis}
+      return {'a': ut.pass_on(a), 'axis': ut.pass_on(axis)}
 
   # Set the name of the tank class
   TankClass.__name__ = class_name
 
+  # Make the class an attribute of this module, under its name, so that its
+  # tanks can be pickled.
+  globals()[class_name] = TankClass
+
   # Return the tank_def function.
   def func(a, axis=(), type_dict=None, waterwork=None, name=None, return_tank=False):
     tank = TankClass(a=a, axis=axis, waterwork=waterwork, name=name)
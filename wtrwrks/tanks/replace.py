@@ -20,6 +20,8 @@ class Replace(ta.Tank):
 
   slot_keys = ['a', 'mask', 'replace_with']
   tube_keys = ['target', 'mask', 'replaced_vals', 'replace_with_shape']
+  side_channel_keys = ['replaced_vals', 'replace_with_shape']
+  alias_keys = {'mask': ['mask']}
 
   def _pour(self, a, mask, replace_with):
     """Execute the Replace tank (operation) in the pour (forward) direction.
@@ -49,7 +51,7 @@ class Replace(ta.Tank):
     """
     # Cast the replace_with values to an array.
     replace_with = np.array(replace_with)
-    target = ut.maybe_copy(a)
+    target = ut.writable(a)
 
     # Save the values that are going to be replaced.
     replaced_vals = af.empty_array_like(a)
@@ -65,7 +67,13 @@ class Replace(ta.Tank):
     else:
       replace_with_shape = (replace_with,)
 
-    return {'target': target, 'mask': mask, 'replaced_vals': replaced_vals, 'replace_with_shape': replace_with_shape}
+    return {'target': target, 'mask': ut.pass_on(mask), 'replaced_vals': replaced_vals, 'replace_with_shape': replace_with_shape}
+
+  def _pour_forward(self, a, mask, replace_with):
+    """Replace the values without saving the ones that were overwritten."""
+    target = ut.writable(a)
+    target[mask] = np.array(replace_with)
+    return {'target': target, 'mask': ut.pass_on(mask)}
 
   def _pump(self, target, mask, replaced_vals, replace_with_shape):
     """Execute the Replace tank (operation) in the pump (backward) direction.
@@ -93,7 +101,7 @@ class Replace(ta.Tank):
     )
 
     """
-    a = ut.maybe_copy(target)
+    a = ut.writable(target)
     replace_with = a[mask]
 
     a[mask] = replaced_vals[mask]
@@ -113,5 +121,5 @@ class Replace(ta.Tank):
     else:
       # Otherwise the replace_with_shape is actually the replace_with values.
       replace_with = replace_with_shape[0]
-    a = a.astype(replaced_vals.dtype.type)
-    return {'a': a, 'mask': mask, 'replace_with': replace_with}
+    a = a.astype(replaced_vals.dtype.type, copy=False)
+    return {'a': a, 'mask': ut.pass_on(mask), 'replace_with': replace_with}
@@ -19,6 +19,7 @@ class Reshape(ta.Tank):
 
   slot_keys = ['a', 'shape']
   tube_keys = ['target', 'old_shape']
+  alias_keys = {'target': ['a']}
 
   def _pour(self, a, shape):
     """Execute the Flatten tank (operation) in the pour (forward) direction.
@@ -41,7 +42,7 @@ class Reshape(ta.Tank):
 
     """
     old_shape = a.shape
-    target = a.reshape(shape)
+    target = ut.read_only(a.reshape(shape))
     return {'target': target, 'old_shape': old_shape}
 
   def _pump(self, target, old_shape):
@@ -65,4 +66,4 @@ class Reshape(ta.Tank):
 
     """
     shape = target.shape
-    return {'a': target.reshape(old_shape), 'shape': shape}
+    return {'a': ut.read_only(target.reshape(old_shape)), 'shape': shape}
@@ -18,6 +18,7 @@ class Shape(ta.Tank):
 
   slot_keys = ['a']
   tube_keys = ['target', 'a']
+  alias_keys = {'a': ['a']}
 
   def _pour(self, a):
     """
@@ -37,7 +38,7 @@ class Shape(ta.Tank):
     )
 
     """
-    return {'target': list(a.shape), 'a': ut.maybe_coppy(a)}
+    return {'target': list(a.shape), 'a': ut.pass_on(a)}
 
   def _pump(self, target, a):
     """Execute the Shape tank (operation) in the pump (backward) direction.
@@ -57,4 +58,4 @@ class Shape(ta.Tank):
     )
 
     """
-    return {'a': ut.maybe_coppy(a)}
+    return {'a': ut.pass_on(a)}
@@ -18,6 +18,7 @@ class Split(ta.Tank):
 
   slot_keys = ['a', 'indices', 'axis']
   tube_keys = ['target', 'indices', 'axis']
+  alias_keys = {'target': ['a'], 'indices': ['indices']}
 
   def _pour(self, a, indices, axis):
     """Execute the Split tank (operation) in the pour (forward) direction.
@@ -43,7 +44,9 @@ class Split(ta.Tank):
     )
 
     """
-    return {'target': np.split(a, indices, axis=axis), 'indices': indices, 'axis': axis}
+    # The pieces are views of 'a', so they're passed on read only.
+    target = [ut.read_only(t) for t in np.split(a, indices, axis=axis)]
+    return {'target': target, 'indices': ut.pass_on(indices), 'axis': axis}
 
   def _pump(self, target, indices, axis):
     """Execute the Split tank (operation) in the pump (backward) direction.
@@ -70,4 +73,4 @@ class Split(ta.Tank):
 
     """
     a = np.concatenate(target, axis=axis)
-    return {'a': a, 'indices': indices, 'axis': axis}
+    return {'a': a, 'indices': ut.pass_on(indices), 'axis': axis}
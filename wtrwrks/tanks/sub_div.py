@@ -0,0 +1,207 @@
+"""SubDiv tank definition."""
+import wtrwrks.waterworks.tank as ta
+import wtrwrks.tanks.utils as ut
+import numpy as np
+
+
+class SubDiv(ta.Tank):
+  """The defintion of the SubDiv tank. A Sub tank followed by a Div tank, i.e. (a - sub) / div, fused into a single operation so that the division can be done in place on the result of the subtraction instead of allocating another full size array. Outputs exactly the same tubes as the two tanks would, so it can be swapped in for them by the optimizer.
+
+  Attributes
+  ----------
+  slot_keys: list of strs
+    The names off all the tank's slots, i.e. inputs in the pour (forward) direction, or outputs in the pump (backward) direction
+  tubes: list of strs
+    The names off all the tank's tubes, i.e. outputs in the pour (forward) direction,
+
+  """
+  slot_keys = ['a', 'sub', 'div']
+  tube_keys = ['target', 'sub_smaller_size_array', 'sub_a_is_smaller', 'div_smaller_size_array', 'div_a_is_smaller', 'missing_vals', 'remainder']
+  side_channel_keys = ['sub_smaller_size_array', 'sub_a_is_smaller', 'div_smaller_size_array', 'div_a_is_smaller', 'missing_vals', 'remainder']
+  alias_keys = {'sub_smaller_size_array': ['a', 'sub'], 'div_smaller_size_array': ['div']}
+
+  def _pour(self, a, sub, div):
+    """Execute the SubDiv tank (operation) in the pour (forward) direction.
+
+    Parameters
+    ----------
+    a: np.ndarray
+      The object to subtract something from.
+    sub: np.ndarray
+      The object which is subtracted from 'a'.
+    div: np.ndarray
+      The object which divides the difference.
+
+    Returns
+    -------
+    dict(
+      target: np.ndarray
+        The result of (a - sub) / div.
+      sub_smaller_size_array: np.ndarray
+        Either 'a' or 'sub' depending on which has fewer elements.
+      sub_a_is_smaller: bool
+        Whether or not 'a' is the smaller size array of the subtraction.
+      div_smaller_size_array: np.ndarray
+        Either 'a - sub' or 'div' depending on which has fewer elements.
+      div_a_is_smaller: bool
+        Whether or not 'a - sub' is the smaller size array of the division.
+      missing_vals: np.ndarray
+        The values from either 'a - sub' or 'div' that were lost when the other array had a zero in that location.
+      remainder: np.ndarray
+        The remainder of the division in the case that both arrays are of integer type.
+    )
+
+    """
+    if type(a) is not np.ndarray:
+      a = np.array(a)
+    if type(sub) is not np.ndarray:
+      sub = np.array(sub)
+    if type(div) is not np.ndarray:
+      div = np.array(div)
+
+    sub_a_is_smaller = a.size < sub.size
+    if sub_a_is_smaller:
+      sub_smaller_size_array = ut.pass_on(a)
+    else:
+      sub_smaller_size_array = ut.pass_on(sub)
+
+    diff = _sub(a, sub)
+
+    div_a_is_smaller = diff.size < div.size
+    if div_a_is_smaller:
+      div_smaller_size_array = ut.pass_on(diff)
+    else:
+      div_smaller_size_array = ut.pass_on(div)
+
+    if not div_a_is_smaller and _fits_in_place(diff, div, 'f'):
+      # Overwrite the difference with the quotient. The values of the
+      # difference that get erased by a zero in 'div' are only needed in the
+      # rare case where there is one, so recalculate them then.
+      target = np.divide(diff, div, out=diff)
+      erased = np.isposinf(target) | np.isneginf(target) | np.isnan(target)
+      if erased.any():
+        missing_vals = _sub(a, sub)[erased]
+      else:
+        missing_vals = np.array([], dtype=target.dtype)
+      remainder = np.array([], dtype=target.dtype)
+    else:
+      target = np.array(diff / div)
+      if div_a_is_smaller:
+        missing_vals = div[(target == 0)]
+      else:
+        missing_vals = diff[np.isposinf(target) | np.isneginf(target) | np.isnan(target)]
+
+      if diff.dtype in (np.int32, np.int64) and div.dtype in (np.int32, np.int64):
+        if (div == 0).any():
+          raise ZeroDivisionError("Integer division by zero is not supported.")
+        remainder = np.array(np.remainder(diff, div))
+      else:
+        remainder = np.array([], dtype=target.dtype)
+
+    return {'target': target, 'sub_smaller_size_array': sub_smaller_size_array, 'sub_a_is_smaller': sub_a_is_smaller, 'div_smaller_size_array': div_smaller_size_array, 'div_a_is_smaller': div_a_is_smaller, 'missing_vals': missing_vals, 'remainder': remainder}
+
+  def _pour_forward(self, a, sub, div):
+    """Subtract and divide the arrays without saving anything needed to undo it."""
+    diff = _sub(np.array(a), np.array(sub))
+    div = np.array(div)
+    if diff.dtype in (np.int32, np.int64) and div.dtype in (np.int32, np.int64):
+      if (div == 0).any():
+        raise ZeroDivisionError("Integer division by zero is not supported.")
+    if _fits_in_place(diff, div, 'f'):
+      return {'target': np.divide(diff, div, out=diff)}
+    return {'target': np.array(diff / div)}
+
+  def _pump(self, target, sub_smaller_size_array, sub_a_is_smaller, div_smaller_size_array, div_a_is_smaller, missing_vals, remainder):
+    """Execute the SubDiv tank (operation) in the pump (backward) direction.
+
+    Parameters
+    ----------
+    target: np.ndarray
+      The result of (a - sub) / div.
+    sub_smaller_size_array: np.ndarray
+      Either 'a' or 'sub' depending on which has fewer elements.
+    sub_a_is_smaller: bool
+      Whether or not 'a' is the smaller size array of the subtraction.
+    div_smaller_size_array: np.ndarray
+      Either 'a - sub' or 'div' depending on which has fewer elements.
+    div_a_is_smaller: bool
+      Whether or not 'a - sub' is the smaller size array of the division.
+    missing_vals: np.ndarray
+      The values from either 'a - sub' or 'div' that were lost when the other array had a zero in that location.
+    remainder: np.ndarray
+      The remainder of the division in the case that both arrays are of integer type.
+
+    Returns
+    -------
+    dict(
+      a: np.ndarray
+        The object to subtract something from.
+      sub: np.ndarray
+        The object which is subtracted from 'a'.
+      div: np.ndarray
+        The object which divides the difference.
+    )
+
+    """
+    # Undo the division.
+    if div_a_is_smaller:
+      diff = ut.pass_on(div_smaller_size_array)
+      div = np.array(diff / target)
+      div[(target == 0)] = missing_vals
+    else:
+      diff = target * div_smaller_size_array
+      if target.dtype in (np.int32, np.int64):
+        diff = np.array(diff + remainder)
+      div = ut.pass_on(div_smaller_size_array)
+      diff[np.isposinf(target) | np.isneginf(target) | np.isnan(target)] = missing_vals
+
+    # Undo the subtraction. Unless the difference was shared from the smaller
+    # size array it's a temporary, so it can be added to in place.
+    if sub_a_is_smaller:
+      a = ut.pass_on(sub_smaller_size_array)
+      sub = np.array(a - diff)
+    else:
+      if _fits_in_place(diff, sub_smaller_size_array):
+        a = np.add(diff, sub_smaller_size_array, out=diff)
+      else:
+        a = np.array(diff + sub_smaller_size_array)
+      sub = ut.pass_on(sub_smaller_size_array)
+
+    return {'a': a, 'sub': sub, 'div': div}
+
+
+def _sub(a, b):
+  """Subtract two arrays, always returning a newly allocated array."""
+  diff = a - b
+  if type(diff) is not np.ndarray:
+    diff = np.array(diff)
+  return diff
+
+
+def _fits_in_place(a, b, kinds=None):
+  """Whether the result of an elementwise operation between 'a' and 'b' can be written into 'a' without changing any of its values, i.e. it has the same shape and dtype as 'a', and 'a' is writable.
+
+  Parameters
+  ----------
+  a: np.ndarray
+    The array to write the result into.
+  b: np.ndarray
+    The other operand.
+  kinds: str or None
+    If given, the dtype kinds of 'a' to allow.
+
+  Returns
+  -------
+  bool
+    Whether or not the result can be written into 'a'.
+
+  """
+  if type(a) is not np.ndarray or not a.ndim or not a.flags.writeable:
+    return False
+  if kinds is not None and a.dtype.kind not in kinds:
+    return False
+  try:
+    shape = np.broadcast(a, b).shape
+  except ValueError:
+    return False
+  return shape == a.shape and np.result_type(a, b) == a.dtype
@@ -17,6 +17,7 @@ import wtrwrks.tanks.datetime_to_num as dtn
 import wtrwrks.tanks.tokenize as to
 import wtrwrks.tanks.lower_case as lc
 import wtrwrks.tanks.half_width as hw
+import wtrwrks.tanks.interp as ip
 import wtrwrks.tanks.lemmatize as lm
 import wtrwrks.tanks.split as sp
 import wtrwrks.tanks.partition as pa
@@ -490,6 +491,53 @@ def half_width(strings=empty, waterwork=None, name=None):
   return tank.get_tubes(), tank.get_slots()
 
 
+def interp(a=empty, xp=empty, fp=empty, waterwork=None, name=None):
+  """Map an array through the piecewise linear function that goes through the points (xp, fp), clamping anything outside the range of xp, while saving the values the inverse map doesn't give back exactly.
+
+  Parameters
+  ----------
+  a: np.ndarray
+    The array to map.
+  xp: np.ndarray
+    The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+  fp: np.ndarray
+    The strictly increasing, one dimensional y coordinates of the points.
+
+  waterwork : Waterwork or None
+    The waterwork to add the tank (operation) to. Default's to the _default_waterwork.
+  name : str or None
+      The name of the tank (operation) within the waterwork
+
+  Returns
+  -------
+  tubes: dict(
+    target: np.ndarray
+      The mapped array.
+    xp: np.ndarray
+      The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+    fp: np.ndarray
+      The strictly increasing, one dimensional y coordinates of the points.
+    mask: np.ndarray of bools
+      Where the inverse map doesn't give back the values of 'a'.
+    missing_vals: np.ndarray
+      The values of 'a' where mask is True, and default values everywhere else.
+  )
+    A dictionary where the keys are the tube names and the values are the tube objects of the Interp tank.
+  slots: dict(
+      a: np.ndarray
+        The array to map.
+      xp: np.ndarray
+        The non decreasing x coordinates of the points along the first dimension. The rest of the dimensions must broadcast with 'a'.
+      fp: np.ndarray
+        The strictly increasing, one dimensional y coordinates of the points.
+  )
+    A dictionary where the keys are the slot names and the values are the slot objects of the Interp tank.
+
+  """
+  tank = ip.Interp(a=a, xp=xp, fp=fp, waterwork=waterwork, name=name)
+  return tank.get_tubes(), tank.get_slots()
+
+
 def iter_dict(a=empty, keys=None, type_dict=None, waterwork=None, name=None):
   """Create a dictionary of tubes from a tube which is dictionary valued. Necessary if one wants to operate on the individual values of a dictionary rather then the entire dictionary.
 
@@ -1273,7 +1321,7 @@ greater = bo.create_two_arg_bool_tank(np.greater, class_name='Greater')
 greater_equal = bo.create_two_arg_bool_tank(np.greater_equal, class_name='GreaterEqual')
 less = bo.create_two_arg_bool_tank(np.less, class_name='Less')
 less_equal = bo.create_two_arg_bool_tank(np.less_equal, class_name='LessEqual')
-isin = bo.create_two_arg_bool_tank(np.isin, class_name='IsIn')
+isin = bo.create_two_arg_bool_tank(ut.isin, class_name='IsIn')
 
 max = rd.create_one_arg_reduce_tank(np.max, class_name='Max')
 min = rd.create_one_arg_reduce_tank(np.min, class_name='Min')
@@ -23,6 +23,7 @@ class Tokenize(ta.Tank):
 
   slot_keys = ['strings', 'tokenizer', 'detokenizer', 'max_len']
   tube_keys = ['target', 'tokenizer', 'detokenizer', 'diff']
+  side_channel_keys = ['tokenizer', 'detokenizer', 'diff']
 
   def _pour(self, strings, tokenizer, max_len, detokenizer=lambda a: ' '.join(a)):
     """Execute the Tokenize tank (operation) in the pour (forward) direction.
@@ -59,33 +60,18 @@ class Tokenize(ta.Tank):
     if not strings.size:
       return {'target': ut.maybe_copy(strings), 'diff': ut.maybe_copy(strings), 'tokenizer': tokenizer, 'detokenizer': detokenizer}
 
-    all_tokens = []
-    all_diffs = []
-
-
-    for string in strings.flatten():
-      # Tokenize the string, and regularize the length of the array by padding
-      # with '' to fill out the array if it's too small or truncated if it's
-      # too long.
-      tokens = np.array(tokenizer(string))
-      if tokens.size < max_len:
-        num = max_len - tokens.size
-        tokens = np.concatenate([tokens, np.full([num], '')])
-      else:
-        tokens = tokens[:max_len]
+    token_array = _tokenize(strings, tokenizer, max_len)
 
-      all_tokens.append(tokens)
-
-      # Detokenize the tokens and reconstruct the orignal string from the
-      # diff_string
+    # Detokenize the tokens and reconstruct the orignal string from the
+    # diff_string
+    all_diffs = []
+    for tokens, string in zip(token_array, strings.flatten()):
       processed = detokenizer(tokens)
       diff = di.get_diff_string(processed, string)
       all_diffs.append(diff)
 
-    # Combine all the tokens arrays into a single array and reshape to the
-    # shape of the original strings array with an additional dimesion of size
-    # max_len.
-    token_array = np.stack(all_tokens)
+    # Reshape the tokens to the shape of the original strings array with an
+    # additional dimesion of size max_len.
     target = np.reshape(token_array, list(strings.shape) + [max_len])
 
     # Keep all the string diffs and reshape it to match the original strings
@@ -95,6 +81,35 @@ class Tokenize(ta.Tank):
 
     return {'target': target.astype(strings.dtype), 'diff': diff, 'tokenizer': tokenizer, 'detokenizer': detokenizer}
 
+  def _pour_forward(self, strings, tokenizer, max_len, detokenizer=None):
+    """Execute the Tokenize tank (operation) in the pour (forward) direction, without detokenizing the strings to calculate the diffs.
+
+    Parameters
+    ----------
+    strings: np.ndarray of strings
+      The array of strings to tokenize.
+    tokenizer: func
+      Function which converts a string into a list of strings.
+    max_len: int
+      The maximum number of tokens. Defines the size of the added dimension.
+
+    Returns
+    -------
+    dict(
+      target: np.ndarray
+        The array of tokenized strings. Will have rank = rank('a') + 1 where the last dimesion will have size max_len.
+    )
+
+    """
+    strings = np.array(strings)
+
+    if not strings.size:
+      return {'target': ut.maybe_copy(strings)}
+
+    target = np.reshape(_tokenize(strings, tokenizer, max_len), list(strings.shape) + [max_len])
+
+    return {'target': target.astype(strings.dtype)}
+
   def _pump(self, target, diff, tokenizer, detokenizer):
     """Execute the Tokenize tank (operation) in the pump (backward) direction.
 
@@ -139,3 +154,34 @@ class Tokenize(ta.Tank):
     # Reshape to the original shape.
     strings = np.reshape(all_strings, target.shape[:-1])
     return {'strings': strings, 'tokenizer': tokenizer, 'max_len': max_len, 'detokenizer': detokenizer}
+
+
+def _tokenize(strings, tokenizer, max_len):
+  """Tokenize each of the strings, and regularize the number of tokens by padding with '' if there are too few or truncating if there are too many.
+
+  Parameters
+  ----------
+  strings: np.ndarray of strings
+    The non empty array of strings to tokenize.
+  tokenizer: func
+    Function which converts a string into a list of strings.
+  max_len: int
+    The number of tokens to give each string.
+
+  Returns
+  -------
+  np.ndarray of strings
+    The tokens of each of the flattened strings, with shape [strings.size, max_len].
+
+  """
+  all_tokens = []
+  for string in strings.flatten():
+    tokens = np.array(tokenizer(string))
+    if tokens.size < max_len:
+      num = max_len - tokens.size
+      tokens = np.concatenate([tokens, np.full([num], '')])
+    else:
+      tokens = tokens[:max_len]
+
+    all_tokens.append(tokens)
+  return np.stack(all_tokens)
@@ -1,6 +1,7 @@
 """Transpose tank definition."""
 import wtrwrks.waterworks.waterwork_part as wp
 import wtrwrks.waterworks.tank as ta
+import wtrwrks.tanks.utils as ut
 import numpy as np
 
 
@@ -18,6 +19,7 @@ class Transpose(ta.Tank):
 
   slot_keys = ['a', 'axes']
   tube_keys = ['target', 'axes']
+  alias_keys = {'target': ['a']}
 
   def _pour(self, a, axes):
     """Execute the Transpose tank (operation) in the pour (forward) direction.
@@ -39,7 +41,7 @@ class Transpose(ta.Tank):
     )
 
     """
-    return {'target': np.transpose(a, axes=axes), 'axes': axes}
+    return {'target': ut.read_only(np.transpose(a, axes=axes)), 'axes': axes}
 
   def _pump(self, target, axes):
     """Execute the Transpose tank (operation) in the pump (backward) direction.
@@ -63,5 +65,5 @@ class Transpose(ta.Tank):
     """
     # The inverse of a permutation is simply the argsort of that permutation.
     trans_axes = np.argsort(axes)
-    a = np.transpose(target, axes=trans_axes)
+    a = ut.read_only(np.transpose(target, axes=trans_axes))
     return {'a': a, 'axes': axes}
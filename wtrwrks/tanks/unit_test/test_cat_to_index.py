@@ -1,6 +1,8 @@
 import unittest
 import wtrwrks.utils.test_helpers as th
 import wtrwrks.tanks.tank_defs as td
+import wtrwrks.tanks.utils as ut
+import wtrwrks.waterworks.waterwork as wa
 import numpy as np
 
 
@@ -57,5 +59,76 @@ class TestCatToIndex(th.TestTank):
       type_dict={'cats': np.ndarray, 'cat_to_index_map': dict}
     )
 
+  def test_nan(self):
+    cat_to_index_map = {0.0: 0, np.nan: 1, 3.0: 2}
+    self.pour_pump(
+      td.cat_to_index,
+      {'cats': np.array([[np.nan, 3.], [1., 0.]]), 'cat_to_index_map': cat_to_index_map},
+      {
+        'target': np.array([[1, 2], [-1, 0]]),
+        'missing_vals': [[0., 0.], [1., 0.]],
+        'cat_to_index_map': cat_to_index_map,
+        'input_dtype': np.float64
+      },
+      type_dict={'cats': np.ndarray, 'cat_to_index_map': dict}
+    )
+
+  def test_unicode(self):
+    # str keys match unicode values, as they do in a dict.
+    cat_to_index_map = {'a': 0, 'bb': 1, u'\xe9': 2}
+    self.pour_pump(
+      td.cat_to_index,
+      {'cats': np.array([u'bb', u'\xe9', u'cccc', u'a']), 'cat_to_index_map': cat_to_index_map},
+      {
+        'target': np.array([1, 2, -1, 0]),
+        'missing_vals': [u'', u'', u'cccc', u''],
+        'cat_to_index_map': cat_to_index_map,
+        'input_dtype': np.dtype('U4')
+      },
+      type_dict={'cats': np.ndarray, 'cat_to_index_map': dict}
+    )
+
+  def test_mixed_keys(self):
+    # Keys that can't be sorted are looked up one at a time.
+    with wa.Waterwork() as ww:
+      tubes, _ = td.cat_to_index(np.array([1, 2, 1]), {'a': 0, 1: 1})
+    self.assertEqual(tubes['target'].get_val().tolist(), [1, -1, 1])
+    self.assertEqual(tubes['missing_vals'].get_val().tolist(), [0, 2, 0])
+
+  def test_sorted_keys(self):
+    cat_to_index_map = {'b': 0, 'a': 1, 'c': 2}
+    keys = ut.sorted_keys(cat_to_index_map)
+    self.assertEqual(keys.keys.tolist(), ['a', 'b', 'c'])
+    self.assertEqual(keys.values.tolist(), [1, 0, 2])
+    self.assertIs(ut.sorted_keys(keys), keys)
+    self.assertIsInstance(ut.presort(cat_to_index_map), ut.SortedKeys)
+    mixed = {'a': 0, 1: 1}
+    self.assertIs(ut.presort(mixed), mixed)
+    self.assertEqual(keys.inverse().values.tolist(), ['b', 'a', 'c'])
+    self.assertEqual(ut.isin(np.array([['c', 'd']]), ['a', 'c']).tolist(), [[True, False]])
+
+    with self.assertRaises(ValueError):
+      ut.sorted_keys({'a': 0, 'b': 0}).inverse()
+
+  def test_changed_map(self):
+    # A map changed in place is sorted again rather than reused.
+    cat_to_index_map = {'a': 0, 'b': 1}
+    with wa.Waterwork() as ww:
+      tubes, _ = td.cat_to_index(np.array(['a', 'b']), cat_to_index_map)
+    self.assertEqual(tubes['target'].get_val().tolist(), [0, 1])
+
+    cat_to_index_map['a'], cat_to_index_map['b'] = 1, 0
+    with wa.Waterwork() as ww:
+      tubes, _ = td.cat_to_index(np.array(['a', 'b']), cat_to_index_map)
+    self.assertEqual(tubes['target'].get_val().tolist(), [1, 0])
+
+    # A presorted map gives the same results as the dict it was built from.
+    presorted = ut.presort(cat_to_index_map)
+    with wa.Waterwork() as ww:
+      tubes, _ = td.cat_to_index(np.array(['a', 'b', 'c']), presorted)
+    self.assertEqual(tubes['target'].get_val().tolist(), [1, 0, -1])
+    self.assertIs(tubes['cat_to_index_map'].get_val(), presorted)
+    self.assertEqual(ut.isin(np.array(['b', 'c']), ut.presort(['a', 'b'])).tolist(), [True, False])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import wtrwrks.utils.test_helpers as th
+import wtrwrks.tanks.tank_defs as td
+import wtrwrks.waterworks.waterwork as wa
+import numpy as np
+
+
+class TestInterp(th.TestTank):
+
+  def test_one_d(self):
+    self.pour_pump(
+      td.interp,
+      {
+        'a': np.array([-1., 0.5, 1., 2., 3.]),
+        'xp': np.array([0., 1., 2.]),
+        'fp': np.array([0., 0.5, 1.])
+      },
+      {
+        'target': np.array([0., 0.25, 0.5, 1., 1.]),
+        'xp': np.array([0., 1., 2.]),
+        'fp': np.array([0., 0.5, 1.]),
+        'mask': np.array([True, False, False, False, True]),
+        'missing_vals': np.array([-1., 0., 0., 0., 3.])
+      },
+      test_type=False
+    )
+
+  def test_per_position(self):
+    self.pour_pump(
+      td.interp,
+      {
+        'a': np.array([[0.5, 15.], [2., 10.], [0., 25.]]),
+        'xp': np.array([[0., 10.], [1., 20.]]),
+        'fp': np.array([0., 1.])
+      },
+      {
+        'target': np.array([[0.5, 0.5], [1., 0.], [0., 1.]]),
+        'xp': np.array([[0., 10.], [1., 20.]]),
+        'fp': np.array([0., 1.]),
+        'mask': np.array([[False, False], [True, False], [False, True]]),
+        'missing_vals': np.array([[0., 0.], [2., 0.], [0., 25.]])
+      },
+      test_type=False
+    )
+
+  def test_round_trip(self):
+    rs = np.random.RandomState(0)
+    for a in [rs.normal(size=(100, 3)), rs.randint(-50, 50, size=(100, 3))]:
+      xp = np.sort(rs.normal(size=(11, 3)) * 20, axis=0)
+      with wa.Waterwork() as ww:
+        tubes, _ = td.interp(a, xp, np.linspace(0, 1, 11))
+      tank = tubes['target'].tank
+
+      out_dict = tank.pour(a=a, xp=xp, fp=np.linspace(0, 1, 11))
+      self.assertTrue(((out_dict['target'] >= 0) & (out_dict['target'] <= 1)).all())
+      self.assertTrue(np.allclose(out_dict['target'][:, 0], np.interp(a[:, 0], xp[:, 0], np.linspace(0, 1, 11))))
+      self.assertTrue(np.array_equal(tank.pump(**out_dict)['a'], a))
+
+  def test_errors(self):
+    with wa.Waterwork():
+      with self.assertRaises(ValueError):
+        td.interp(np.array([1.]), np.array([0., 1.]), np.array([1., 0.]))
+      with self.assertRaises(ValueError):
+        td.interp(np.array([1.]), np.array([0., 1., 2.]), np.array([0., 1.]))
+
+if __name__ == "__main__":
+  unittest.main()
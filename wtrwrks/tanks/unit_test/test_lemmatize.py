@@ -2,7 +2,11 @@
 import unittest
 import wtrwrks.utils.test_helpers as th
 import wtrwrks.tanks.tank_defs as td
+import wtrwrks.tanks.utils as ut
+import wtrwrks.waterworks.waterwork as wa
 import numpy as np
+import cPickle as pickle
+import threading
 import tinysegmenter
 from nltk.stem.wordnet import WordNetLemmatizer
 from nltk.corpus import wordnet
@@ -39,6 +43,10 @@ def basic_lemmatizer(string):
   return lemma
 
 
+def upper_case(string):
+  return string.upper()
+
+
 class TestLemmatize(th.TestTank):
   def test_scalar(self):
     strings = "running"
@@ -113,5 +121,78 @@ class TestLemmatize(th.TestTank):
       test_type=False
     )
 
+  def test_cached(self):
+    calls = []
+
+    def lemmatizer(string):
+      calls.append(string)
+      return string[:-1] if string.endswith('s') else string
+
+    strings = np.array([['cats', 'dogs', 'cats', ''], ['cat', 'cats', '', '']])
+    target = np.array([['cat', 'dog', 'cat', ''], ['cat', 'cat', '', '']])
+    diff = np.array([
+      ['[["i", 3, 3, "s"]]', '[["i", 3, 3, "s"]]', '[["i", 3, 3, "s"]]', '[]'],
+      ['[]', '[["i", 3, 3, "s"]]', '[]', '[]']
+    ])
+    self.pour_pump(
+      td.lemmatize,
+      {
+        'strings': strings,
+        'lemmatizer': lemmatizer,
+      },
+      {
+        'target': target,
+        'diff': diff,
+        'lemmatizer': lemmatizer,
+      },
+      test_type=False
+    )
+
+    # The lemmatizer is only run once on each unique string.
+    calls[:] = []
+    with wa.Waterwork():
+      td.lemmatize(strings=strings, lemmatizer=lemmatizer)
+    self.assertEqual(sorted(calls), ['', 'cat', 'cats', 'dogs'])
+
+    # A cached one only runs on strings it hasn't seen recently, across pours.
+    cached = ut.CachedStringMap(lemmatizer, max_size=3)
+    calls[:] = []
+    with wa.Waterwork():
+      tubes, _ = td.lemmatize(strings=strings, lemmatizer=cached)
+      self.assertTrue(np.array_equal(tubes['target'].get_val(), target))
+      self.assertTrue(np.array_equal(tubes['diff'].get_val(), diff))
+      td.lemmatize(strings=strings[:, 1:2], lemmatizer=cached)
+      self.assertEqual(sorted(calls), ['', 'cat', 'cats', 'dogs'])
+
+      # The empty string was the least recently used, so it was thrown out.
+      td.lemmatize(strings=strings[:, 2:], lemmatizer=cached)
+      self.assertEqual(sorted(calls), ['', '', 'cat', 'cats', 'dogs'])
+      self.assertEqual(len(cached._cache), 3)
+
+  def test_cached_threads(self):
+    # A cached lemmatizer can be shared by pours on different threads, and
+    # pickled to be sent to other processes.
+    cached = ut.CachedStringMap(upper_case, max_size=5)
+    strings = ['word' + str(num % 20) for num in xrange(2000)]
+    errors = []
+
+    def run():
+      try:
+        for string in strings:
+          self.assertEqual(cached.map(string)[0], string.upper())
+      except Exception as e:
+        errors.append(e)
+    threads = [threading.Thread(target=run) for _ in xrange(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(errors, [])
+    self.assertEqual(len(cached._cache), 5)
+
+    unpickled = pickle.loads(pickle.dumps(cached))
+    self.assertEqual(unpickled._cache, cached._cache)
+    self.assertEqual(unpickled('cat'), 'CAT')
+
 if __name__ == "__main__":
     unittest.main()
@@ -2,6 +2,7 @@
 import unittest
 import wtrwrks.utils.test_helpers as th
 import wtrwrks.tanks.tank_defs as td
+import wtrwrks.tanks.utils as ut
 import numpy as np
 import tinysegmenter
 
@@ -67,5 +68,14 @@ class TestLowerCase(th.TestTank):
       test_type=False
     )
 
+  def test_dtype(self):
+    # The target is as wide as the strings, so that longer strings (e.g. an
+    # unknown token) can be put into it later.
+    strings = np.array([u'A', u'a', u'B', u'aaaaaaa'])[:3]
+    target, diff = ut.map_strings(lambda s: s.lower(), strings)
+    self.assertEqual(target.dtype, strings.dtype)
+    self.assertEqual(target.tolist(), [u'a', u'a', u'b'])
+    self.assertEqual(ut.map_unique(lambda s: s.lower(), strings).dtype, strings.dtype)
+
 if __name__ == "__main__":
     unittest.main()
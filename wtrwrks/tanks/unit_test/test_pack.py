@@ -222,5 +222,59 @@ class TestPack(th.TestTank):
     )
 
 
+  def test_empty_rows(self):
+    # Rows of all default_vals are added to the current group without
+    # starting a new one, and a slice whose rows all fit gets padded with
+    # empty rows.
+    a = np.array([
+      [
+        [0, 0, 0],
+        [1, 1, 1],
+        [0, 0, 0],
+        [2, 0, 0],
+        [0, 2, 2],
+      ],
+      [
+        [0, 0, 0],
+        [0, 0, 0],
+        [3, 0, 0],
+        [0, 0, 0],
+        [0, 0, 0],
+      ]
+    ])
+    target = np.array([
+      [
+        [1, 1, 1],
+        [2, 2, 2],
+      ],
+      [
+        [3, 0, 0],
+        [0, 0, 0],
+      ]
+    ])
+    ends = np.array([
+      [
+        [0, 0, 1],
+        [1, 0, 1],
+      ],
+      [
+        [1, 0, 0],
+        [0, 0, 0],
+      ]
+    ], dtype=bool)
+    self.pour_pump(
+      td.pack,
+      {
+        'a': a,
+        'default_val': 0
+      },
+      {
+        'target': target,
+        'default_val': 0,
+        'is_default': a == 0,
+        'ends': ends
+      },
+    )
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
 """Simple functions that help out in tank definitions."""
+import wtrwrks.string_manipulations.diff as di
+import collections
 import copy
 import numpy as np
+import threading
 
 
 def maybe_copy(a):
@@ -25,3 +28,392 @@ def maybe_copy(a):
     return copy.copy(a)
 
   return copy.copy(a)
+
+
+def read_only(a):
+  """Get a read only view of the array 'a', so it can be handed to another tank without copying it. Anything other than an array is returned as is.
+
+  Parameters
+  ----------
+  a : object
+      The object to pass on.
+
+  Returns
+  -------
+  object
+      A read only view of 'a' if it's an array, otherwise 'a' itself.
+
+  """
+  if type(a) is np.ndarray:
+    a = a.view()
+    a.setflags(write=False)
+  return a
+
+
+def share(a):
+  """Pass the object 'a' on to a tube which will share it with a slot (or another tube). Arrays are not copied but turned into read only views, so any tank that wants to change them in place has to make its own copy (see writable). Other mutable objects are copied as before.
+
+  Parameters
+  ----------
+  a : object
+      The object to pass on.
+
+  Returns
+  -------
+  object
+      A read only view of 'a' if it's an array, otherwise the (possibly) copied object.
+
+  """
+  if type(a) is np.ndarray:
+    return read_only(a)
+  return maybe_copy(a)
+
+
+def pass_on(a):
+  """Pass one of the tank's inputs on as exactly one of its outputs. An array that the tank owns, i.e. one that is writable and owns its memory, is handed over as is, since nothing else refers to it any more. Anything else is shared (see share). The tank must not change 'a' or output it anywhere else.
+
+  Parameters
+  ----------
+  a : object
+      The input to pass on.
+
+  Returns
+  -------
+  object
+      'a' itself, a read only view of it, or a copy of it.
+
+  """
+  if type(a) is np.ndarray and a.flags.writeable and a.flags.owndata:
+    return a
+  return share(a)
+
+
+def writable(a):
+  """Get a version of the array 'a' that can be changed in place. Arrays that are writable and own their memory, i.e. were freshly created by the tank that outputted them, are used as is. Anything else (read only arrays, views, other objects) is copied into a new array.
+
+  Parameters
+  ----------
+  a : object
+      The object to change in place.
+
+  Returns
+  -------
+  np.ndarray
+      'a' itself or a copy of it.
+
+  """
+  if type(a) is np.ndarray and a.flags.writeable and a.flags.owndata:
+    return a
+  return np.array(a, copy=True)
+
+
+class CachedStringMap(object):
+  """A function of a string (e.g. a lemmatizer) which remembers its results, along with the diffs needed to undo them, for the most recently used strings. Since the same words come up again and again, passing one of these in place of the function lets tanks skip most of the calls to it, not just within a pour but across all of them. It's safe to share between pours running on different threads.
+
+  Parameters
+  ----------
+  func : func
+    The function to cache the results of.
+  max_size : int
+    The maximum number of strings to remember the results of.
+
+  Attributes
+  ----------
+  func : func
+    The function to cache the results of.
+  max_size : int
+    The maximum number of strings to remember the results of.
+
+  """
+
+  def __init__(self, func, max_size=100000):
+    self.func = func
+    self.max_size = max_size
+    self._cache = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def __call__(self, string):
+    return self.map(string)[0]
+
+  def __getstate__(self):
+    """Leave out the lock, which can't be pickled."""
+    state = dict(self.__dict__)
+    del state['_lock']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._lock = threading.Lock()
+
+  def map(self, string):
+    """Get the result of the function on a string and the diff needed to get the string back from it.
+
+    Parameters
+    ----------
+    string : str
+      The string to run the function on.
+
+    Returns
+    -------
+    2-tuple
+      The result and the diff string.
+
+    """
+    with self._lock:
+      value = self._cache.pop(string, None)
+      if value is not None:
+        self._cache[string] = value
+        return value
+
+    # Run the function outside of the lock so other threads aren't held up by
+    # it. Two threads may both run it on the same string, which is harmless.
+    target = self.func(string)
+    value = (target, di.get_diff_string(target, string))
+
+    # Put the string at the end, throwing out the least recently used one if
+    # there are too many.
+    with self._lock:
+      self._cache.pop(string, None)
+      self._cache[string] = value
+      if len(self._cache) > self.max_size:
+        self._cache.popitem(last=False)
+    return value
+
+
+def map_strings(func, strings):
+  """Run a function on every string of an array and get the diffs needed to undo it. The function is only run (and the diff only found) once for each unique string, which is much quicker than running it on every element since the strings are mostly tokens, which repeat a lot, and padding.
+
+  Parameters
+  ----------
+  func : func or CachedStringMap
+    The function of a string.
+  strings : np.ndarray of strs
+    The strings to run it on.
+
+  Returns
+  -------
+  2-tuple of np.ndarrays
+    The results of the function and the diff strings, both the same shape as strings.
+
+  """
+  strings = np.asarray(strings)
+  if not strings.size:
+    return np.array(strings, copy=True), np.full(strings.shape, '[]')
+
+  uniques, inverse = np.unique(strings, return_inverse=True)
+  if isinstance(func, CachedStringMap):
+    values = [func.map(string) for string in uniques.tolist()]
+  else:
+    values = []
+    for string in uniques.tolist():
+      target = func(string)
+      values.append((target, di.get_diff_string(target, string)))
+
+  targets, diffs = zip(*values)
+  target = _unique_array(targets, strings.dtype)[inverse].reshape(strings.shape)
+  diff = np.array(diffs)[inverse].reshape(strings.shape)
+  return target, diff
+
+
+def map_unique(func, strings):
+  """Run a function on every string of an array, only running it once for each unique string. See map_strings.
+
+  Parameters
+  ----------
+  func : func
+    The function of a string.
+  strings : np.ndarray of strs
+    The strings to run it on.
+
+  Returns
+  -------
+  np.ndarray
+    The results of the function, the same shape as strings.
+
+  """
+  strings = np.asarray(strings)
+  if not strings.size:
+    return np.array(strings, copy=True)
+
+  uniques, inverse = np.unique(strings, return_inverse=True)
+  return _unique_array([func(string) for string in uniques.tolist()], strings.dtype)[inverse].reshape(strings.shape)
+
+
+def _unique_array(values, dtype):
+  """Make an array of the results for the unique strings which is at least as wide as the original strings, like np.char functions give, so later tanks can write strings as long as the inputs into it without them being truncated."""
+  values = np.array(values)
+  if values.dtype.kind in ('S', 'U') and dtype.kind in ('S', 'U'):
+    values = values.astype(np.promote_types(values.dtype, dtype), copy=False)
+  return values
+
+
+class SortedKeys(object):
+  """The keys of a dict (or the elements of a list) sorted into an array, along with the dict's values in the same order, so that whole arrays can be looked up at once with np.searchsorted instead of one element at a time. Build them with sorted_keys or presort.
+
+  Parameters
+  ----------
+  keys : list
+    The keys to look things up by. They must all be numbers or all be strings.
+  values : list or None
+    The values that go with each of the keys, if any.
+
+  Attributes
+  ----------
+  keys : np.ndarray
+    The sorted keys. Any NaNs are at the end.
+  values : np.ndarray or None
+    The values, in the same order as the keys.
+
+  """
+
+  def __init__(self, keys, values=None):
+    keys = np.array(keys)
+    order = np.argsort(keys, kind='mergesort')
+    self.keys = keys[order]
+    self.values = None if values is None else np.array(values)[order]
+    self._unicode_keys = None
+    self._inverse = None
+
+  def find(self, a):
+    """Find the elements of an array among the keys.
+
+    Parameters
+    ----------
+    a : np.ndarray
+      The elements to look for.
+
+    Returns
+    -------
+    2-tuple of np.ndarrays
+      Whether or not each element is one of the keys, and the position of the key if it is. Both the same shape as 'a'.
+
+    """
+    a = np.asarray(a)
+    keys = self.keys
+    if not len(keys) or not _comparable(keys.dtype, a.dtype):
+      return np.zeros(a.shape, dtype=bool), np.zeros(a.shape, dtype=np.int64)
+
+    # Python 2 compares str and unicode, so make numpy do the same.
+    if keys.dtype.kind == 'S' and a.dtype.kind == 'U':
+      if self._unicode_keys is None:
+        self._unicode_keys = keys.astype(np.unicode_)
+      keys = self._unicode_keys
+    elif keys.dtype.kind == 'U' and a.dtype.kind == 'S':
+      a = a.astype(np.unicode_)
+
+    positions = np.minimum(np.searchsorted(keys, a), len(keys) - 1)
+    found = keys[positions] == a
+    return found, positions
+
+  def isin(self, a):
+    """Whether or not each element of an array is one of the keys. Equivalent to np.isin(a, keys)."""
+    return self.find(a)[0]
+
+  def get(self, a, default):
+    """Map each element of an array to the value of its key, or to 'default' if it isn't one of the keys.
+
+    Parameters
+    ----------
+    a : np.ndarray
+      The elements to look up.
+    default : object
+      The value to give to the elements which aren't keys.
+
+    Returns
+    -------
+    np.ndarray
+      The values, the same shape as 'a'.
+
+    """
+    found, positions = self.find(a)
+    if not len(self.keys):
+      return np.full(found.shape, default)
+    return np.where(found, self.values[positions], default)
+
+  def inverse(self):
+    """Get the SortedKeys which maps the values back to their keys. Raises a ValueError if there is a value that more than one key has."""
+    if self._inverse is None:
+      inverse = SortedKeys(self.values, self.keys)
+      repeated = inverse.keys[1:] == inverse.keys[:-1]
+      if repeated.any():
+        raise ValueError("cat_to_index_map must be one-to-one. " + str(inverse.keys[1:][repeated][0]) + " appears twice.")
+      self._inverse = inverse
+    return self._inverse
+
+
+def _comparable(dtype, other_dtype):
+  """Whether or not arrays of the two types can be compared with each other element by element, i.e. both are numbers or both are strings."""
+  kinds = [dtype.kind, other_dtype.kind]
+  return all([k in 'biuf' for k in kinds]) or all([k in 'SU' for k in kinds])
+
+
+def _sortable(keys):
+  """Whether or not the keys can be put in a SortedKeys, i.e. they're all numbers or all strings."""
+  types = set([type(k) for k in keys])
+  return all([issubclass(t, (bool, int, long, float, np.number, np.bool_)) for t in types]) or all([issubclass(t, basestring) for t in types])
+
+
+def sorted_keys(keys):
+  """Sort the keys of a dict or list into a SortedKeys. Sorting is the expensive part of the lookups, so anything that looks up arrays in the same map over and over (e.g. a Transform's vocabulary) should sort it once with presort and pass the SortedKeys around instead of the map.
+
+  Parameters
+  ----------
+  keys : dict, list or SortedKeys
+    The dict (whose keys and values are used) or list. A SortedKeys is returned as is.
+
+  Returns
+  -------
+  SortedKeys or None
+    The sorted keys, or None if they can't be sorted, i.e. they're a mix of numbers and strings or other objects.
+
+  """
+  if isinstance(keys, SortedKeys):
+    return keys
+  if not _sortable(keys):
+    return None
+  if type(keys) is dict:
+    return SortedKeys(keys.keys(), keys.values())
+  return SortedKeys(keys)
+
+
+def presort(keys):
+  """Get the SortedKeys of a dict or list to give to a tank in its place (e.g. the cat_to_index_map of CatToIndex or the 'b' of IsIn), or the dict or list itself if its keys can't be sorted. The SortedKeys is a snapshot, so it has to be built again whenever the dict or list is changed.
+
+  Parameters
+  ----------
+  keys : dict or list
+    The dict (whose keys and values are used) or list.
+
+  Returns
+  -------
+  SortedKeys, dict or list
+    The sorted keys, or 'keys' if they can't be sorted.
+
+  """
+  sorted_keys_ = sorted_keys(keys)
+  if sorted_keys_ is None:
+    return keys
+  return sorted_keys_
+
+
+def isin(a, b):
+  """Whether or not each element of 'a' is in 'b', like np.isin. If 'b' is a SortedKeys (e.g. a vocabulary passed through presort) it isn't sorted again.
+
+  Parameters
+  ----------
+  a : np.ndarray
+    The elements to look for.
+  b : list, tuple, np.ndarray or SortedKeys
+    The elements to look among.
+
+  Returns
+  -------
+  np.ndarray of bools
+    The same shape as 'a'.
+
+  """
+  if isinstance(b, SortedKeys) or type(b) in (list, tuple):
+    keys = sorted_keys(b)
+    if keys is not None:
+      return keys.isin(a)
+  return np.isin(a, b)
@@ -1,7 +1,9 @@
 """Definition of the CatTransform."""
 import transform as n
+import wtrwrks.utils.accumulators as acc
 from wtrwrks.waterworks.empty import empty
 import wtrwrks.tanks.tank_defs as td
+import wtrwrks.tanks.utils as ut
 import wtrwrks.read_write.tf_features as feat
 import numpy as np
 import warnings
@@ -23,7 +25,10 @@ class CatTransform(n.Transform):
     The mapping from index number to category value.
   cat_val_to_index : dict
     The mapping from category value to index number.
-
+  max_categories : int or None
+    If valid_cats isn't given, only keep (at most) this many of the most frequent category values. They're found with a sketch of bounded size, so the fit takes a fixed amount of memory however many distinct values there are.
+  min_count : int or None
+    If valid_cats isn't given, only keep the category values that appear at least this many times.
 
   Attributes
   ----------
@@ -34,7 +39,7 @@ class CatTransform(n.Transform):
 
   """
 
-  attribute_dict = {'norm_mode': None, 'norm_axis': 0, 'name': '', 'valid_cats': None, 'mean': None, 'std': None, 'dtype': np.float64, 'input_dtype': None, 'index_to_cat_val': None, 'cat_val_to_index': None}
+  attribute_dict = {'norm_mode': None, 'norm_axis': 0, 'name': '', 'valid_cats': None, 'mean': None, 'std': None, 'dtype': np.float64, 'input_dtype': None, 'index_to_cat_val': None, 'cat_val_to_index': None, 'max_categories': None, 'min_count': None}
 
   def __len__(self):
     """Get the length of the vector outputted by the row_to_vector method."""
@@ -57,7 +62,9 @@ class CatTransform(n.Transform):
       Dictionay of only those tap dict values which are can't be inferred from the Transform itself.
 
     """
-    r_dict = {self._pre(k, prefix): tap_dict[self._pre(k, prefix)] for k in ['one_hots', 'missing_vals', 'indices']}
+    # Any outputs skipped by a forward only pour are left out.
+    keys = [self._pre(k, prefix) for k in ['one_hots', 'missing_vals', 'indices']]
+    r_dict = {k: tap_dict[k] for k in keys if k in tap_dict}
     return r_dict
 
   def _extract_pump_outputs(self, funnel_dict, prefix=''):
@@ -174,7 +181,7 @@ class CatTransform(n.Transform):
         'Sub_0/tubes/smaller_size_array': self.mean,
         'Sub_0/tubes/a_is_smaller': False,
         'missing_vals': pour_outputs['missing_vals'],
-        'CatToIndex_0/tubes/cat_to_index_map': self.cat_val_to_index,
+        'CatToIndex_0/tubes/cat_to_index_map': self._presorted_cat_val_to_index(),
         'CatToIndex_0/tubes/input_dtype': self.input_dtype
       }
     else:
@@ -183,7 +190,7 @@ class CatTransform(n.Transform):
         'one_hots': pour_outputs['one_hots'],
         'indices': pour_outputs['indices'],
         'missing_vals': pour_outputs['missing_vals'],
-        'CatToIndex_0/tubes/cat_to_index_map': self.cat_val_to_index,
+        'CatToIndex_0/tubes/cat_to_index_map': self._presorted_cat_val_to_index(),
         'CatToIndex_0/tubes/input_dtype': self.input_dtype
       }
     return self._pre(tap_dict, prefix)
@@ -213,6 +220,36 @@ class CatTransform(n.Transform):
     pour_outputs = self._pre(pour_outputs, prefix)
     return pour_outputs
 
+  def _presorted_cat_val_to_index(self):
+    """Get the cat_val_to_index with its keys sorted by wtrwrks.tanks.utils.presort, so the CatToIndex tank doesn't have to sort them on every call. It's built the first time it's asked for after the categories are set."""
+    def create_dict():
+      return {'cat_val_to_index': ut.presort(self.cat_val_to_index)}
+    return self._get_static_dict('presorted', create_dict)['cat_val_to_index']
+
+  def _sample_report(self, array, fraction):
+    """Estimate how much of the dataset the category values found from a sample of it cover.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The sample the transform was fit on.
+    fraction : float
+      The fraction of the rows of the dataset that are in the sample.
+
+    Returns
+    -------
+    dict
+      The estimated 'coverage' and 'unseen_fraction' of the dataset.
+
+    """
+    counts = acc.CategoryCounts()
+    counts.add(array)
+    if counts.values is None:
+      return self._coverage_report(np.array([]), np.array([], dtype=np.int64), np.array([], dtype=bool))
+
+    in_vocab = np.array([value in self.cat_val_to_index for value in counts.values.tolist()], dtype=bool)
+    return self._coverage_report(counts.values, counts.counts, in_vocab)
+
   def _setattributes(self, **kwargs):
     """Set the actual attributes of the Transform and do some value checks to make sure they valid inputs.
 
@@ -227,6 +264,26 @@ class CatTransform(n.Transform):
     if self.norm_mode not in (None, 'mean_std'):
       raise ValueError(self.norm_mode + " not a valid norm mode.")
 
+    if self.valid_cats is not None and (self.max_categories is not None or self.min_count is not None):
+      raise ValueError("Can't set max_categories or min_count along with valid_cats.")
+
+  def _frequent_cat_vals(self):
+    """Get the sorted category values seen by partial_fit which are frequent enough to keep, according to max_categories and min_count."""
+    counts = self._accumulators['counts']
+    if counts.values is None:
+      return []
+
+    cat_vals = counts.values
+    totals = counts.counts.reshape([len(cat_vals), -1]).sum(axis=1)
+    if self.min_count is not None:
+      cat_vals = cat_vals[totals >= self.min_count]
+      totals = totals[totals >= self.min_count]
+    if self.max_categories is not None:
+      # Stable sort, so ties go to the smaller category value.
+      cat_vals = cat_vals[np.argsort(-totals, kind='mergesort')[:self.max_categories]]
+
+    return sorted(set(cat_vals))
+
   def _get_array_attributes(self, prefix=''):
     """Get the dictionary that contain the original shapes of the arrays before being converted into tfrecord examples.
 
@@ -268,28 +325,49 @@ class CatTransform(n.Transform):
     att_dict = self._pre(att_dict, prefix)
     return att_dict
 
-  def calc_global_values(self, array, verbose=True):
-    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+  def begin_fit(self):
+    """Start calculating the global values of the Transform from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    super(CatTransform, self).begin_fit()
+
+    # Count the category values at each position along the first axis, the
+    # one hot means and standard deviations can be found from the counts. When
+    # only the most frequent are needed, keep a sketch ten times larger than
+    # the number of them, so the ones near the cut off are counted well.
+    if self.valid_cats is None and self.max_categories is not None:
+      self._accumulators['counts'] = acc.HeavyHitters(capacity=10 * self.max_categories, axis=0)
+    elif self.valid_cats is None or self.norm_mode == 'mean_std':
+      self._accumulators['counts'] = acc.CategoryCounts(axis=0)
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them.
 
     Parameters
     ----------
     array : np.ndarray
-      The entire dataset.
+      The chunk of the dataset.
+
+    """
+    super(CatTransform, self).partial_fit(array)
+    if 'counts' in self._accumulators:
+      self._accumulators['counts'].add(array)
+
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform from all the chunks fed to partial_fit since begin_fit was called.
+
+    Parameters
+    ----------
     verbose : bool
       Whether or not to print out warnings.
 
     """
-    # Set the input dtype
-    self.input_dtype = array.dtype
-    self.input_shape = array.shape
-
-    # Pull out the relevant column
+    super(CatTransform, self).finish_fit(verbose=verbose)
+    self._clear_static_dicts()
 
     # Get all the unique category values
     if self.valid_cats is not None:
       uniques = sorted(set(self.valid_cats))
     else:
-      uniques = sorted(set(np.unique(array)))
+      uniques = self._frequent_cat_vals()
 
     # Create the mapping from category values to index in the vector and
     # vice versa
@@ -303,37 +381,25 @@ class CatTransform(n.Transform):
       if not self.index_to_cat_val:
         raise ValueError("index_to_cat_val has no valid values.")
 
-      # Find all the category values which are not known
-      valid_cats = np.isin(array, self.index_to_cat_val)
-      array = np.array(array, copy=True)
-
-      # Replace the unknown category values with some default value.
-      default_val = self.index_to_cat_val[0]
-      if isinstance(default_val, float) and np.isnan(default_val):
-        default_val = self.index_to_cat_val[1]
-      array[~valid_cats] = default_val
-
-      one_hots = np.zeros(list(array.shape) + [len(uniques)], dtype=np.float64)
-
-      # Convert the category values to indices, using the cat_vat_to_index.
-      indices = np.vectorize(self.cat_val_to_index.get)(array)
-
-      # Generate all the indices of the 'indices' array. i.e. one_hot_indices is
-      # equal to something like (0, 0...0), (0, 0 ... 1)... (n1, n2... nk).
-      # Where n1..nk are the size of each dimension of 'indices'. Then append
-      # the corresponding value from 'indices' to get the full location of where
-      # a 1 should be in the one_hots array.
-      one_hot_indices = np.unravel_index(np.arange(indices.size, dtype=np.int32), indices.shape)
-      one_hot_indices = list(one_hot_indices) + [indices.flatten()]
-
-      # Set all the proper locations to 1. And then undo the setting of the
-      # not valid categories.
-      one_hots[one_hot_indices] = 1
-      one_hots[~valid_cats] = 0
-
-      # Get the mean and standard deviation of the one_hots.
-      self.mean = np.mean(one_hots, axis=self.norm_axis)
-      self.std = np.std(one_hots, axis=self.norm_axis)
+      # The counts of each category are the sums of the one hots along the
+      # first axis. Category values that are never equal to themselves (i.e.
+      # NaN) can't be matched, so they're never valid.
+      one_hot_sums = self._accumulators['counts'].get_counts(self.index_to_cat_val)
+      for index, cat_val in enumerate(self.index_to_cat_val):
+        if cat_val != cat_val:
+          one_hot_sums[index] = 0
+      one_hot_sums = np.moveaxis(one_hot_sums, 0, -1)
+
+      # Sum over the rest of the normalization axes. The one hots are all
+      # zeros and ones so their mean is the fraction of ones and their
+      # variance is p * (1 - p).
+      one_hots_shape = list(self.input_shape) + [len(uniques)]
+      axes = acc.reduced_axes(self.norm_axis, len(one_hots_shape))
+      num_vals = np.prod([one_hots_shape[a] for a in axes])
+      one_hot_sums = np.sum(one_hot_sums, axis=tuple([a - 1 for a in axes[1:]]))
+
+      self.mean = one_hot_sums / float(num_vals)
+      self.std = np.sqrt(self.mean * (1.0 - self.mean))
 
       # If there are any standard deviations of 0, replace them with 1's,
       # print out a warning.
@@ -364,7 +430,7 @@ class CatTransform(n.Transform):
     # Convert the category values to indices.
     cti, cti_slots = td.cat_to_index(
       array,
-      self.cat_val_to_index,
+      self._presorted_cat_val_to_index(),
     )
     cti['missing_vals'].set_name('missing_vals')
 
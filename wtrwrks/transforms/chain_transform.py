@@ -3,8 +3,10 @@ import wtrwrks.tanks.tank_defs as td
 import wtrwrks.waterworks.name_space as ns
 import wtrwrks.waterworks.waterwork as wa
 import wtrwrks.transforms.transform as tr
+import wtrwrks.utils.accumulators as acc
 from wtrwrks.waterworks.empty import empty
 import os
+import numpy as np
 
 class ChainTransform(tr.Transform):
   """A transform that is built out of other transforms. The transforms are stitched together in a chain such that one of the pour outputs from the preceding transform is fed as an argument into the next.
@@ -287,13 +289,15 @@ class ChainTransform(tr.Transform):
       )
     return funnel_dict
 
-  def pump(self, pour_outputs):
+  def pump(self, pour_outputs, executor=None):
     """Execute the transformation in the pump (backward) direction.
 
     Parameters
     ----------
     kwargs: dict
       The dictionary all information needed to completely reconstruct the original rate.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the waterworks' tanks on. If None, the tanks are run one after the other.
 
     Returns
     -------
@@ -301,6 +305,7 @@ class ChainTransform(tr.Transform):
       The original numpy array that was poured.
 
     """
+    self._check_pumpable(pour_outputs)
     array = None
 
     for trans_num, trans_key in enumerate(self.transform_order[::-1]):
@@ -321,7 +326,7 @@ class ChainTransform(tr.Transform):
         kwargs[output_name] = pour_outputs[output_name]
         # print output_name, kwargs[output_name].shape
       kwargs = self._nopre(kwargs)
-      array = trans.pump(kwargs)
+      array = trans.pump(kwargs, executor=executor)
 
     return array
 
@@ -348,31 +353,84 @@ class ChainTransform(tr.Transform):
     self.transform_order.append(name)
     self.tap_keys.append(tap_key)
 
-  def calc_global_values(self, array):
+  def begin_fit(self):
+    """The ChainTransform can't be fit in chunks, since each transform in the chain is fit on the pour outputs of the ones before it. Use calc_global_values on the whole dataset instead."""
+    raise ValueError("ChainTransform can only be fit on the whole dataset with calc_global_values.")
+
+  def calc_global_values(self, array, verbose=True, sample=None, seed=None, chunk_size=10000):
     """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
 
+    Each transform is fit on the output of the ones before it. Rather than pouring the whole dataset through every transform, the dataset is streamed through the already fit transforms a chunk at a time, calculating only the output that feeds the next one, so only a chunk of each intermediate output is ever held in memory.
+
     Parameters
     ----------
-    array : np.ndarray
-      The entire dataset.
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset, or the chunks of it along the first dimension.
     verbose : bool
       Whether or not to print out warnings.
+    sample : int, float or None
+      If set, only fit on a uniform random sample of the rows of the dataset. An int is the number of rows to sample and a float the fraction of them.
+    seed : int or None
+      The seed of the random sample.
+    chunk_size : int
+      The number of rows an array is split into chunks of.
+
+    Returns
+    -------
+    dict or None
+      When sampling, the estimated errors of the global values that come from only seeing the sample.
 
     """
-    self.input_dtype = array.dtype
-    self.input_shape = array.shape
+    report = None
+    if sample is not None:
+      array, num_rows = self._sample_rows(array, sample, seed)
+      report = {'num_rows': num_rows, 'num_sampled': len(array), 'transforms': {}}
+
+    if isinstance(array, np.ndarray):
+      chunks = [array[start: start + chunk_size] for start in xrange(0, max(len(array), 1), chunk_size)]
+    else:
+      chunks = list(array)
+
+    input_info = acc.ArrayInfo()
+    for chunk in chunks:
+      input_info.add(chunk)
+    self.input_dtype = input_info.dtype
+    self.input_shape = input_info.shape
+
     for trans_num, trans_key in enumerate(self.transform_order):
       trans = self.transforms[trans_key]
 
       # Calculate the global values for this transform.
-      trans.calc_global_values(array)
-      if trans_num >= len(self.transform_order) - 1:
-        continue
+      if report is None:
+        trans.calc_global_values(self._chain_inputs(chunks, trans_num), verbose=verbose)
+      else:
+        trans_array = np.concatenate(list(self._chain_inputs(chunks, trans_num)))
+        trans.calc_global_values(trans_array, verbose=verbose)
+        report['transforms'][trans_key] = trans._sample_report(trans_array, len(array) / float(num_rows))
 
-      trans_outputs = trans.pour(array)
+    return report
 
-      tap_key = self.tap_keys[trans_num + 1]
-      array = trans_outputs[tap_key]
+  def _chain_inputs(self, chunks, trans_num):
+    """Run each chunk through the transforms before trans_num to get the chunks of its input.
+
+    Parameters
+    ----------
+    chunks : list of np.ndarrays
+      The chunks of the dataset.
+    trans_num : int
+      The position of the transform in the chain.
+
+    Returns
+    -------
+    generator of np.ndarrays
+      The chunks of the transform's input.
+
+    """
+    for chunk in chunks:
+      for prev_num in xrange(trans_num):
+        prev_trans = self.transforms[self.transform_order[prev_num]]
+        chunk = prev_trans._pour_tap(chunk, self.tap_keys[prev_num + 1])
+      yield chunk
 
   def define_waterwork(self, array=empty, return_tubes=None):
     """Get the waterwork that completely describes the pour and pump transformations.
@@ -432,5 +490,8 @@ class ChainTransform(tr.Transform):
       return self.waterwork
     with wa.Waterwork() as ww:
       self.define_waterwork(array)
+
+    # Fuse the tanks that can be done with fewer copies of the data.
+    ww.optimize()
     self.waterwork = ww
     return ww
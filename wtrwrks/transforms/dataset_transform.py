@@ -86,6 +86,15 @@ class DatasetTransform(tr.Transform):
       r_pour_outputs.update(trans_pour_outputs)
     return r_pour_outputs
 
+  def _merge_fit_state(self, fit_state):
+    """Add in the values accumulated by the partial_fit of another DatasetTransform with the same sub transforms, as returned by its _fit_state."""
+    if sorted(self.transforms) != sorted(fit_state['transforms']):
+      raise ValueError("Can only merge the fit of a DatasetTransform with the same sub transforms.")
+
+    super(DatasetTransform, self)._merge_fit_state(fit_state['accumulators'])
+    for key in self:
+      self.transforms[key]._merge_fit_state(fit_state['transforms'][key])
+
   def _parse_examples(self, arrays_dict, prefix=''):
     """Convert the list of example_dicts into the original outputs that came from the pour method.
 
@@ -109,6 +118,47 @@ class DatasetTransform(tr.Transform):
       pour_outputs.update(trans_pour_outputs)
     return pour_outputs
 
+  def _row_blocks(self, array, block_size):
+    """Split the dataset into blocks of rows, reading each block of a memmap into memory just once so every sub transform takes its columns from the same copy.
+
+    Parameters
+    ----------
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset (which can be a memmap), or the chunks of it along the first dimension.
+    block_size : int
+      The maximum number of rows in a block.
+
+    Returns
+    -------
+    generator of np.ndarrays
+      The blocks of the dataset.
+
+    """
+    for chunk in ([array] if isinstance(array, np.ndarray) else array):
+      for start in xrange(0, max(len(chunk), 1), block_size):
+        block = chunk[start: start + block_size]
+        if isinstance(block, np.memmap):
+          block = np.array(block)
+        yield block
+
+  def _sample_report(self, array, fraction):
+    """Estimate the errors in the global values of all the sub transforms from only fitting on a sample of the dataset.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The sample the transform was fit on.
+    fraction : float
+      The fraction of the rows of the dataset that are in the sample.
+
+    Returns
+    -------
+    dict
+      The estimated errors of each sub transform, under 'transforms'.
+
+    """
+    return {'transforms': {key: self.transforms[key]._sample_report(self._subarray(array, key), fraction) for key in self}}
+
   def _save_dict(self):
     """Create the dictionary of values needed in order to reconstruct the transform."""
     save_dict = {}
@@ -122,6 +172,56 @@ class DatasetTransform(tr.Transform):
       save_dict['transforms'][key] = self.transforms[key]._save_dict()
     return save_dict
 
+  def _get_static_tap_dict(self):
+    """Construct the part of the tap dictionary which only depends on the Transform's attributes and those of its sub transforms, rather than on the outputs of the pour method.
+
+    Returns
+    -------
+    dict
+      The dictionary of tap values.
+
+    """
+    # Define the parts of the tap dict that are not dependent on the transforms
+    shape = (0, 1)
+    tap_dict = {
+      self._pre('missing_cols'): np.zeros(shape, dtype=np.object),
+      self._pre('missing_array'): np.zeros(shape, dtype=np.object),
+    }
+    tap_dict[self._pre('Partition_0/tubes/indices')] = np.array([self.transform_col_ranges[k] for k in sorted(self.transform_col_ranges)])
+    tap_dict[self._pre('Transpose_0/tubes/axes')] = [1, 0]
+    for num, _ in enumerate(self):
+      num += 1
+      transp_key = 'Transpose_' + str(num) + '/tubes/axes'
+      tap_dict[self._pre(transp_key)] = [1, 0]
+
+    for name in sorted(self.transforms):
+      trans = self.transforms[name]
+
+      # Depending on the type of Transform, create a default empty array of
+      # the inputted dtype. This is needed for cast tank.
+      if isinstance(trans, nt.NumTransform):
+        input_dtype = trans.input_dtype
+        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
+        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.zeros((), input_dtype)
+        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
+      elif isinstance(trans, dt.DateTimeTransform):
+        input_dtype = trans.input_dtype
+        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
+        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.zeros((), dtype='timedelta64')
+        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
+      elif isinstance(trans, st.StringTransform):
+        input_dtype = trans.input_dtype
+        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
+        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.array([], dtype=np.unicode)
+        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
+      elif isinstance(trans, ct.CatTransform):
+        input_dtype = trans.input_dtype
+        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
+        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.array([], dtype=np.unicode)
+        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
+
+    return tap_dict
+
   def _setattributes(self, **kwargs):
     """Set the actual attributes of the Transform and do some value checks to make sure they valid inputs.
 
@@ -136,6 +236,42 @@ class DatasetTransform(tr.Transform):
       self.transforms = {}
       self.transform_col_ranges = {}
 
+  def _fit_state(self):
+    """Get everything partial_fit has accumulated since begin_fit, for this transform and all its sub transforms, in a form that can be pickled and passed to _merge_fit_state."""
+    fit_state = {'accumulators': self._accumulators, 'transforms': {}}
+    for key in self:
+      fit_state['transforms'][key] = self.transforms[key]._fit_state()
+    return fit_state
+
+  def _subarray(self, array, key):
+    """Get the columns of the array that go to one of the sub transforms, cast to the dtype it takes.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The array with all the columns of the dataset.
+    key : str
+      The name of the sub transform.
+
+    Returns
+    -------
+    np.ndarray
+      The sub transform's columns.
+
+    """
+    trans = self.transforms[key]
+    col_range = self.transform_col_ranges[key]
+    subarray = array[:, col_range[0]: col_range[1]]
+    if isinstance(trans, nt.NumTransform):
+      subarray = subarray.astype(np.float64)
+    elif isinstance(trans, dt.DateTimeTransform):
+      subarray = subarray.astype(np.datetime64)
+    elif isinstance(trans, st.StringTransform):
+      subarray = subarray.astype(np.unicode)
+    elif isinstance(trans, ct.CatTransform):
+      subarray = subarray.astype(np.unicode)
+    return subarray
+
   def _get_array_attributes(self, prefix=''):
     """Get the dictionary that contain the original shapes of the arrays before being converted into tfrecord examples.
 
@@ -174,46 +310,26 @@ class DatasetTransform(tr.Transform):
     elif name in self.transforms:
       raise ValueError(str(name) + " already the name of a transform.")
 
+    self._clear_static_dicts()
     self.transforms[name] = transform
     self.transform_col_ranges[name] = col_ranges
 
-  def calc_global_values(self, array):
-    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+  def begin_fit(self):
+    """Start calculating the global values of the Transform and all its sub transforms from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    super(DatasetTransform, self).begin_fit()
+    for key in self:
+      self.transforms[key].begin_fit()
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them.
 
     Parameters
     ----------
     array : np.ndarray
-      The entire dataset.
-    verbose : bool
-      Whether or not to print out warnings.
+      The chunk of the dataset.
 
     """
-    self.input_dtype = array.dtype
-    self.input_shape = array.shape
-    all_ranges = []
-    for key in self:
-      trans = self.transforms[key]
-
-      # Get the slice definition of the transform.
-      col_range = self.transform_col_ranges[key]
-      all_ranges.append(col_range[0])
-      all_ranges.append(col_range[1])
-
-      # Get the subarrays and cast them to valid dtypes.
-      subarray = array[:, col_range[0]: col_range[1]]
-      if isinstance(trans, nt.NumTransform):
-        subarray = subarray.astype(np.float64)
-      elif isinstance(trans, dt.DateTimeTransform):
-        subarray = subarray.astype(np.datetime64)
-      elif isinstance(trans, st.StringTransform):
-        subarray = subarray.astype(np.unicode)
-      elif isinstance(trans, ct.CatTransform):
-        subarray = subarray.astype(np.unicode)
-
-      # Calculate the global values for this transform.
-      self.transforms[key].calc_global_values(subarray)
-
-    # Verify that all the columns were used from the array, otherwise throw
+    # Verify that all the columns are used from the array, otherwise throw
     # an error.
     all_ranges = set(range(array.shape[1]))
     for key in self:
@@ -225,6 +341,52 @@ class DatasetTransform(tr.Transform):
     if all_ranges:
       raise ValueError("Must use all columns in array. Columns " + str(sorted(all_ranges)) + " are unused. Either remove them from the array or all additional transforms which use them.")
 
+    super(DatasetTransform, self).partial_fit(array)
+    for key in self:
+      self.transforms[key].partial_fit(self._subarray(array, key))
+
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform and all its sub transforms from all the chunks fed to partial_fit since begin_fit was called.
+
+    Parameters
+    ----------
+    verbose : bool
+      Whether or not to print out warnings.
+
+    """
+    super(DatasetTransform, self).finish_fit(verbose=verbose)
+    self._clear_static_dicts()
+    for key in self:
+      self.transforms[key].finish_fit(verbose=verbose)
+
+  def calc_global_values(self, array, verbose=True, sample=None, seed=None, block_size=10000):
+    """Calculate all the values of the Transform and all its sub transforms that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+
+    The dataset is scanned once, a block of rows at a time, with each block split into the columns of every sub transform and fed to all of them before moving on to the next. So only a block's worth of the columns cast to each sub transform's dtype is ever held in memory.
+
+    Parameters
+    ----------
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset (which can be a memmap), or the chunks of it along the first dimension.
+    verbose : bool
+      Whether or not to print out warnings.
+    sample : int, float or None
+      If set, only fit on a uniform random sample of the rows of the dataset. An int is the number of rows to sample and a float the fraction of them.
+    seed : int or None
+      The seed of the random sample.
+    block_size : int
+      The maximum number of rows scanned at a time.
+
+    Returns
+    -------
+    dict or None
+      When sampling, the estimated errors of the global values that come from only seeing the sample.
+
+    """
+    if sample is None:
+      array = self._row_blocks(array, block_size)
+    return super(DatasetTransform, self).calc_global_values(array, verbose=verbose, sample=sample, seed=seed)
+
   def define_waterwork(self, array=empty, return_tubes=None):
     """Get the waterwork that completely describes the pour and pump transformations.
 
@@ -308,16 +470,24 @@ class DatasetTransform(tr.Transform):
       return self.waterwork
     with wa.Waterwork() as ww:
       self.define_waterwork(array)
+    self._clear_static_dicts()
+
+    # Fuse the tanks that can be done with fewer copies of the data.
+    ww.optimize()
     self.waterwork = ww
     return ww
 
-  def pour(self, array):
+  def pour(self, array, executor=None, forward_only=False):
     """Execute the transformation in the pour (forward) direction.
 
     Parameters
     ----------
     array : np.ndarray
       The numpy array to transform.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the waterwork's tanks on. Each of the sub transforms is an independent branch of the waterwork, so they can be run at the same time. If None, the tanks are run one after the other.
+    forward_only : bool
+      Whether or not to only calculate the outputs that would be fed to a model, skipping everything that is only needed to pump. The outputs cannot be pumped.
 
     Returns
     -------
@@ -338,7 +508,7 @@ class DatasetTransform(tr.Transform):
       )
 
     # Run the waterwork in the pour direction
-    tap_dict = ww.pour(funnel_dict, key_type='str')
+    tap_dict = ww.pour(funnel_dict, key_type='str', executor=executor, forward_only=forward_only)
 
     # Extract out the relevant pour outputs from each of the transforms.
     pour_outputs = {}
@@ -347,15 +517,17 @@ class DatasetTransform(tr.Transform):
 
       temp_outputs = trans._extract_pour_outputs(tap_dict, prefix=self.name)
       pour_outputs.update(temp_outputs)
-    return pour_outputs
+    return self._wrap_pour_outputs(pour_outputs, forward_only)
 
-  def pump(self, pour_outputs):
+  def pump(self, pour_outputs, executor=None):
     """Execute the transformation in the pump (backward) direction.
 
     Parameters
     ----------
     kwargs: dict
       The dictionary all information needed to completely reconstruct the original rate.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the waterwork's tanks on. If None, the tanks are run one after the other.
 
     Returns
     -------
@@ -363,46 +535,15 @@ class DatasetTransform(tr.Transform):
       The original numpy array that was poured.
 
     """
+    self._check_pumpable(pour_outputs)
     ww = self.get_waterwork()
 
-    # Define the parts of the tap dict that are not dependent on the transforms
-    shape = (0, 1)
-    tap_dict = {
-      self._pre('missing_cols'): np.zeros(shape, dtype=np.object),
-      self._pre('missing_array'): np.zeros(shape, dtype=np.object),
-    }
-    tap_dict[self._pre('Partition_0/tubes/indices')] = np.array([self.transform_col_ranges[k] for k in sorted(self.transform_col_ranges)])
-    tap_dict[self._pre('Transpose_0/tubes/axes')] = [1, 0]
-    for num, _ in enumerate(self):
-      num += 1
-      transp_key = 'Transpose_' + str(num) + '/tubes/axes'
-      tap_dict[self._pre(transp_key)] = [1, 0]
+    # The parts of the tap dict that don't depend on the pour outputs only
+    # need to be built once.
+    tap_dict = self._get_static_dict('tap', self._get_static_tap_dict)
 
     for name in sorted(self.transforms):
       trans = self.transforms[name]
-
-      # Depending on the type of Transform, create a default empty array of
-      # the inputted dtype. This is needed for cast tank.
-      if isinstance(trans, nt.NumTransform):
-        input_dtype = trans.input_dtype
-        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
-        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.zeros((), input_dtype)
-        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
-      elif isinstance(trans, dt.DateTimeTransform):
-        input_dtype = trans.input_dtype
-        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
-        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.zeros((), dtype='timedelta64')
-        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
-      elif isinstance(trans, st.StringTransform):
-        input_dtype = trans.input_dtype
-        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
-        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.array([], dtype=np.unicode)
-        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
-      elif isinstance(trans, ct.CatTransform):
-        input_dtype = trans.input_dtype
-        tank_name = os.path.join(self.name, '-'.join([name, 'cast']))
-        tap_dict[os.path.join(tank_name, 'tubes', 'diff')] = np.array([], dtype=np.unicode)
-        tap_dict[os.path.join(tank_name, 'tubes', 'input_dtype')] = input_dtype
       kwargs = {}
       prefix = os.path.join(self.name, name) + '/'
 
@@ -416,6 +557,6 @@ class DatasetTransform(tr.Transform):
       )
 
     # Run the waterwork in the pump direction.
-    funnel_dict = ww.pump(tap_dict, key_type='str')
+    funnel_dict = ww.pump(tap_dict, key_type='str', executor=executor)
 
     return funnel_dict[os.path.join(self.name, 'input')]
@@ -1,5 +1,6 @@
 """DateTimeTransform definition."""
 import transform as n
+import wtrwrks.utils.accumulators as acc
 import numpy as np
 import datetime
 import warnings
@@ -54,7 +55,9 @@ class DateTimeTransform(n.Transform):
       Dictionay of only those tap dict values which are can't be inferred from the Transform itself.
 
     """
-    return {self._pre(k, prefix): tap_dict[self._pre(k, prefix)] for k in ['nums', 'nats', 'diff']}
+    # Any outputs skipped by a forward only pour are left out.
+    keys = [self._pre(k, prefix) for k in ['nums', 'nats', 'diff']]
+    return {k: tap_dict[k] for k in keys if k in tap_dict}
 
   def _extract_pump_outputs(self, funnel_dict, prefix=''):
     """Pull out the original array from the funnel_dict which was produced by running pump.
@@ -253,33 +256,57 @@ class DateTimeTransform(n.Transform):
     att_dict = self._pre(att_dict, prefix)
     return att_dict
 
-  def calc_global_values(self, array, verbose=True):
-    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+  def begin_fit(self):
+    """Start calculating the global values of the Transform from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    super(DateTimeTransform, self).begin_fit()
+    if self.norm_mode == 'mean_std':
+      self._accumulators['moments'] = acc.Moments(axis=self.norm_axis)
+    elif self.norm_mode == 'min_max':
+      self._accumulators['min_max'] = acc.MinMax(axis=self.norm_axis)
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them. The fill_nat_func is run on each chunk separately.
 
     Parameters
     ----------
     array : np.ndarray
-      The entire dataset.
-    verbose : bool
-      Whether or not to print out warnings.
+      The chunk of the dataset.
 
     """
     array = array.astype(np.datetime64)
-    # Get the inputted dtype
-    self.input_dtype = array.dtype
-    self.input_shape = array.shape
+    super(DateTimeTransform, self).partial_fit(array)
+
+    if self.norm_mode is None:
+      return
+
+    array[np.isnat(array)] = self.fill_nat_func(array)
+    temp_array = (array - self.zero_datetime)/np.timedelta64(self.num_units, self.time_unit)
+    temp_array = temp_array.astype(self.dtype)
 
     if self.norm_mode == 'mean_std':
-      # Find the means and standard deviations of each column
-      array[np.isnat(array)] = self.fill_nat_func(array)
-      temp_array = (array - self.zero_datetime)/np.timedelta64(self.num_units, self.time_unit)
-      temp_array = temp_array.astype(self.dtype)
+      self._accumulators['moments'].add(temp_array)
+    elif self.norm_mode == 'min_max':
+      self._accumulators['min_max'].add(temp_array)
 
-      if not len(temp_array):
-        raise ValueError("Inputted col_array has no non nan values.")
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform from all the chunks fed to partial_fit since begin_fit was called.
 
-      self.mean = np.mean(temp_array, axis=self.norm_axis)
-      self.std = np.std(temp_array, axis=self.norm_axis)
+    Parameters
+    ----------
+    verbose : bool
+      Whether or not to print out warnings.
+
+    """
+    super(DateTimeTransform, self).finish_fit(verbose=verbose)
+
+    if self.norm_mode is not None and not self.input_shape[0]:
+      raise ValueError("Inputted col_array has no non nan values.")
+
+    if self.norm_mode == 'mean_std':
+      # Find the means and standard deviations of each column
+      moments = self._accumulators['moments']
+      self.mean = moments.mean
+      self.std = moments.std
 
       # If any of the standard deviations are 0, replace them with 1's and
       # print out a warning
@@ -290,16 +317,9 @@ class DateTimeTransform(n.Transform):
 
     elif self.norm_mode == 'min_max':
       # Find the means and standard deviations of each column
-      # temp_col_array = col_array[~np.isnat(col_array)]
-      array[np.isnat(array)] = self.fill_nat_func(array)
-      temp_array = (array - self.zero_datetime)/np.timedelta64(self.num_units, self.time_unit)
-      temp_array = temp_array.astype(self.dtype)
-
-      if not len(temp_array):
-        raise ValueError("Inputted col_array has no non nan values.")
-
-      self.min = np.min(temp_array, axis=self.norm_axis)
-      self.max = np.max(temp_array, axis=self.norm_axis)
+      min_max = self._accumulators['min_max']
+      self.min = np.array(min_max.min)
+      self.max = np.array(min_max.max)
 
       # Test to make sure that min and max are not equal. If they are replace
       # with default values.
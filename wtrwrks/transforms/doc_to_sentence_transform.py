@@ -214,17 +214,37 @@ class DocumentToSentenceTransform(n.Transform):
     att_dict = self._pre(att_dict, prefix)
     return att_dict
 
-  def calc_global_values(self, documents, verbose=True):
+  def begin_fit(self):
+    """The DocumentToSentenceTransform can't be fit in chunks, since its sub transform is fit on the documents after they've been poured through the sentence tokenizer. Use calc_global_values on the whole dataset instead."""
+    raise ValueError("DocumentToSentenceTransform can only be fit on the whole dataset with calc_global_values.")
+
+  def calc_global_values(self, documents, verbose=True, sample=None, seed=None):
     """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
 
     Parameters
     ----------
-    array : np.ndarray
-      The entire dataset.
+    documents : np.ndarray or iterable of np.ndarrays
+      The entire dataset, or the chunks of it along the first dimension.
     verbose : bool
       Whether or not to print out warnings.
+    sample : int, float or None
+      If set, only fit on a uniform random sample of the rows of the dataset. An int is the number of rows to sample and a float the fraction of them.
+    seed : int or None
+      The seed of the random sample.
+
+    Returns
+    -------
+    dict or None
+      When sampling, the estimated errors of the global values that come from only seeing the sample.
 
     """
+    report = None
+    if sample is not None:
+      documents, num_rows = self._sample_rows(documents, sample, seed)
+      report = {'num_rows': num_rows, 'num_sampled': len(documents)}
+    elif not isinstance(documents, np.ndarray):
+      documents = np.concatenate(list(documents))
+
     self.input_dtype = documents.dtype
     self.input_shape = documents.shape
     self.num_pours = 0
@@ -241,6 +261,7 @@ class DocumentToSentenceTransform(n.Transform):
 
     if self.max_doc_len is None:
       self.max_doc_len = max_len
+    return report
 
   def define_waterwork(self, array=empty, return_tubes=None):
     """Get the waterwork that completely describes the pour and pump transformations.
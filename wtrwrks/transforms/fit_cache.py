@@ -0,0 +1,166 @@
+"""FitCache definition."""
+import dill as pickle
+import hashlib
+import numpy as np
+import os
+import tempfile
+import wtrwrks.utils.dir_functions as d
+
+
+class FitCache(object):
+  """An on disk cache of fitted transforms, so that refitting the same transform on the same dataset (e.g. on reruns or backfills) just restores the global values instead of going through the data again. Entries are keyed by a fingerprint of the transform's settings along with a fingerprint of the dataset, and the least recently used ones are thrown away once the cache gets bigger than max_size.
+
+  Parameters
+  ----------
+  directory : str
+    The directory to keep the cached transforms in.
+  max_size : int
+    The maximum total size, in bytes, of the cached transforms.
+  num_blocks : int or None
+    The number of evenly spaced blocks of rows of a dataset which are hashed to fingerprint it. If None the whole dataset is hashed.
+
+  Attributes
+  ----------
+  directory : str
+    The directory to keep the cached transforms in.
+  max_size : int
+    The maximum total size, in bytes, of the cached transforms.
+  num_blocks : int or None
+    The number of evenly spaced blocks of rows of a dataset which are hashed to fingerprint it. If None the whole dataset is hashed.
+
+  """
+
+  def __init__(self, directory, max_size=2 ** 30, num_blocks=64):
+    """Create the cache, using any entries that are already in the directory."""
+    self.directory = directory
+    self.max_size = max_size
+    self.num_blocks = num_blocks
+    d.maybe_create_dir(directory)
+
+  def calc_global_values(self, transform, array, fingerprint=None, **kwargs):
+    """Run the transform's calc_global_values, or restore the global values it set the last time it was run with the same settings on the same dataset.
+
+    Parameters
+    ----------
+    transform : Transform
+      The transform to fit.
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset (which can be a memmap), or the chunks of it along the first dimension.
+    fingerprint : str or None
+      Something which identifies the dataset, (e.g. the path and modification time of the files it was read from). Defaults to the fingerprint of the array, and must be given if the dataset is in chunks.
+    **kwargs :
+      Any other keyword arguments of the transform's calc_global_values.
+
+    Returns
+    -------
+    object
+      What the transform's calc_global_values returned.
+
+    """
+    if fingerprint is None:
+      fingerprint = self.fingerprint(array)
+
+    # The transform is fingerprinted before it's fit, since fitting changes it.
+    settings = dict([(k, v) for k, v in kwargs.items() if k != 'verbose'])
+    key = hashlib.sha1()
+    key.update(pickle.dumps(transform))
+    key.update(str(fingerprint))
+    key.update(repr(sorted(settings.items())))
+    path = os.path.join(self.directory, key.hexdigest() + '.pickle')
+
+    entry = self._read(path)
+    if entry is not None:
+      transform.__dict__.update(entry['transform'].__dict__)
+      return entry['result']
+
+    result = transform.calc_global_values(array, **kwargs)
+    self._write(path, {'transform': transform, 'result': result})
+    self._evict()
+    return result
+
+  def clear(self):
+    """Remove all the cached transforms."""
+    for file_name in self._file_names():
+      os.remove(os.path.join(self.directory, file_name))
+
+  def fingerprint(self, array):
+    """Fingerprint a dataset without reading all of it, by hashing its shape and dtype along with evenly spaced blocks of its rows (including the first and last). Memmaps also include the size and modification time of their file. Changes to the rows between the blocks can go unnoticed, so pass a fingerprint to calc_global_values or set num_blocks to None if that matters.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The dataset.
+
+    Returns
+    -------
+    str
+      The fingerprint.
+
+    """
+    if not isinstance(array, np.ndarray):
+      raise ValueError("Can only fingerprint an array, a fingerprint must be given for datasets in chunks.")
+
+    sha = hashlib.sha1()
+    sha.update(str(array.shape) + str(array.dtype))
+    if isinstance(array, np.memmap) and array.filename is not None:
+      stat = os.stat(array.filename)
+      sha.update(str((array.filename, stat.st_size, stat.st_mtime)))
+
+    if not array.ndim:
+      array = array.reshape([1])
+
+    # Blocks of about 64KB.
+    row_size = max(array[:1].nbytes, 1)
+    block_rows = max(65536 // row_size, 1)
+    if self.num_blocks is None or len(array) <= self.num_blocks * block_rows:
+      starts = xrange(0, len(array), block_rows)
+    else:
+      starts = np.linspace(0, len(array) - block_rows, self.num_blocks).astype(int)
+
+    for start in starts:
+      block = array[start: start + block_rows]
+      if block.dtype.hasobject:
+        sha.update(pickle.dumps(block.tolist()))
+      else:
+        sha.update(np.ascontiguousarray(block).tobytes())
+    return sha.hexdigest()
+
+  def _evict(self):
+    """Remove the least recently used cached transforms until the cache fits in max_size."""
+    entries = []
+    for file_name in self._file_names():
+      stat = os.stat(os.path.join(self.directory, file_name))
+      entries.append((stat.st_mtime, file_name, stat.st_size))
+    entries.sort()
+
+    total_size = sum([size for _, _, size in entries])
+    for _, file_name, size in entries:
+      if total_size <= self.max_size:
+        break
+      os.remove(os.path.join(self.directory, file_name))
+      total_size -= size
+
+  def _file_names(self):
+    return [f for f in os.listdir(self.directory) if f.endswith('.pickle')]
+
+  def _read(self, path):
+    """Read a cached transform, marking it as the most recently used one. Returns None if there isn't one."""
+    if not os.path.exists(path):
+      return None
+    try:
+      with open(path, 'rb') as cache_file:
+        entry = pickle.load(cache_file)
+    # An entry that can't be read (e.g. because the code of a function it uses
+    # has been removed) is just treated as missing.
+    except Exception:
+      return None
+
+    os.utime(path, None)
+    return entry
+
+  def _write(self, path, entry):
+    """Write a cached transform, through a temporary file so that readers never see a partial one."""
+    handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as cache_file:
+      pickle.dump(entry, cache_file)
+    os.rename(temp_path, path)
@@ -1,5 +1,6 @@
 """NumTransform definition."""
 import transform as n
+import wtrwrks.utils.accumulators as acc
 import numpy as np
 import warnings
 import wtrwrks.tanks.tank_defs as td
@@ -19,10 +20,14 @@ class NumTransform(n.Transform):
     The path to the saved file to recreate the transform object that was saved to disk.
   save_dict : dict
     The dictionary to recreate the transform object
-  norm_mode : str, either 'mean_std' or 'max_min'
-    The method used to normalize the data. Can either use 'mean_std' which subtracts out the mean and divides by the standard deviation or 'min_max' which subtracts out the min and divides by the (max - min).
+  norm_mode : str, either 'mean_std', 'min_max', 'robust' or 'quantile'
+    The method used to normalize the data. Can either use 'mean_std' which subtracts out the mean and divides by the standard deviation, 'min_max' which subtracts out the min and divides by the (max - min), 'robust' which subtracts out the median and divides by the interquartile range, or 'quantile' which maps each value to its (approximate) quantile between 0 and 1. The median, interquartile range and quantiles come from a streaming quantile sketch rather than a full sort.
   norm_axis : int, tuple or None
-    The axis along which to calculate the mean, std, min, or max.
+    The axis along which to calculate the mean, std, min, max, or quantiles.
+  num_quantiles : int
+    The number of evenly spaced quantiles, including the min and max, to linearly interpolate between in the 'quantile' norm mode.
+  sketch_size : int
+    The accuracy of the quantile sketch used by the 'robust' and 'quantile' norm modes. The rank of each quantile is off by roughly 1 / sketch_size of the number of values at the most, and the memory used is about 3 * sketch_size values per position.
   fill_nan_func : func
     A function that takes in an array and replaces any nan values with some number. Defaults to a function that just replaces them with zero.
 
@@ -40,10 +45,16 @@ class NumTransform(n.Transform):
     The array of mins used in the normalization.
   max : np.ndarray
     The array of maxes used in the normalization.
+  median : np.ndarray
+    The array of medians used in the normalization.
+  iqr : np.ndarray
+    The array of interquartile ranges used in the normalization.
+  quantiles : np.ndarray
+    The array of quantiles used in the normalization. The first dimension goes over the quantiles.
 
   """
 
-  attribute_dict = {'norm_mode': None, 'norm_axis': None, 'fill_nan_func': None, 'name': '', 'mean': None, 'std': None, 'min': None, 'max': None, 'dtype': None, 'input_dtype': None}
+  attribute_dict = {'norm_mode': None, 'norm_axis': None, 'fill_nan_func': None, 'name': '', 'mean': None, 'std': None, 'min': None, 'max': None, 'median': None, 'iqr': None, 'quantiles': None, 'num_quantiles': 100, 'sketch_size': 200, 'dtype': None, 'input_dtype': None}
 
   def _extract_pour_outputs(self, tap_dict, prefix='', **kwargs):
     """Pull out all the values from tap_dict that cannot be explicitly reconstructed from the transform itself. These are the values that will need to be fed back to the transform into run the tranform in the pump direction.
@@ -61,7 +72,9 @@ class NumTransform(n.Transform):
       Dictionay of only those tap dict values which are can't be inferred from the Transform itself.
 
     """
-    return {self._pre(k, prefix): tap_dict[self._pre(k, prefix)] for k in ['nums', 'nans']}
+    # Any outputs skipped by a forward only pour are left out.
+    keys = [self._pre(k, prefix) for k in ['nums', 'nans', 'inexact', 'inexact_vals']]
+    return {k: tap_dict[k] for k in keys if k in tap_dict}
 
   def _extract_pump_outputs(self, funnel_dict, prefix=''):
     """Pull out the original array from the funnel_dict which was produced by running pump.
@@ -129,10 +142,13 @@ class NumTransform(n.Transform):
       'Replace_0/tubes/replace_with_shape': (num_nans,),
     }
     # If there was a norm mode set then add in all the additional information.
-    if self.norm_mode == 'mean_std' or self.norm_mode == 'min_max':
+    if self.norm_mode in ('mean_std', 'min_max', 'robust'):
       if self.norm_mode == 'mean_std':
         sub_val = self.mean
         div_val = self.std
+      elif self.norm_mode == 'robust':
+        sub_val = self.median
+        div_val = self.iqr
       else:
         sub_val = self.min
         div_val = self.max - self.min
@@ -145,6 +161,13 @@ class NumTransform(n.Transform):
         ('Div_0/tubes/missing_vals'): np.array([], dtype=float)
       }
       tap_dict.update(norm_mode_dict)
+    elif self.norm_mode == 'quantile':
+      tap_dict.update({
+        'inexact': pour_outputs['inexact'],
+        'inexact_vals': pour_outputs['inexact_vals'],
+        'Interp_0/tubes/xp': self.quantiles,
+        'Interp_0/tubes/fp': self._quantile_probs(),
+      })
     return self._pre(tap_dict, prefix)
 
   def _parse_examples(self, arrays_dict, prefix=''):
@@ -166,8 +189,42 @@ class NumTransform(n.Transform):
     pour_outputs = {}
     pour_outputs.update(arrays_dict)
     pour_outputs[self._pre('nans', prefix)] = pour_outputs[self._pre('nans', prefix)].astype(bool)
+    if self.norm_mode == 'quantile':
+      pour_outputs[self._pre('inexact', prefix)] = pour_outputs[self._pre('inexact', prefix)].astype(bool)
     return pour_outputs
 
+  def _sample_report(self, array, fraction):
+    """Estimate the errors in the global values from only fitting on a sample of the dataset. The mean and std errors are the half widths of (normal approximation) 95% confidence intervals, with a finite population correction. The quantile error is the 95% bound on how far off the rank of any quantile is, as a fraction of the dataset, from the Dvoretzky-Kiefer-Wolfowitz inequality.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The sample the transform was fit on.
+    fraction : float
+      The fraction of the rows of the dataset that are in the sample.
+
+    Returns
+    -------
+    dict
+      The estimated 'mean_error', 'std_error' and 'quantile_rank_error'.
+
+    """
+    if self.norm_mode is None:
+      return {}
+
+    array = array.astype(self.dtype)
+    array[np.isnan(array)] = self.fill_nan_func(array)
+    axes = acc.reduced_axes(self.norm_axis, array.ndim)
+    count = int(np.prod([array.shape[a] for a in axes]))
+    std = np.std(array, axis=axes)
+    correction = np.sqrt(1.0 - fraction)
+
+    return {
+      'mean_error': 1.96 * std / np.sqrt(count) * correction,
+      'std_error': 1.96 * std / np.sqrt(2.0 * max(count - 1, 1)) * correction,
+      'quantile_rank_error': np.sqrt(np.log(2 / 0.05) / (2.0 * count)),
+    }
+
   def _setattributes(self, **kwargs):
     """Set the actual attributes of the Transform and do some value checks to make sure they valid inputs.
 
@@ -179,9 +236,12 @@ class NumTransform(n.Transform):
     """
     super(NumTransform, self)._setattributes(**kwargs)
 
-    if self.norm_mode not in (None, 'min_max', 'mean_std'):
+    if self.norm_mode not in (None, 'min_max', 'mean_std', 'robust', 'quantile'):
       raise ValueError(self.norm_mode + " not a valid norm mode.")
 
+    if self.num_quantiles < 2:
+      raise ValueError("num_quantiles must be at least 2, got " + str(self.num_quantiles))
+
     if self.fill_nan_func is None:
       self.fill_nan_func = lambda array: np.full(array[np.isnan(array)].shape, np.array(0))
 
@@ -215,34 +275,64 @@ class NumTransform(n.Transform):
       'feature_func': feat._int_feat,
       'np_type': np.bool
     }
+    if self.norm_mode == 'quantile':
+      att_dict['inexact'] = dict(att_dict['nans'])
+      att_dict['inexact_vals'] = dict(att_dict['nums'])
 
     att_dict = self._pre(att_dict, prefix)
     return att_dict
 
-  def calc_global_values(self, array, verbose=True):
-    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+  def begin_fit(self):
+    """Start calculating the global values of the Transform from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    super(NumTransform, self).begin_fit()
+    if self.norm_mode == 'mean_std':
+      self._accumulators['moments'] = acc.Moments(axis=self.norm_axis)
+    elif self.norm_mode == 'min_max':
+      self._accumulators['min_max'] = acc.MinMax(axis=self.norm_axis)
+    elif self.norm_mode in ('robust', 'quantile'):
+      self._accumulators['quantiles'] = acc.Quantiles(k=self.sketch_size, axis=self.norm_axis)
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them. The fill_nan_func is run on each chunk separately.
 
     Parameters
     ----------
     array : np.ndarray
-      The entire dataset.
-    verbose : bool
-      Whether or not to print out warnings.
+      The chunk of the dataset.
 
     """
-    # Set the input dtype
-    self.input_dtype = array.dtype
+    super(NumTransform, self).partial_fit(array)
     if self.dtype is None:
       self.dtype = array.dtype
-    self.input_shape = array.shape
+
+    if self.norm_mode is None:
+      return
 
     array = array.astype(self.dtype)
+    array[np.isnan(array)] = self.fill_nan_func(array)
+    if self.norm_mode == 'mean_std':
+      self._accumulators['moments'].add(array)
+    elif self.norm_mode == 'min_max':
+      self._accumulators['min_max'].add(array)
+    else:
+      self._accumulators['quantiles'].add(array)
+
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform from all the chunks fed to partial_fit since begin_fit was called.
+
+    Parameters
+    ----------
+    verbose : bool
+      Whether or not to print out warnings.
+
+    """
+    super(NumTransform, self).finish_fit(verbose=verbose)
 
     if self.norm_mode == 'mean_std':
       # Find the means and standard deviations of each column
-      array[np.isnan(array)] = self.fill_nan_func(array)
-      self.mean = np.mean(array, axis=self.norm_axis)
-      self.std = np.std(array, axis=self.norm_axis)
+      moments = self._accumulators['moments']
+      self.mean = moments.mean
+      self.std = moments.std
 
       # If any of the standard deviations are 0, replace them with 1's and
       # print out a warning
@@ -253,9 +343,9 @@ class NumTransform(n.Transform):
 
     elif self.norm_mode == 'min_max':
       # Find the means and standard deviations of each column
-      array[np.isnan(array)] = self.fill_nan_func(array)
-      self.min = np.min(array, axis=self.norm_axis)
-      self.max = np.max(array, axis=self.norm_axis)
+      min_max = self._accumulators['min_max']
+      self.min = np.array(min_max.min)
+      self.max = np.array(min_max.max)
 
       # Test to make sure that min and max are not equal. If they are replace
       # with default values.
@@ -268,6 +358,30 @@ class NumTransform(n.Transform):
         if verbose:
           warnings.warn("NumTransform " + self.name + " the same values for min and max, replacing with " + str(self.min) + " " + str(self.max) + " respectively.")
 
+    elif self.norm_mode == 'robust':
+      median, lower, upper = self._accumulators['quantiles'].quantiles([0.5, 0.25, 0.75])
+      self.median = median
+      self.iqr = np.array(upper - lower, dtype=np.float64)
+
+      if (self.iqr == 0).any():
+        if verbose:
+          warnings.warn("NumTransform " + self.name + " has a zero-valued interquartile range, replacing with 1.")
+        self.iqr[self.iqr == 0.] = 1.0
+
+    elif self.norm_mode == 'quantile':
+      quantiles = self._accumulators['quantiles'].quantiles(self._quantile_probs())
+
+      # Put back the reduced over axes (other than the first) so the quantiles
+      # line up with the positions of the array.
+      shape = [1 if a in acc.reduced_axes(self.norm_axis, len(self.input_shape)) else s for a, s in enumerate(self.input_shape)][1:]
+      while shape and shape[0] == 1:
+        shape = shape[1:]
+      self.quantiles = quantiles.reshape([len(quantiles)] + shape)
+
+  def _quantile_probs(self):
+    """The evenly spaced probabilities of the quantiles used in the 'quantile' norm mode."""
+    return np.linspace(0., 1., self.num_quantiles)
+
   def define_waterwork(self, array=empty, return_tubes=None):
     """Get the waterwork that completely describes the pour and pump transformations.
 
@@ -296,6 +410,13 @@ class NumTransform(n.Transform):
     elif self.norm_mode == 'min_max':
       nums, _ = nums['target'] - self.min
       nums, _ = nums['target'] / (self.max - self.min)
+    elif self.norm_mode == 'robust':
+      nums, _ = nums['target'] - self.median
+      nums, _ = nums['target'] / self.iqr
+    elif self.norm_mode == 'quantile':
+      nums, _ = td.interp(nums['target'], self.quantiles, self._quantile_probs())
+      nums['mask'].set_name('inexact')
+      nums['missing_vals'].set_name('inexact_vals')
 
     nums['target'].set_name('nums')
 
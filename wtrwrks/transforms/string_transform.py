@@ -1,8 +1,12 @@
 """Definition of the StringTransform."""
 import transform as n
+import wtrwrks.utils.accumulators as acc
 import numpy as np
 import wtrwrks.tanks.tank_defs as td
+import wtrwrks.tanks.half_width as hw
+import wtrwrks.tanks.utils as ut
 import wtrwrks.read_write.tf_features as feat
+import wtrwrks.string_manipulations.diff as di
 from wtrwrks.waterworks.empty import empty
 import tensorflow as tf
 
@@ -24,18 +28,28 @@ class StringTransform(n.Transform):
     Whether or not to convert all full width characters to half width.
   lemmatize : bool
     Whether or not to stem or lemmatize the words.
+  lemmatize_cache_size : int or None
+    If set, the number of words to remember the lemmatized forms (and diffs) of across pours, so the lemmatizer is only run on words that haven't been seen recently.
   index_to_word : list
-    The mapping from index number to word.
+    The mapping from index number to word. If it isn't given, it's built from the most frequent (normalized) words of the dataset when the global values are calculated.
   word_to_index : dict
     The mapping from word to index number.
   max_sent_len : int
     The maximum allowed number of words in a sentence. Also decides the inner most dimension of the outputted indices array.
   unk_index : int
-    The location of the 'unknown token' in the index_to_word mapping.
+    The location of the 'unknown token' in the index_to_word mapping. Defaults to 0 when the index_to_word is built from the dataset.
+  unk_token : str
+    The 'unknown token' to put in the index_to_word when it's built from the dataset.
+  max_vocab_size : int or None
+    The maximum size of the index_to_word (including the 'unknown token') when it's built from the dataset. The most frequent words are found with a sketch of bounded size, so the fit takes a fixed amount of memory however many distinct words there are.
+  min_count : int or None
+    The minimum number of times a word has to appear to be put in the index_to_word when it's built from the dataset.
   word_tokenizer : func
     A function that takes in a string and splits it up into a list of words.
   word_detokenizer : func
     A function that takes in a list of words and outputs a string. Doesn't have to be an exact inverse to word_tokenizer but should be close otherwise a lot of large diff strings will have to be outputted in order to reproduce the original strings.
+  diff_version : int
+    How the diff strings are written to examples. 2 (the default) encodes the diffs of each example into a single string of just the ones that change something. 1 writes one diff string per string or token, which is what transforms saved before diff_version existed did, so they are loaded with 1 and can still read the examples they wrote.
 
   Attributes
   ----------
@@ -43,10 +57,12 @@ class StringTransform(n.Transform):
     The datatype of the original inputted array.
   input_shape: list of ints
     The shape of the original inputted array.
+  word_counts: dict or None
+    The number of times each word appeared in the dataset, if the index_to_word was built from it.
 
   """
 
-  attribute_dict = {'name': '', 'dtype': np.int64, 'input_dtype': None, 'input_shape': None, 'index_to_word': None, 'word_to_index': None, 'max_sent_len': None, 'word_tokenizer': None, 'lemmatize': False, 'lemmatizer': None, 'half_width': False, 'lower_case': False, 'unk_index': None, 'word_detokenizer': lambda a: ' '.join(a)}
+  attribute_dict = {'name': '', 'dtype': np.int64, 'input_dtype': None, 'input_shape': None, 'index_to_word': None, 'word_to_index': None, 'max_sent_len': None, 'word_tokenizer': None, 'lemmatize': False, 'lemmatizer': None, 'lemmatize_cache_size': None, 'half_width': False, 'lower_case': False, 'unk_index': None, 'word_detokenizer': lambda a: ' '.join(a), 'unk_token': '__UNK__', 'max_vocab_size': None, 'min_count': None, 'word_counts': None, 'diff_version': 2}
 
   def __len__(self):
     return self.max_sent_len
@@ -67,13 +83,16 @@ class StringTransform(n.Transform):
       Dictionay of only those tap dict values which are can't be inferred from the Transform itself.
 
     """
-    r_dict = {k: tap_dict[self._pre(k, prefix)] for k in ['indices', 'missing_vals', 'tokenize_diff']}
+    keys = ['indices', 'missing_vals', 'tokenize_diff']
     if self.lower_case:
-      r_dict['lower_case_diff'] = tap_dict[self._pre('lower_case_diff', prefix)]
+      keys.append('lower_case_diff')
     if self.half_width:
-      r_dict['half_width_diff'] = tap_dict[self._pre('half_width_diff', prefix)]
+      keys.append('half_width_diff')
     if self.lemmatize:
-      r_dict['lemmatize_diff'] = tap_dict[self._pre('lemmatize_diff', prefix)]
+      keys.append('lemmatize_diff')
+
+    # Any outputs skipped by a forward only pour are left out.
+    r_dict = {k: tap_dict[self._pre(k, prefix)] for k in keys if self._pre(k, prefix) in tap_dict}
     r_dict = self._pre(r_dict, prefix)
     return r_dict
 
@@ -120,7 +139,11 @@ class StringTransform(n.Transform):
       else:
         dtype = tf.string
 
-      if key == 'tokenize_diff':
+      # The diffs of each example are encoded into a single string, or in
+      # the old format there's one for each string or token.
+      if key.endswith('_diff') and self.diff_version == 2:
+        shape = [1]
+      elif key == 'tokenize_diff':
         shape = [size]
       else:
         shape = [size * self.max_sent_len]
@@ -129,6 +152,40 @@ class StringTransform(n.Transform):
     feature_dict = self._pre(feature_dict, prefix)
     return feature_dict
 
+  def _build_index_to_word(self):
+    """Set the index_to_word and word_counts from the words counted by partial_fit, keeping the most frequent ones according to max_vocab_size and min_count."""
+    counts = self._accumulators['word_counts']
+    if counts.values is None:
+      words, totals = [], np.array([], dtype=np.int64)
+    else:
+      words, totals = counts.values.tolist(), counts.counts
+    self.word_counts = dict(zip(words, totals.tolist()))
+
+    # Order by frequency, with ties going to the smaller word, and drop the
+    # unknown token if it happens to appear in the dataset.
+    order = np.argsort(-totals, kind='mergesort')
+    index_to_word = []
+    for index in order:
+      if self.min_count is not None and totals[index] < self.min_count:
+        break
+      if self.max_vocab_size is not None and len(index_to_word) >= self.max_vocab_size - 1:
+        break
+      if words[index] != self.unk_token:
+        index_to_word.append(words[index])
+
+    if self.unk_index > len(index_to_word):
+      raise ValueError("unk_index " + str(self.unk_index) + " is past the end of the index_to_word, which only has " + str(len(index_to_word)) + " words.")
+    index_to_word.insert(self.unk_index, self.unk_token)
+    self.index_to_word = index_to_word
+
+  def _from_save_dict(self, save_dict):
+    """Reconstruct the transform object from the dictionary of attributes. Attributes which were added after the transform was saved get their default values, except for diff_version, since it was saved before the diffs were encoded."""
+    save_dict = dict(save_dict)
+    save_dict.setdefault('diff_version', 1)
+    for key in self.attribute_dict:
+      save_dict.setdefault(key, self.attribute_dict[key])
+    super(StringTransform, self)._from_save_dict(save_dict)
+
   def _get_array_attributes(self, prefix=''):
     """Get the dictionary that contain the original shapes of the arrays before being converted into tfrecord examples.
 
@@ -152,10 +209,21 @@ class StringTransform(n.Transform):
     att_dict = {}
     for key in array_keys:
 
-      # Add a max_sent_len dim to the tokenize_diff array since it has a
-      # diff for each token, otherwise give it input array's shape.
+      # The diffs of each example are encoded into a single string, see
+      # _alter_pour_outputs.
+      if key.endswith('_diff') and self.diff_version == 2:
+        att_dict[key] = {
+          'shape': [1],
+          'tf_type': tf.string,
+          'size': 1,
+          'feature_func': feat._bytes_feat,
+          'np_type': np.object
+        }
+        continue
+
+      # Otherwise add a max_sent_len dim to all but the tokenize_diff array,
+      # since it has a diff for each string rather than each token.
       cur_shape = shape if key == 'tokenize_diff' else shape + [self.max_sent_len]
-
       att_dict[key] = {
         'shape': list(cur_shape),
         'tf_type': tf.int64 if key == 'indices' else tf.string,
@@ -204,6 +272,15 @@ class StringTransform(n.Transform):
     # the indices array. This is so it can be easily separated into individual
     # rows that be put into separate examples.
     # pour_outputs['missing_vals'] = self._full_missing_vals(mask, missing_vals)
+
+    # Most strings come back from the tokenizer, lower casing etc. unchanged,
+    # so rather than storing a diff for every one of them, the diffs of each
+    # example are encoded into a single string of just the ones that changed.
+    for key in self._get_array_keys():
+      if key.endswith('_diff') and key in pour_outputs and self.diff_version == 2:
+        encoded = [di.encode_diffs(diff_strings) for diff_strings in pour_outputs[key]]
+        pour_outputs[key] = np.array(encoded, dtype=np.object)[:, np.newaxis]
+
     pour_outputs = self._pre(pour_outputs, prefix)
     return pour_outputs
 
@@ -223,21 +300,28 @@ class StringTransform(n.Transform):
       The dictionary with all funnels filled with values necessary in order to run the pour method.
 
     """
-    if array is not None:
-      funnel_dict = {'input': array, 'word_to_index': self.word_to_index}
-    else:
-      funnel_dict = {}
-
-    funnel_dict['index_to_word'] = self.index_to_word + ['']
-    funnel_dict['tokenizer'] = self.word_tokenizer
-    funnel_dict['detokenizer'] = self.word_detokenizer
-
     if self.lemmatize and self.lemmatizer is None:
       raise ValueError("No lemmatizer set for this Transform. Must supply one as input into pour.")
-    elif self.lemmatize:
-      funnel_dict['lemmatizer'] = self.lemmatizer
 
-    return self._pre(funnel_dict, prefix)
+    # The values that don't depend on the array only need to be built once.
+    def create_dict():
+      funnel_dict = {
+        'index_to_word': self._presorted_vocab()['index_to_word'],
+        'tokenizer': self.word_tokenizer,
+        'detokenizer': self.word_detokenizer,
+      }
+      if self.lemmatize and self.lemmatize_cache_size:
+        funnel_dict['lemmatizer'] = ut.CachedStringMap(self.lemmatizer, self.lemmatize_cache_size)
+      elif self.lemmatize:
+        funnel_dict['lemmatizer'] = self.lemmatizer
+      return self._pre(funnel_dict, prefix)
+    funnel_dict = self._get_static_dict(('funnel', prefix), create_dict)
+
+    if array is not None:
+      funnel_dict[self._pre('input', prefix)] = array
+      funnel_dict[self._pre('word_to_index', prefix)] = self._presorted_vocab()['word_to_index']
+
+    return funnel_dict
 
   def _get_tap_dict(self, pour_outputs, prefix=''):
     """Construct a dictionary where the keys are the names of the tubes, and the values are either values from the Transform itself, or are taken from the supplied pour_outputs dictionary.
@@ -255,46 +339,73 @@ class StringTransform(n.Transform):
 
     """
     pour_outputs = self._nopre(pour_outputs, prefix)
+
+    # Set all the tap values that only depend on the Transform's attributes.
+    # These only need to be built once.
+    def create_dict():
+      tap_dict = {
+        ('CatToIndex_0', 'cat_to_index_map'): self._presorted_vocab()['word_to_index'],
+        ('CatToIndex_0', 'input_dtype'): self.input_dtype,
+        ('Tokenize_0', 'detokenizer'): self.word_detokenizer,
+        ('Tokenize_0', 'tokenizer'): self.word_tokenizer,
+        ('Replace_0', 'replace_with_shape'): (1,),
+        ('IsIn_0', 'b'): self._presorted_vocab()['index_to_word']
+      }
+      if self.lemmatize:
+        tap_dict[('Lemmatize_0', 'lemmatizer')] = self.lemmatizer
+      return self._pre(tap_dict, prefix)
+    tap_dict = self._get_static_dict(('tap', prefix), create_dict)
+
     # Set all the tap values that are common across all string transforms.
-    tap_dict = {
+    u_dict = {
       'indices': pour_outputs['indices'],
       'missing_vals': pour_outputs['missing_vals'],
-      ('CatToIndex_0', 'cat_to_index_map'): self.word_to_index,
-      ('CatToIndex_0', 'input_dtype'): self.input_dtype,
-      ('Tokenize_0', 'detokenizer'): self.word_detokenizer,
-      ('Tokenize_0', 'tokenizer'): self.word_tokenizer,
       ('Tokenize_0', 'diff'): pour_outputs['tokenize_diff']
     }
 
     # Set the taps associated with the optional additional operation of the
     # Transform.
     if self.lower_case:
-      u_dict = {('LowerCase_0', 'diff'): pour_outputs['lower_case_diff']}
-      tap_dict.update(u_dict)
+      u_dict[('LowerCase_0', 'diff')] = pour_outputs['lower_case_diff']
     if self.half_width:
-      u_dict = {('HalfWidth_0', 'diff'): pour_outputs['half_width_diff']}
-      tap_dict.update(u_dict)
+      u_dict[('HalfWidth_0', 'diff')] = pour_outputs['half_width_diff']
     if self.lemmatize:
-      u_dict = {
-        ('Lemmatize_0', 'diff'): pour_outputs['lemmatize_diff'],
-        ('Lemmatize_0', 'lemmatizer'): self.lemmatizer
-      }
-      tap_dict.update(u_dict)
+      u_dict[('Lemmatize_0', 'diff')] = pour_outputs['lemmatize_diff']
 
-    # Find all the empty strings and locations of the unknown values.
-    empties = pour_outputs['indices'][pour_outputs['indices'] == -1]
+    # Find the locations of the unknown values.
     mask = pour_outputs['indices'] == self.unk_index
 
     # Add in the information needed to get back the missing_vals
-    u_dict = {
-      ('CatToIndex_0', 'missing_vals'): np.full(pour_outputs['indices'].shape, '', dtype=np.unicode),
-      ('Replace_0', 'mask'): mask,
-      ('Replace_0', 'replace_with_shape'): (1,),
-      ('IsIn_0', 'b'): self.index_to_word + ['']
-    }
-    tap_dict.update(u_dict)
+    u_dict[('CatToIndex_0', 'missing_vals')] = np.full(pour_outputs['indices'].shape, '', dtype=np.unicode)
+    u_dict[('Replace_0', 'mask')] = mask
+    tap_dict.update(self._pre(u_dict, prefix))
 
-    return self._pre(tap_dict, prefix)
+    return tap_dict
+
+  def _normalized_words(self, all_tokens):
+    """Normalize the tokens the same way the waterwork does before they're looked up in the index_to_word.
+
+    Parameters
+    ----------
+    all_tokens : list of lists of strs
+      The tokens of each string.
+
+    Returns
+    -------
+    np.ndarray of strs
+      The normalized, non empty tokens of all the strings.
+
+    """
+    words = np.array([token for tokens in all_tokens for token in tokens])
+    if not words.size:
+      return words
+    if self.lower_case:
+      words = np.char.lower(words)
+    if self.half_width:
+      words = ut.map_unique(hw._half_width, words)
+    if self.lemmatize:
+      words = ut.map_unique(self.lemmatizer, words)
+    return words[words != '']
 
   def _parse_examples(self, arrays_dict, prefix=''):
     """Convert the list of example_dicts into the original outputs that came from the pour method.
@@ -317,9 +428,49 @@ class StringTransform(n.Transform):
     # mask = pour_outputs['indices'] == self.unk_index
     # pour_outputs['missing_vals'] = pour_outputs['missing_vals'][mask].flatten()
 
+    # Decode the diffs encoded by _alter_pour_outputs. The tokenize diffs have
+    # one for each string and the rest one for each token, i.e. one for each
+    # of the indices.
+    token_shape = list(pour_outputs['indices'].shape[1:])
+    for key in self._get_array_keys():
+      if key.endswith('_diff') and key in pour_outputs and self.diff_version == 2:
+        diff_shape = token_shape[:-1] if key == 'tokenize_diff' else token_shape
+        diff_strings = [di.decode_diffs(encoded, diff_shape) for encoded in pour_outputs[key].reshape([-1]).tolist()]
+        pour_outputs[key] = np.stack(diff_strings) if diff_strings else np.zeros([0] + diff_shape, dtype=np.unicode)
+
     pour_outputs = self._pre(pour_outputs, prefix)
     return pour_outputs
 
+  def _presorted_vocab(self):
+    """Get the word_to_index and the index_to_word (along with the padding string '') with their keys sorted by wtrwrks.tanks.utils.presort, so the IsIn and CatToIndex tanks don't have to sort them on every call. They're built the first time they're asked for after the vocabulary is set."""
+    def create_dict():
+      return {
+        'word_to_index': ut.presort(self.word_to_index),
+        'index_to_word': ut.presort(self.index_to_word + [''])
+      }
+    return self._get_static_dict('presorted_vocab', create_dict)
+
+  def _sample_report(self, array, fraction):
+    """Estimate how much of the dataset the vocabulary found from a sample of it covers.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The sample the transform was fit on.
+    fraction : float
+      The fraction of the rows of the dataset that are in the sample.
+
+    Returns
+    -------
+    dict
+      The estimated 'coverage' and 'unseen_fraction' of the words in the dataset.
+
+    """
+    words = self._normalized_words([self.word_tokenizer(string) for string in array.flatten()])
+    values, counts = np.unique(words, return_counts=True)
+    in_vocab = np.array([value in self.word_to_index and value != self.unk_token for value in values.tolist()], dtype=bool)
+    return self._coverage_report(values, counts, in_vocab)
+
   def _setattributes(self, **kwargs):
     """Set the actual attributes of the Transform and do some value checks to make sure they valid inputs.
 
@@ -332,35 +483,71 @@ class StringTransform(n.Transform):
     super(StringTransform, self)._setattributes(**kwargs)
 
     if self.index_to_word is None:
-      raise ValueError("Must supply index_to_word mapping.")
-    if self.unk_index is None:
+      if self.unk_index is None:
+        self.unk_index = 0
+    elif self.unk_index is None:
       raise ValueError("Must specify an unk_index. The index to assign the unknown words.")
+    if self.max_vocab_size is not None and self.max_vocab_size < 1:
+      raise ValueError("max_vocab_size must leave room for the unknown token, got " + str(self.max_vocab_size))
     if self.word_tokenizer is None:
       raise ValueError("No tokenizer set for this Transform. Must supply one as input into pour.")
+    if self.diff_version not in (1, 2):
+      raise ValueError("diff_version must be 1 or 2, got " + str(self.diff_version))
+
+  def begin_fit(self):
+    """Start calculating the global values of the Transform from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    super(StringTransform, self).begin_fit()
+    if self.max_sent_len is None:
+      self._accumulators['max_sent_len'] = acc.Max()
 
-  def calc_global_values(self, array, verbose=True):
-    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+    # Count the words to build the index_to_word from. When only the most
+    # frequent are needed, keep a sketch ten times larger than the number of
+    # them, so the ones near the cut off are counted well.
+    if self.index_to_word is None and self.max_vocab_size is not None:
+      self._accumulators['word_counts'] = acc.HeavyHitters(capacity=10 * self.max_vocab_size, axis=0)
+    elif self.index_to_word is None:
+      self._accumulators['word_counts'] = acc.CategoryCounts(axis=0)
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them.
 
     Parameters
     ----------
     array : np.ndarray
-      The entire dataset.
+      The chunk of the dataset.
+
+    """
+    super(StringTransform, self).partial_fit(array)
+    if 'max_sent_len' not in self._accumulators and 'word_counts' not in self._accumulators:
+      return
+
+    all_tokens = [self.word_tokenizer(string) for string in array.flatten()]
+    if 'max_sent_len' in self._accumulators:
+      self._accumulators['max_sent_len'].add([len(tokens) for tokens in all_tokens])
+
+    if 'word_counts' in self._accumulators:
+      words = self._normalized_words(all_tokens)
+      if words.size:
+        self._accumulators['word_counts'].add(words)
+
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform from all the chunks fed to partial_fit since begin_fit was called.
+
+    Parameters
+    ----------
     verbose : bool
       Whether or not to print out warnings.
 
     """
-    self.input_dtype = array.dtype
-    self.input_shape = array.shape
+    super(StringTransform, self).finish_fit(verbose=verbose)
+    self._clear_static_dicts()
+    if 'word_counts' in self._accumulators:
+      self._build_index_to_word()
     self.word_to_index = {
       word: num for num, word in enumerate(self.index_to_word)
     }
-    if self.max_sent_len is None:
-      max_len = None
-      for string in array.flatten():
-        cur_len = len(self.word_tokenizer(string))
-        if max_len is None or cur_len > max_len:
-          max_len = cur_len
-      self.max_sent_len = max_len
+    if 'max_sent_len' in self._accumulators:
+      self.max_sent_len = self._accumulators['max_sent_len'].max
 
   def define_waterwork(self, array=empty, return_tubes=None):
     """Get the waterwork that completely describes the pour and pump transformations.
@@ -408,7 +595,8 @@ class StringTransform(n.Transform):
 
     # Find all the strings which are not in the list of known words and
     # replace them with the 'unknown token'.
-    isin, isin_slots = td.isin(tokens['target'], self.index_to_word + [''])
+    presorted = self._presorted_vocab()
+    isin, isin_slots = td.isin(tokens['target'], presorted['index_to_word'])
     mask, _ = td.logical_not(isin['target'])
     tokens, _ = td.replace(isin['a'], mask['target'], self.index_to_word[self.unk_index])
 
@@ -417,7 +605,7 @@ class StringTransform(n.Transform):
     isin_slots['b'].set_name('index_to_word')
 
     # Convert the tokens into indices.
-    indices, indices_slots = td.cat_to_index(tokens['target'], self.word_to_index)
+    indices, indices_slots = td.cat_to_index(tokens['target'], presorted['word_to_index'])
 
     # Set the names of the slots and tubes of this tank for easier referencing
     indices['target'].set_name('indices')
@@ -1,10 +1,12 @@
 """Definition of the base Transform class"""
 import pandas as pd
 import wtrwrks.utils.dir_functions as d
+import wtrwrks.utils.accumulators as acc
 import wtrwrks.tanks.utils as ut
 import wtrwrks.waterworks.waterwork as wa
 import wtrwrks.read_write.tf_features as feat
 import os
+import multiprocessing as mp
 import numpy as np
 import tensorflow as tf
 
@@ -50,6 +52,16 @@ class Transform(object):
       self._setattributes(**kwargs)
 
     self.waterwork = None
+    self._static_dicts = {}
+    self._accumulators = {}
+
+  def __getstate__(self):
+    """Get the state to pickle, leaving out the waterwork and anything else that is rebuilt from the attributes."""
+    state = dict(self.__dict__)
+    state['waterwork'] = None
+    state['_static_dicts'] = {}
+    state['_accumulators'] = {}
+    return state
 
   def __len__(self):
     """Get the length of the vector outputted by the row_to_vector method."""
@@ -88,12 +100,50 @@ class Transform(object):
       r_dict[key] = np.stack(r_dict[key])
     return r_dict
 
+  def _check_pumpable(self, pour_outputs):
+    """Raise an error if the pour outputs came from a forward only pour, since they are missing the information needed to pump."""
+    if isinstance(pour_outputs, wa.ForwardOutputs):
+      raise ValueError("Cannot pump the outputs of a forward only pour, the side channels needed to undo it were never calculated.")
+
+  def _clear_static_dicts(self):
+    """Throw away the dictionaries stored by _get_static_dict. Must be called whenever the attributes they're built from change."""
+    self._static_dicts = {}
+
+  def _coverage_report(self, values, counts, in_vocab):
+    """Estimate the fraction of the dataset whose values are in the vocabulary found from a sample. The values seen only once in the sample give the Good-Turing estimate of the fraction of the dataset taken up by values never seen at all, which are out of the vocabulary.
+
+    Parameters
+    ----------
+    values : np.ndarray
+      The distinct values of the sample.
+    counts : np.ndarray of ints
+      The number of times each value appears in the sample.
+    in_vocab : np.ndarray of bools
+      Whether each value is in the vocabulary.
+
+    Returns
+    -------
+    dict
+      The estimated 'coverage' and 'unseen_fraction' of the dataset.
+
+    """
+    total = float(np.sum(counts))
+    if not total:
+      return {'coverage': 0.0, 'unseen_fraction': 1.0}
+    unseen_fraction = np.sum(counts == 1) / total
+    coverage = np.sum(counts[in_vocab]) / total * (1.0 - unseen_fraction)
+    return {'coverage': coverage, 'unseen_fraction': unseen_fraction}
+
   def _extract_pour_outputs(self, tap_dict, prefix=''):
     raise NotImplementedError()
 
   def _extract_pump_outputs(self, funnel_dict, prefix=''):
     raise NotImplementedError()
 
+  def _fit_state(self):
+    """Get everything partial_fit has accumulated since begin_fit, in a form that can be pickled and passed to _merge_fit_state."""
+    return self._accumulators
+
   def _from_save_dict(self, save_dict):
     """Reconstruct the transform object from the dictionary of attributes."""
     for key in self.attribute_dict:
@@ -133,9 +183,36 @@ class Transform(object):
   def _get_funnel_dict(self, array=None, prefix=''):
     raise NotImplementedError()
 
+  def _get_static_dict(self, key, create_dict):
+    """Get a dictionary of funnel or tap values which only depend on the Transform's attributes (e.g. the fitted vocabulary) rather than on the array being transformed, creating it the first time it's asked for instead of on every call to pour or pump. A copy is returned so that the array dependent values can be added to it.
+
+    Parameters
+    ----------
+    key : hashable
+      What the dictionary is stored under, e.g. ('tap', prefix).
+    create_dict : function
+      Takes no arguments and creates the dictionary.
+
+    Returns
+    -------
+    dict
+      A copy of the stored dictionary.
+
+    """
+    if key not in self._static_dicts:
+      self._static_dicts[key] = create_dict()
+    return dict(self._static_dicts[key])
+
   def _get_tap_dict(self, pour_outputs, prefix=''):
     raise NotImplementedError()
 
+  def _merge_fit_state(self, fit_state):
+    """Add in the values accumulated by the partial_fit of another transform, as returned by its _fit_state."""
+    if sorted(self._accumulators) != sorted(fit_state):
+      raise ValueError("Can only merge the fit of a transform with the same settings, which has also run begin_fit.")
+    for key in self._accumulators:
+      self._accumulators[key].merge(fit_state[key])
+
   def _nopre(self, d, prefix=''):
     """Strip the self.name/prefix from a string or keys of a dictionary.
 
@@ -200,6 +277,100 @@ class Transform(object):
         r_d[key] = d[key]
     return r_d
 
+  def _pour_tap(self, array, tap_key):
+    """Calculate just one of the outputs of the pour, running only the tanks it needs and skipping their side channels.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The numpy array to transform.
+    tap_key : str
+      The name of the output, which must be one of the taps of the waterwork.
+
+    Returns
+    -------
+    np.ndarray
+      The value of the output.
+
+    """
+    ww = self.get_waterwork()
+    tap_dict = ww.pour(self._get_funnel_dict(array), key_type='str', taps=[tap_key])
+    return tap_dict.values()[0]
+
+  def _sample_rows(self, array, sample, seed=None):
+    """Draw a uniform random sample of the rows of a dataset.
+
+    Parameters
+    ----------
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset, or the chunks of it along the first dimension.
+    sample : int or float
+      The number of rows to sample, or the fraction of them.
+    seed : int or None
+      The seed of the random sample.
+
+    Returns
+    -------
+    np.ndarray
+      The sampled rows, in the order they appear in the dataset.
+    int
+      The number of rows in the dataset.
+
+    """
+    is_fraction = isinstance(sample, float)
+    if (is_fraction and not 0 < sample <= 1) or (not is_fraction and sample < 1):
+      raise ValueError("sample must either be a positive number of rows or a fraction between 0 and 1, got " + str(sample))
+    random = np.random.RandomState(seed)
+
+    if isinstance(array, np.ndarray):
+      num_rows = len(array)
+      size = min(max(int(round(sample * num_rows)) if is_fraction else sample, 1), num_rows)
+
+      # Only the sampled rows are read, so memmaps stay on disk. Draw with
+      # replacement until there are enough distinct rows, rather than permuting
+      # every row, unless the sample is most of the dataset.
+      if 2 * size >= num_rows:
+        indices = random.permutation(num_rows)[:size]
+      else:
+        indices = np.unique(random.randint(num_rows, size=size))
+        while len(indices) < size:
+          indices = np.union1d(indices, random.randint(num_rows, size=size - len(indices)))
+      return array[np.sort(indices)], num_rows
+
+    if is_fraction:
+      chunks, num_rows = [], 0
+      for chunk in array:
+        chunks.append(chunk[random.random_sample(len(chunk)) < sample])
+        num_rows += len(chunk)
+      if not chunks:
+        raise ValueError("Can't sample from a dataset with no chunks.")
+      return np.concatenate(chunks), num_rows
+
+    reservoir = acc.Reservoir(sample, seed=random.randint(2 ** 31))
+    for chunk in array:
+      reservoir.add(chunk)
+    if reservoir.rows is None:
+      raise ValueError("Can't sample from a dataset with no chunks.")
+    return reservoir.rows, reservoir.num_rows
+
+  def _sample_report(self, array, fraction):
+    """Estimate the errors in the global values from only fitting on a sample of the dataset.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The sample the transform was fit on.
+    fraction : float
+      The fraction of the rows of the dataset that are in the sample.
+
+    Returns
+    -------
+    dict
+      The estimated errors, keyed by what they're the errors of.
+
+    """
+    return {}
+
   def _save_dict(self):
     """Create the dictionary of values needed in order to reconstruct the transform."""
     save_dict = {}
@@ -208,6 +379,12 @@ class Transform(object):
     save_dict['__class__'] = str(self.__class__.__name__)
     return save_dict
 
+  def _wrap_pour_outputs(self, pour_outputs, forward_only):
+    """Mark the pour outputs as not pumpable if they came from a forward only pour."""
+    if forward_only:
+      return wa.ForwardOutputs(pour_outputs)
+    return pour_outputs
+
   def _setattributes(self, **kwargs):
     """Set the actual attributes of the Transform and do some value checks to make sure they valid inputs.
 
@@ -235,9 +412,65 @@ class Transform(object):
   def _shape_def(self, prefix=''):
     raise NotImplementedError()
 
+  def begin_fit(self):
+    """Start calculating the global values of the Transform from chunks of the dataset, rather than all at once with calc_global_values. The chunks are fed with partial_fit and the global values are set with finish_fit."""
+    self._accumulators = {'input': acc.ArrayInfo()}
+
+  def calc_global_values(self, array, verbose=True, sample=None, seed=None):
+    """Calculate all the values of the Transform that are dependent on all the examples of the dataset. (e.g. mean, standard deviation, unique category values, etc.) This method must be run before any actual transformation can be done.
+
+    Parameters
+    ----------
+    array : np.ndarray or iterable of np.ndarrays
+      The entire dataset (which can be a memmap), or the chunks of it along the first dimension.
+    verbose : bool
+      Whether or not to print out warnings.
+    sample : int, float or None
+      If set, only fit on a uniform random sample of the rows of the dataset. An int is the number of rows to sample and a float the fraction of them. Rows are drawn directly from an array and with reservoir (or, for a fraction, Bernoulli) sampling from chunks, so only the sample is ever held in memory.
+    seed : int or None
+      The seed of the random sample.
+
+    Returns
+    -------
+    dict or None
+      When sampling, the estimated errors of the global values that come from only seeing the sample. Has the number of rows in the dataset and in the sample, and whatever else the type of Transform can estimate, (e.g. confidence intervals of the means or the fraction of the dataset covered by the categories).
+
+    """
+    if sample is None:
+      self.begin_fit()
+      for chunk in ([array] if isinstance(array, np.ndarray) else array):
+        self.partial_fit(chunk)
+      self.finish_fit(verbose=verbose)
+      return None
+
+    array, num_rows = self._sample_rows(array, sample, seed)
+    self.begin_fit()
+    self.partial_fit(array)
+    self.finish_fit(verbose=verbose)
+
+    report = {'num_rows': num_rows, 'num_sampled': len(array)}
+    report.update(self._sample_report(array, len(array) / float(num_rows)))
+    return report
+
   def define_waterwork(self, array=None, return_tubes=None):
     raise NotImplementedError()
 
+  def finish_fit(self, verbose=True):
+    """Set the global values of the Transform from all the chunks fed to partial_fit since begin_fit was called.
+
+    Parameters
+    ----------
+    verbose : bool
+      Whether or not to print out warnings.
+
+    """
+    input_info = self._accumulators.get('input')
+    if input_info is None or input_info.inner_shape is None:
+      raise ValueError("Must run begin_fit and then partial_fit on at least one chunk before running finish_fit.")
+
+    self.input_dtype = input_info.dtype
+    self.input_shape = input_info.shape
+
   def get_waterwork(self, recreate=False):
     """Create the Transform's waterwork or return the one that was already created.
 
@@ -260,17 +493,95 @@ class Transform(object):
 
     with wa.Waterwork(name=self.name) as ww:
       self.define_waterwork()
+    self._clear_static_dicts()
+
+    # Fuse the tanks that can be done with fewer copies of the data.
+    ww.optimize()
 
     self.waterwork = ww
     return ww
 
-  def pour(self, array, **kwargs):
+  def merge_fit(self, other):
+    """Add in the chunks that another Transform of the same type and with the same settings has been fed with partial_fit, e.g. when the chunks of the dataset are split across processes.
+
+    Parameters
+    ----------
+    other : Transform
+      The transform that has run partial_fit on some other chunks of the dataset.
+
+    """
+    self._merge_fit_state(other._fit_state())
+
+  def parallel_fit(self, chunks, num_processes=None, load_chunk=None, verbose=True):
+    """Calculate the global values of the Transform by running partial_fit on the chunks of the dataset in a pool of processes and merging the results. The processes are forked, so they share the transform and the dataset with this one rather than having them pickled, and only the accumulated values are sent back.
+
+    Parameters
+    ----------
+    chunks : np.ndarray or list
+      Either the entire dataset, which is split up along its first dimension, or a list of chunks (e.g. shards or file names) which are passed through load_chunk to get the arrays.
+    num_processes : int or None
+      The number of processes to use. Defaults to the number of cpus.
+    load_chunk : func or None
+      The function which takes an element of chunks and returns the array to fit on. Defaults to the element itself.
+    verbose : bool
+      Whether or not to print out warnings.
+
+    """
+    global _parallel_fit_job
+    if num_processes is None:
+      num_processes = mp.cpu_count()
+    if load_chunk is None:
+      load_chunk = lambda chunk: chunk
+
+    # Split an array into a few ranges of rows per process. The processes take
+    # one at a time, so one that gets quick rows doesn't sit idle while the
+    # others finish.
+    if isinstance(chunks, np.ndarray):
+      array = chunks
+      bounds = np.linspace(0, len(array), num=min(4 * num_processes, len(array)) + 1).astype(int)
+      chunks = zip(bounds[:-1], bounds[1:])
+      load_chunk = lambda rows: array[rows[0]: rows[1]]
+
+    self.begin_fit()
+    if num_processes <= 1 or len(chunks) <= 1:
+      for chunk in chunks:
+        self.partial_fit(load_chunk(chunk))
+    else:
+      _parallel_fit_job = (self, chunks, load_chunk)
+      pool = mp.Pool(min(num_processes, len(chunks)))
+      try:
+        fit_states = pool.map(_partial_fit_chunk, range(len(chunks)), chunksize=1)
+      finally:
+        pool.terminate()
+        _parallel_fit_job = None
+
+      for fit_state in fit_states:
+        self._merge_fit_state(fit_state)
+
+    self.finish_fit(verbose=verbose)
+
+  def partial_fit(self, array):
+    """Feed another chunk of the dataset to the calculation of the global values. The chunks are split along the first dimension, so the dataset is what you'd get by concatenating them.
+
+    Parameters
+    ----------
+    array : np.ndarray
+      The chunk of the dataset.
+
+    """
+    self._accumulators['input'].add(array)
+
+  def pour(self, array, executor=None, forward_only=False, **kwargs):
     """Execute the transformation in the pour (forward) direction.
 
     Parameters
     ----------
     array : np.ndarray
       The numpy array to transform.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the waterwork's tanks on. If None, the tanks are run one after the other.
+    forward_only : bool
+      Whether or not to only calculate the outputs that would be fed to a model (e.g. 'nums', 'one_hots', 'indices'), skipping the diffs, missing values etc. that are needed to pump. The outputs cannot be pumped.
 
     Returns
     -------
@@ -280,16 +591,18 @@ class Transform(object):
     """
     ww = self.get_waterwork()
     funnel_dict = self._get_funnel_dict(array)
-    tap_dict = ww.pour(funnel_dict, key_type='str')
-    return self._extract_pour_outputs(tap_dict, **kwargs)
+    tap_dict = ww.pour(funnel_dict, key_type='str', executor=executor, forward_only=forward_only)
+    return self._wrap_pour_outputs(self._extract_pour_outputs(tap_dict, **kwargs), forward_only)
 
-  def pour_examples(self, array, prefix=''):
+  def pour_examples(self, array, prefix='', forward_only=False):
     """Run the pour transformation on an array to transform it into a form best for ML pipelines. This list of example dictionaries can be easily converted into tf records, but also have all the information needed in order to reconstruct the original array.
 
     Parameters
     ----------
     array : np.ndarray
       The numpy array to transform into examples.
+    forward_only : bool
+      Whether or not to only write the outputs that would be fed to a model. The examples will not have enough information to reconstruct the original array.
 
     Returns
     -------
@@ -298,7 +611,7 @@ class Transform(object):
 
     """
 
-    pour_outputs = self.pour(array)
+    pour_outputs = self.pour(array, forward_only=forward_only)
     pour_outputs = self._alter_pour_outputs(pour_outputs, prefix)
 
     num_examples = pour_outputs[pour_outputs.keys()[0]].shape[0]
@@ -324,13 +637,15 @@ class Transform(object):
 
     return example_dicts
 
-  def pump(self, kwargs):
+  def pump(self, kwargs, executor=None):
     """Execute the transformation in the pump (backward) direction.
 
     Parameters
     ----------
     kwargs: dict
       The dictionary all information needed to completely reconstruct the original rate.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the waterwork's tanks on. If None, the tanks are run one after the other.
 
     Returns
     -------
@@ -338,9 +653,10 @@ class Transform(object):
       The original numpy array that was poured.
 
     """
+    self._check_pumpable(kwargs)
     ww = self.get_waterwork()
     tap_dict = self._get_tap_dict(kwargs)
-    funnel_dict = ww.pump(tap_dict, key_type='str')
+    funnel_dict = ww.pump(tap_dict, key_type='str', executor=executor)
     return self._extract_pump_outputs(funnel_dict)
 
   def pump_examples(self, example_dicts, prefix=''):
@@ -413,7 +729,7 @@ class Transform(object):
     save_dict = self._save_dict()
     d.save_to_file(save_dict, path)
 
-  def write_examples(self, array, file_name):
+  def write_examples(self, array, file_name, forward_only=False):
     """Pours the array then writes the examples to tfrecords.
 
     Parameters
@@ -422,9 +738,11 @@ class Transform(object):
       The array to transform to examples, then write to disk.
     file_name : str
       The name of the tfrecord file to write to.
+    forward_only : bool
+      Whether or not to only write the outputs that would be fed to a model. The examples will not have enough information to reconstruct the original array.
 
     """
-    example_dicts = self.pour_examples(array)
+    example_dicts = self.pour_examples(array, forward_only=forward_only)
     writer = tf.python_io.TFRecordWriter(file_name)
 
     for feature_dict in example_dicts:
@@ -434,3 +752,16 @@ class Transform(object):
       writer.write(example.SerializeToString())
 
     writer.close()
+
+
+# The transform, chunks and load function of the running parallel_fit. Set
+# before the pool is forked so the workers inherit them instead of pickling.
+_parallel_fit_job = None
+
+
+def _partial_fit_chunk(chunk_num):
+  """Run partial_fit on one of the chunks of the running parallel_fit in a worker process and return the accumulated values."""
+  transform, chunks, load_chunk = _parallel_fit_job
+  transform.begin_fit()
+  transform.partial_fit(load_chunk(chunks[chunk_num]))
+  return transform._fit_state()
@@ -5,6 +5,7 @@ import string_transform
 import dataset_transform
 import document_transform
 import doc_to_sentence_transform
+import fit_cache
 
 CatTransform = cat_transform.CatTransform
 NumTransform = num_transform.NumTransform
@@ -13,3 +14,4 @@ StringTransform = string_transform.StringTransform
 DatasetTransform = dataset_transform.DatasetTransform
 DocumentTransform = document_transform.DocumentTransform
 DocumentToSentenceTransform = doc_to_sentence_transform.DocumentToSentenceTransform
+FitCache = fit_cache.FitCache
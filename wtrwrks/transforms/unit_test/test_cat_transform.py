@@ -139,6 +139,71 @@ class TestCatTransform(th.TestTransform):
       )
       trans = self.write_read(trans, self.temp_dir)
 
+  def test_partial_fit(self):
+    array = np.random.RandomState(0).choice(['a', 'b', 'c', 'd'], size=(30, 2))
+    for valid_cats in [None, ['a', 'b', 'c']]:
+      index_to_cat_val = sorted(set(array.flatten())) if valid_cats is None else valid_cats
+      one_hots = (array[..., np.newaxis] == np.array(index_to_cat_val)).astype(np.float64)
+      for norm_axis in [0, None, (0, 1), (0, 2)]:
+        trans = n.CatTransform(
+          name='cat',
+          norm_mode='mean_std',
+          norm_axis=norm_axis,
+          valid_cats=valid_cats
+        )
+        trans.begin_fit()
+        for start in xrange(0, 30, 8):
+          trans.partial_fit(array[start: start + 8])
+        trans.finish_fit()
+
+        std = np.array(np.std(one_hots, axis=norm_axis))
+        std[std == 0] = 1.0
+        self.assertEqual(trans.index_to_cat_val, index_to_cat_val)
+        self.assertEqual(trans.input_shape, array.shape)
+        self.assertTrue(np.allclose(trans.mean, np.mean(one_hots, axis=norm_axis)))
+        self.assertTrue(np.allclose(trans.std, std))
+
+  def test_max_categories(self):
+    rs = np.random.RandomState(0)
+    array = np.concatenate([
+      np.repeat(['a', 'b', 'c', 'd'], [50, 40, 30, 3]),
+      np.array(['x' + str(num) for num in xrange(100)])
+    ])
+    array = array[rs.permutation(len(array))].reshape([-1, 1])
+
+    trans = n.CatTransform(name='cat', max_categories=2, norm_mode='mean_std')
+    trans.begin_fit()
+    for start in xrange(0, len(array), 16):
+      trans.partial_fit(array[start: start + 16])
+    trans.finish_fit()
+    self.assertEqual(trans.index_to_cat_val, ['a', 'b'])
+    self.assertTrue(np.allclose(trans.mean, [[50. / len(array), 40. / len(array)]]))
+
+    trans = n.CatTransform(name='cat', min_count=3)
+    trans.calc_global_values(array)
+    self.assertEqual(trans.index_to_cat_val, ['a', 'b', 'c', 'd'])
+
+    # Categories outside of the vocabulary go through the missing values.
+    pour_outputs = trans.pour(array)
+    self.assertEqual(pour_outputs['cat/one_hots'].shape, (len(array), 1, 4))
+    self.assertTrue(np.array_equal(trans.pump(pour_outputs), array))
+
+    with self.assertRaises(ValueError):
+      n.CatTransform(name='cat', max_categories=2, valid_cats=['a'])
+
+  def test_sample(self):
+    array = np.random.RandomState(0).zipf(1.5, size=(20000, 1)).astype(str)
+    trans = n.CatTransform(name='cat', max_categories=50)
+    report = trans.calc_global_values(array, sample=2000, seed=0)
+    self.assertEqual(report['num_sampled'], 2000)
+    self.assertEqual(len(trans.index_to_cat_val), 50)
+
+    # The estimated coverage is close to the fraction of the full dataset
+    # that is in the categories.
+    coverage = np.mean(np.isin(array, trans.index_to_cat_val))
+    self.assertLess(abs(report['coverage'] - coverage), 0.05)
+    self.assertGreater(report['unseen_fraction'], 0)
+
   def test_read_write(self):
 
     for i in xrange(3):
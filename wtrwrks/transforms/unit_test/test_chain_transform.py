@@ -6,6 +6,7 @@ import wtrwrks.utils.test_helpers as th
 import wtrwrks.transforms.doc_to_sentence_transform as dct
 import wtrwrks.transforms.string_transform as st
 import wtrwrks.transforms.chain_transform as cht
+import wtrwrks.transforms.cat_transform as ct
 from chop.mmseg import Tokenizer as MMSEGTokenizer
 from chop.hmm import Tokenizer as HMMTokenizer
 from nltk.stem.wordnet import WordNetLemmatizer
@@ -200,6 +201,44 @@ class TestChainTransform(th.TestTransform):
     self.write_read_example(trans, strings, self.temp_dir, num_cols=1)
     # trans = self.write_read(trans, self.temp_dir)
 
+  def test_calc_global_values(self):
+    rs = np.random.RandomState(0)
+    words = ['w' + str(num) for num in xrange(30)]
+    strings = np.array([
+      ['. '.join([' '.join(rs.choice(words, 3)) for _ in xrange(rs.randint(1, 4))])]
+      for _ in xrange(50)
+    ], dtype=np.unicode)
+
+    def get_transform():
+      trans = cht.ChainTransform(name='CT')
+      trans.add_transform(dct.DocumentToSentenceTransform(name='DTS', sent_tokenizer=lambda s: s.split('. ')))
+      trans.add_transform(st.StringTransform(name='ST', word_tokenizer=lambda s: s.split(' '), max_vocab_size=20), 'DTS/sentences')
+      trans.add_transform(ct.CatTransform(name='CAT', norm_mode='mean_std'), 'ST/indices')
+      return trans
+
+    # Fit each transform on the full pour of the ones before it.
+    whole = get_transform()
+    array = strings
+    for trans_num, trans_key in enumerate(whole.transform_order):
+      whole.transforms[trans_key].calc_global_values(array, verbose=False)
+      if trans_num < len(whole.transform_order) - 1:
+        array = whole.transforms[trans_key].pour(array)[whole.tap_keys[trans_num + 1]]
+
+    # Streaming the chunks through the chain gives the same fit.
+    for data in [strings, [strings[:7], strings[7:30], strings[30:]]]:
+      trans = get_transform()
+      trans.calc_global_values(data, verbose=False, chunk_size=8)
+      self.assertEqual(trans.input_shape, strings.shape)
+      self.assertEqual(trans['DTS'].max_doc_len, whole['DTS'].max_doc_len)
+      self.assertEqual(trans['ST'].index_to_word, whole['ST'].index_to_word)
+      self.assertEqual(trans['ST'].max_sent_len, whole['ST'].max_sent_len)
+      self.assertEqual(trans['CAT'].index_to_cat_val, whole['CAT'].index_to_cat_val)
+      self.assertTrue(np.allclose(trans['CAT'].mean, whole['CAT'].mean))
+
+    report = get_transform().calc_global_values(strings, verbose=False, sample=20, seed=0)
+    self.assertEqual(report['num_sampled'], 20)
+    self.assertEqual(sorted(report['transforms']), ['CAT', 'DTS', 'ST'])
+
   def _get_index_to_word(self, strings, tokenizer, lemmatizer=None, half_width=False):
     index_to_word = set()
     for string in strings.flatten():
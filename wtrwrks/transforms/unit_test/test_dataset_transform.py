@@ -9,6 +9,8 @@ import wtrwrks.transforms.datetime_transform as dt
 import wtrwrks.transforms.string_transform as st
 import numpy as np
 import datetime
+import os
+import concurrent.futures as futures
 import nltk
 
 en_tokenizer = nltk.word_tokenize
@@ -84,6 +86,179 @@ class TestDatasetTransform(th.TestDataset):
       self.write_read_example(dataset_transform, array, self.temp_dir)
       dataset_transform = self.write_read(dataset_transform, self.temp_dir)
 
+  def test_partial_fit(self):
+    array = self._get_array()
+    get_transform = lambda: self._get_fit_transform(array)
+
+    whole = get_transform()
+    whole.calc_global_values(array)
+
+    chunked = get_transform()
+    chunked.begin_fit()
+    chunked.partial_fit(array[:1])
+
+    other = get_transform()
+    other.begin_fit()
+    other.partial_fit(array[1:3])
+    other.partial_fit(array[3:])
+
+    chunked.merge_fit(other)
+    chunked.finish_fit()
+
+    self._assert_same_fit(chunked, whole)
+
+    with self.assertRaises(ValueError):
+      chunked.begin_fit()
+      chunked.partial_fit(np.concatenate([array, array[:, :1]], axis=1))
+
+  def test_parallel_fit(self):
+    array = self._get_array()
+    whole = self._get_fit_transform(array)
+    whole.calc_global_values(array)
+
+    trans = self._get_fit_transform(array)
+    trans.parallel_fit(array, num_processes=2)
+    self._assert_same_fit(trans, whole)
+
+    shards = [array[:1], array[1:3], array[3:]]
+    trans = self._get_fit_transform(array)
+    trans.parallel_fit(range(len(shards)), num_processes=3, load_chunk=lambda num: shards[num])
+    self._assert_same_fit(trans, whole)
+
+  def test_blocks(self):
+    array = np.random.RandomState(0).randint(0, 5, size=(50, 4)).astype(np.float64)
+    file_name = os.path.join(self.temp_dir, 'array.npy')
+    np.save(file_name, array)
+    memmap = np.load(file_name, mmap_mode='r')
+
+    def get_transform():
+      trans = tr.DatasetTransform(name='DT')
+      trans.add_transform(
+        col_ranges=[0, 3],
+        transform=nt.NumTransform(name='NUM', norm_mode='mean_std', norm_axis=0, fill_nan_func=lambda a: np.array(0.))
+      )
+      trans.add_transform(col_ranges=[3, 4], transform=ct.CatTransform(name='CAT', norm_mode='mean_std'))
+      return trans
+
+    whole = get_transform()
+    whole.begin_fit()
+    whole.partial_fit(array)
+    whole.finish_fit()
+
+    # The sub transforms are fed a block at a time, in a single scan.
+    blocked = get_transform()
+    sizes = []
+    partial_fit = blocked['CAT'].partial_fit
+    blocked['CAT'].partial_fit = lambda block: sizes.append(len(block)) or partial_fit(block)
+    blocked.calc_global_values(memmap, block_size=16)
+    self.assertEqual(sizes, [16, 16, 16, 2])
+    self.assertEqual(blocked.input_shape, array.shape)
+    self.assertTrue(np.allclose(blocked['NUM'].mean, whole['NUM'].mean))
+    self.assertTrue(np.allclose(blocked['NUM'].std, whole['NUM'].std))
+    self.assertEqual(blocked['CAT'].index_to_cat_val, whole['CAT'].index_to_cat_val)
+    self.assertTrue(np.allclose(blocked['CAT'].mean, whole['CAT'].mean))
+
+    # Chunks bigger than a block are split up too.
+    sizes = []
+    blocked.calc_global_values([array[:20], array[20:]], block_size=16)
+    self.assertEqual(sizes, [16, 4, 16, 14])
+
+  def test_process_pool(self):
+    array = np.random.RandomState(0).randint(0, 5, size=(50, 4)).astype(np.float64)
+    trans = tr.DatasetTransform(name='DT')
+    trans.add_transform(
+      col_ranges=[0, 3],
+      transform=nt.NumTransform(name='NUM', norm_mode='mean_std', norm_axis=0, fill_nan_func=lambda a: np.array(0.))
+    )
+    trans.add_transform(col_ranges=[3, 4], transform=ct.CatTransform(name='CAT', norm_mode='mean_std'))
+    trans.calc_global_values(array)
+    serial = trans.pour(array)
+
+    # The optimized waterwork's tanks can all be sent to other processes.
+    self.assertIn('ColumnPartition', [type(t).__name__ for t in trans.get_waterwork().tanks.values()])
+    executor = futures.ProcessPoolExecutor(2)
+    try:
+      parallel = trans.pour(array, executor=executor)
+    finally:
+      executor.shutdown()
+    self.assertEqual(sorted(parallel.keys()), sorted(serial.keys()))
+    for key in serial:
+      self.assertTrue(np.array_equal(parallel[key], serial[key]))
+    self.assertTrue(np.allclose(trans.pump(parallel).astype(np.float64), array))
+
+  def test_sample(self):
+    array = self._get_array()
+    whole = self._get_fit_transform(array)
+    whole.calc_global_values(array)
+
+    # Chunks are fit on in order.
+    trans = self._get_fit_transform(array)
+    self.assertIsNone(trans.calc_global_values([array[:1], array[1:3], array[3:]]))
+    self._assert_same_fit(trans, whole)
+
+    # Sampling every row is the same as fitting on the whole dataset.
+    for sample in [4, 1.0]:
+      trans = self._get_fit_transform(array)
+      report = trans.calc_global_values(array, sample=sample, seed=0)
+      self._assert_same_fit(trans, whole)
+      self.assertEqual(report['num_rows'], 4)
+      self.assertEqual(report['num_sampled'], 4)
+      self.assertEqual(sorted(report['transforms']), ['CAT', 'DATE', 'NUM', 'STRING'])
+      self.assertTrue(np.allclose(report['transforms']['NUM']['mean_error'], 0))
+
+    trans = self._get_fit_transform(array)
+    report = trans.calc_global_values(iter([array[:1], array[1:3], array[3:]]), sample=2, seed=0)
+    self.assertEqual(report['num_rows'], 4)
+    self.assertEqual(report['num_sampled'], 2)
+    self.assertEqual(trans['NUM'].input_shape, (2, 3))
+
+  def _get_fit_transform(self, array):
+    tokenizer = lambda s: s.split(' ')
+    dataset_transform = tr.DatasetTransform(name='DT')
+    dataset_transform.add_transform(
+      col_ranges=[0, 1],
+      transform=ct.CatTransform(name='CAT', norm_mode='mean_std')
+    )
+    dataset_transform.add_transform(
+      col_ranges=[1, 4],
+      transform=dt.DateTimeTransform(
+        name='DATE',
+        norm_mode='mean_std',
+        fill_nat_func=lambda a: np.array(datetime.datetime(1950, 1, 1)),
+      )
+    )
+    dataset_transform.add_transform(
+      col_ranges=[4, 7],
+      transform=nt.NumTransform(
+        name='NUM',
+        norm_mode='min_max',
+        norm_axis=0,
+        fill_nan_func=lambda a: np.array(0),
+      )
+    )
+    dataset_transform.add_transform(
+      col_ranges=[7, 9],
+      transform=st.StringTransform(
+        name='STRING',
+        word_tokenizer=tokenizer,
+        index_to_word=['__UNK__'] + self._get_index_to_word(array[:, 7:9], tokenizer),
+        unk_index=0,
+      )
+    )
+    return dataset_transform
+
+  def _assert_same_fit(self, trans, other):
+    self.assertEqual(trans.input_shape, other.input_shape)
+    for key in ['CAT', 'DATE', 'NUM', 'STRING']:
+      for attr in ['input_shape', 'input_dtype', 'mean', 'std', 'min', 'max', 'index_to_cat_val', 'max_sent_len']:
+        if not hasattr(other[key], attr):
+          continue
+        val = getattr(other[key], attr)
+        if isinstance(val, (np.ndarray, np.floating)):
+          self.assertTrue(np.allclose(getattr(trans[key], attr), val))
+        else:
+          self.assertEqual(getattr(trans[key], attr), val)
+
   def _get_array(self):
     cat_array = np.array([
       ['a', 'b', 1.0],
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+import unittest
+import wtrwrks.transforms.fit_cache as fc
+import wtrwrks.transforms.num_transform as n
+import wtrwrks.transforms.cat_transform as ct
+import numpy as np
+import os
+
+
+def _unreadable():
+  raise AssertionError("The cached transform should have been used.")
+  yield
+
+
+class TestFitCache(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.array = np.random.RandomState(0).normal(size=(1000, 3))
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def _num_transform(self, norm_mode='mean_std'):
+    return n.NumTransform(
+      name='num',
+      norm_mode=norm_mode,
+      norm_axis=0,
+      fill_nan_func=lambda a: np.array(0.)
+    )
+
+  def test_hit(self):
+    cache = fc.FitCache(self.temp_dir)
+    trans = self._num_transform()
+    cache.calc_global_values(trans, self.array)
+    self.assertEqual(len(os.listdir(self.temp_dir)), 1)
+
+    # The same settings on the same data restore the global values.
+    cached = self._num_transform()
+    cache.calc_global_values(cached, self.array)
+    self.assertTrue(np.array_equal(cached.mean, trans.mean))
+    self.assertTrue(np.array_equal(cached.std, trans.std))
+    self.assertEqual(cached.input_shape, trans.input_shape)
+    self.assertTrue(np.allclose(cached.pour(self.array)['num/nums'], trans.pour(self.array)['num/nums']))
+
+    # Chunks need a fingerprint, and don't get read when it's been seen.
+    with self.assertRaises(ValueError):
+      cache.calc_global_values(self._num_transform(), iter([self.array]))
+    cache.calc_global_values(self._num_transform(), iter([self.array]), fingerprint='data')
+    cached = self._num_transform()
+    cache.calc_global_values(cached, _unreadable(), fingerprint='data')
+    self.assertTrue(np.array_equal(cached.mean, trans.mean))
+
+    # A category transform keeps its vocabulary.
+    array = np.random.RandomState(0).choice(['a', 'b', 'c'], size=(100, 1))
+    cat = ct.CatTransform(name='cat')
+    cache.calc_global_values(cat, array)
+    cached = ct.CatTransform(name='cat')
+    cache.calc_global_values(cached, array)
+    self.assertEqual(cached.index_to_cat_val, ['a', 'b', 'c'])
+
+  def test_miss(self):
+    cache = fc.FitCache(self.temp_dir)
+    cache.calc_global_values(self._num_transform(), self.array)
+
+    # Different settings, data or fitting options all refit.
+    changed = np.array(self.array)
+    changed[-1, 0] += 1.
+    for trans, array, kwargs in [
+      (self._num_transform('min_max'), self.array, {}),
+      (self._num_transform(), changed, {}),
+      (self._num_transform(), self.array, {'sample': 10, 'seed': 0}),
+    ]:
+      num_entries = len(os.listdir(self.temp_dir))
+      cache.calc_global_values(trans, array, **kwargs)
+      self.assertEqual(len(os.listdir(self.temp_dir)), num_entries + 1)
+
+    self.assertNotEqual(cache.fingerprint(changed), cache.fingerprint(self.array))
+    cache.clear()
+    self.assertEqual(os.listdir(self.temp_dir), [])
+
+  def test_evict(self):
+    cache = fc.FitCache(self.temp_dir)
+    cache.calc_global_values(self._num_transform(), self.array)
+    entry_size = os.path.getsize(os.path.join(self.temp_dir, os.listdir(self.temp_dir)[0]))
+
+    cache = fc.FitCache(self.temp_dir, max_size=int(2.5 * entry_size))
+    first = os.listdir(self.temp_dir)[0]
+    os.utime(os.path.join(self.temp_dir, first), (0, 0))
+    for scale in [2., 3.]:
+      cache.calc_global_values(self._num_transform(), self.array * scale)
+    self.assertEqual(len(os.listdir(self.temp_dir)), 2)
+    self.assertNotIn(first, os.listdir(self.temp_dir))
+
+
+if __name__ == "__main__":
+  unittest.main()
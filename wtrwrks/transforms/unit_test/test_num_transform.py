@@ -121,6 +121,144 @@ class TestNumTransform(th.TestTransform):
       for i in xrange(2):
         self.write_read_example(trans, self.array, self.temp_dir, test_type=False)
 
+    def test_partial_fit(self):
+      array = np.random.RandomState(0).normal(size=(50, 3))
+      array[[3, 17, 40], [0, 2, 1]] = np.nan
+      for norm_mode in ['mean_std', 'min_max']:
+        whole = n.NumTransform(
+          name='num',
+          norm_mode=norm_mode,
+          norm_axis=0,
+          fill_nan_func=lambda a: np.array(0.)
+        )
+        whole.calc_global_values(array)
+
+        chunked = n.NumTransform(
+          name='num',
+          norm_mode=norm_mode,
+          norm_axis=0,
+          fill_nan_func=lambda a: np.array(0.)
+        )
+        chunked.begin_fit()
+        for start in xrange(0, 50, 7):
+          chunked.partial_fit(array[start: start + 7])
+        chunked.finish_fit()
+
+        self.assertEqual(chunked.input_shape, whole.input_shape)
+        self.assertEqual(chunked.input_dtype, whole.input_dtype)
+        for key in ['mean', 'std', 'min', 'max']:
+          if getattr(whole, key) is None:
+            self.assertIsNone(getattr(chunked, key))
+          else:
+            self.assertTrue(np.allclose(getattr(chunked, key), getattr(whole, key)))
+
+      # Chunks split across two transforms and merged give the same values.
+      first = n.NumTransform(name='num', norm_mode='mean_std', fill_nan_func=lambda a: np.array(0.))
+      second = n.NumTransform(name='num', norm_mode='mean_std', fill_nan_func=lambda a: np.array(0.))
+      first.begin_fit()
+      second.begin_fit()
+      first.partial_fit(array[:20])
+      second.partial_fit(array[20:])
+      first.merge_fit(second)
+      first.finish_fit()
+      filled = np.nan_to_num(array)
+      self.assertTrue(np.allclose(first.mean, np.mean(filled)))
+      self.assertTrue(np.allclose(first.std, np.std(filled)))
+      self.assertEqual(first.input_shape, array.shape)
+
+      # Can only fit in chunks when normalizing over the first axis.
+      trans = n.NumTransform(name='num', norm_mode='mean_std', norm_axis=1, fill_nan_func=lambda a: np.array(0.))
+      trans.begin_fit()
+      with self.assertRaises(ValueError):
+        trans.partial_fit(array)
+
+    def test_robust(self):
+      array = np.random.RandomState(0).standard_cauchy(size=(1000, 2))
+      trans = n.NumTransform(
+        name='num',
+        norm_mode='robust',
+        norm_axis=0,
+        fill_nan_func=lambda a: np.array(0.)
+      )
+      trans.calc_global_values(array)
+      # The median is close in rank to the exact one.
+      ranks = np.mean(array <= trans.median, axis=0)
+      self.assertTrue((np.abs(ranks - 0.5) < 0.03).all())
+      self.assertEqual(trans.iqr.shape, (2,))
+
+      for i in xrange(2):
+        self.pour_pump(
+          trans,
+          array,
+          {
+            'num/nums': (array - trans.median) / trans.iqr,
+            'num/nans': np.zeros(array.shape, dtype=bool),
+          }
+        )
+        trans = self.write_read(trans, self.temp_dir)
+
+    def test_quantile(self):
+      rs = np.random.RandomState(0)
+      array = np.concatenate([rs.lognormal(size=(5000, 1)), rs.randint(0, 5, size=(5000, 1))], axis=1)
+      array[[3, 17, 40], [0, 1, 1]] = np.nan
+      trans = n.NumTransform(
+        name='num',
+        norm_mode='quantile',
+        norm_axis=0,
+        num_quantiles=11,
+        sketch_size=100,
+        fill_nan_func=lambda a: np.array(0.)
+      )
+      trans.begin_fit()
+      for start in xrange(0, 5000, 600):
+        trans.partial_fit(array[start: start + 600])
+      trans.finish_fit()
+      self.assertEqual(trans.quantiles.shape, (11, 2))
+      self.write_read_example(trans, array, self.temp_dir, test_type=False)
+
+      for i in xrange(2):
+        pour_outputs = trans.pour(array)
+        nums = pour_outputs['num/nums']
+        self.assertTrue(((nums >= 0) & (nums <= 1)).all())
+
+        # The normalized values are roughly uniform.
+        self.assertLess(np.abs(np.mean(nums[:, 0] <= 0.5) - 0.5), 0.05)
+
+        # Values the inverse map can't give back are stored, so the pump is
+        # exact.
+        self.assertTrue(pour_outputs['num/inexact'].any())
+        self.assertTrue(th.arrays_equal(trans.pump(pour_outputs), array))
+
+        trans = self.write_read(trans, self.temp_dir)
+
+    def test_sample(self):
+      array = np.random.RandomState(0).normal(loc=5., size=(100000, 2))
+      trans = n.NumTransform(
+        name='num',
+        norm_mode='mean_std',
+        norm_axis=0,
+        fill_nan_func=lambda a: np.array(0.)
+      )
+      chunks = [array[start: start + 30000] for start in xrange(0, len(array), 30000)]
+      for data in [array, chunks, np.float64(0.05)]:
+        if isinstance(data, np.floating):
+          report = trans.calc_global_values(iter(chunks), sample=float(data), seed=0)
+          self.assertLess(abs(report['num_sampled'] - 5000), 300)
+        else:
+          report = trans.calc_global_values(data, sample=5000, seed=0)
+          self.assertEqual(report['num_sampled'], 5000)
+        self.assertEqual(report['num_rows'], 100000)
+
+        # The sample's mean is within a few of its estimated errors.
+        self.assertTrue((np.abs(trans.mean - np.mean(array, axis=0)) < 3 * report['mean_error']).all())
+        self.assertTrue((np.abs(trans.std - np.std(array, axis=0)) < 3 * report['std_error']).all())
+        self.assertLess(report['quantile_rank_error'], 0.03)
+
+      with self.assertRaises(ValueError):
+        trans.calc_global_values(array, sample=1.5)
+      with self.assertRaises(ValueError):
+        trans.calc_global_values(array, sample=0)
+
     def test_errors(self):
 
       with self.assertRaises(ValueError):
@@ -206,6 +206,120 @@ class TestStringTransform(th.TestTransform):
       )
       trans = self.write_read(trans, self.temp_dir)
 
+  def test_build_vocab(self):
+    strings = np.array([
+      [u'The cat sat', u'the dog sat'],
+      [u'A cat ran', u'THE END'],
+      [u'the cat', u'a dog']
+    ])
+    trans = n.StringTransform(
+      name='string_transform',
+      word_tokenizer=ko_tokenizer,
+      lower_case=True,
+      max_vocab_size=4,
+    )
+    trans.begin_fit()
+    trans.partial_fit(strings[:1])
+    trans.partial_fit(strings[1:])
+    trans.finish_fit()
+
+    self.assertEqual(trans.index_to_word, ['__UNK__', 'the', 'cat', 'a'])
+    self.assertEqual(trans.word_counts['the'], 4)
+    self.assertEqual(trans.word_counts['dog'], 2)
+    self.assertEqual(trans.max_sent_len, 3)
+
+    pour_outputs = trans.pour(strings)
+    self.assertTrue(np.array_equal(pour_outputs['string_transform/indices'][0, 1], [1, 0, 0]))
+    self.assertTrue(np.array_equal(trans.pump(pour_outputs), strings))
+
+    trans = n.StringTransform(
+      name='string_transform',
+      word_tokenizer=ko_tokenizer,
+      lower_case=True,
+      min_count=2,
+      unk_index=1,
+      unk_token='<unk>'
+    )
+    trans.calc_global_values(strings)
+    self.assertEqual(trans.index_to_word, ['the', '<unk>', 'cat', 'a', 'dog', 'sat'])
+
+  def test_lemmatize_cache(self):
+    calls = []
+
+    def lemmatizer(string):
+      calls.append(string)
+      return string[:-1] if string.endswith('s') else string
+
+    strings = np.array([[u'the cats sat'], [u'two dogs and cats']])
+    trans = n.StringTransform(
+      name='string_transform',
+      word_tokenizer=ko_tokenizer,
+      word_detokenizer=lambda a: ' '.join([w for w in a if w]),
+      lemmatize=True,
+      lemmatizer=lemmatizer,
+      lemmatize_cache_size=100
+    )
+    trans.calc_global_values(strings)
+    self.assertIn('cat', trans.index_to_word)
+
+    # Only the first pour runs the lemmatizer.
+    calls[:] = []
+    for _ in xrange(3):
+      pour_outputs = trans.pour(strings)
+      self.assertTrue(np.array_equal(trans.pump(pour_outputs), strings))
+    self.assertEqual(sorted(calls), sorted(set(calls)))
+    self.assertEqual(len(calls), 7)
+
+    trans = self.write_read(trans, self.temp_dir)
+    self.assertEqual(trans.lemmatize_cache_size, 100)
+
+  def test_compact_diffs(self):
+    strings = np.array([
+      [u'The cat  sat', u'the dog sat'],
+      [u'a cat ran', u'the end'],
+      [u'the CAT', u'Été dog']
+    ])
+    trans = n.StringTransform(
+      name='string_transform',
+      word_tokenizer=ko_tokenizer,
+      word_detokenizer=lambda a: ' '.join([w for w in a if w]),
+      lower_case=True,
+    )
+    trans.calc_global_values(strings)
+
+    # Each example stores its diffs as a single string, which is empty when
+    # none of its strings changed.
+    example_dicts = trans.pour_examples(strings)
+    lower_case_diffs = [e['string_transform/lower_case_diff'].bytes_list.value for e in example_dicts]
+    tokenize_diffs = [e['string_transform/tokenize_diff'].bytes_list.value for e in example_dicts]
+    self.assertEqual([len(d) for d in lower_case_diffs], [1, 1, 1])
+    self.assertEqual(lower_case_diffs[1], [''])
+    self.assertEqual([len(d[0]) > 0 for d in tokenize_diffs], [True, False, False])
+
+    # The examples give back the same diffs and strings.
+    pour_outputs = trans.pour(strings)
+    parsed = trans._parse_examples(trans._alter_pour_outputs(pour_outputs))
+    for key in ['string_transform/lower_case_diff', 'string_transform/tokenize_diff']:
+      self.assertTrue(th.arrays_equal(parsed[key], pour_outputs[key], test_type=False))
+    self.write_read_example(trans, strings, self.temp_dir, test_type=False)
+
+    # Transforms saved before the diffs were encoded still read and write one
+    # diff string per string or token.
+    save_dict = trans._save_dict()
+    for key in ['diff_version', 'unk_token', 'max_vocab_size', 'min_count', 'word_counts', 'lemmatize_cache_size']:
+      del save_dict[key]
+    old_trans = n.StringTransform(save_dict=save_dict)
+    self.assertEqual(old_trans.diff_version, 1)
+    self.assertEqual(old_trans.unk_token, '__UNK__')
+    example_dicts = old_trans.pour_examples(strings)
+    self.assertEqual(len(example_dicts[0]['string_transform/tokenize_diff'].bytes_list.value), 2)
+    self.assertEqual(len(example_dicts[0]['string_transform/lower_case_diff'].bytes_list.value), 2 * old_trans.max_sent_len)
+    self.assertEqual(old_trans._feature_def()['string_transform/tokenize_diff'].shape, [2])
+    self.write_read_example(old_trans, strings, self.temp_dir, test_type=False)
+
+    with self.assertRaises(ValueError):
+      n.StringTransform(name='string_transform', word_tokenizer=ko_tokenizer, diff_version=3)
+
   def test_read_write(self):
     indices = np.array([
       [
@@ -0,0 +1,525 @@
+"""Mergeable summaries of arrays that are seen a chunk at a time."""
+import numpy as np
+
+
+def reduced_axes(axis, ndim):
+  """Normalize the axes an accumulator reduces over and make sure the first one is one of them, since that is the axis the chunks are stacked along.
+
+  Parameters
+  ----------
+  axis : int, tuple of ints or None
+    The axes to reduce over. None means all of them.
+  ndim : int
+    The number of dimensions of the arrays.
+
+  Returns
+  -------
+  tuple of ints
+    The sorted, non negative axes to reduce over.
+
+  """
+  if axis is None:
+    return tuple(range(ndim))
+  if type(axis) not in (tuple, list):
+    axis = (axis,)
+
+  axes = tuple(sorted(set([a % ndim if ndim else a for a in axis])))
+  if 0 not in axes:
+    raise ValueError("Can only fit in chunks when reducing over the first axis, got axis " + str(axis) + ".")
+  return axes
+
+
+class ArrayInfo(object):
+  """Keeps track of the shape and dtype of an array that is seen in chunks along its first axis.
+
+  Attributes
+  ----------
+  num_rows : int
+    The total size of the first dimension of the chunks seen so far.
+  inner_shape : tuple of ints or None
+    The size of all the other dimensions, which must be the same for every chunk.
+  dtype : numpy dtype or None
+    The dtype that all the chunks can be cast to without losing information.
+
+  """
+
+  def __init__(self):
+    """Start with no chunks seen."""
+    self.num_rows = 0
+    self.inner_shape = None
+    self.dtype = None
+
+  @property
+  def shape(self):
+    """The shape of the full array."""
+    return tuple([self.num_rows] + list(self.inner_shape))
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    self._add(array.shape[0] if array.ndim else 1, array.shape[1:], array.dtype)
+
+  def merge(self, other):
+    """Add in the chunks seen by another ArrayInfo."""
+    if other.inner_shape is not None:
+      self._add(other.num_rows, other.inner_shape, other.dtype)
+
+  def _add(self, num_rows, inner_shape, dtype):
+    if self.inner_shape is None:
+      self.inner_shape = tuple(inner_shape)
+      self.dtype = dtype
+    elif self.inner_shape != tuple(inner_shape):
+      raise ValueError("All chunks must have the same shape apart from the first dimension. Got " + str(tuple(inner_shape)) + " and " + str(self.inner_shape) + ".")
+    elif dtype != self.dtype:
+      self.dtype = np.promote_types(self.dtype, dtype)
+    self.num_rows += num_rows
+
+
+class Moments(object):
+  """The running count, mean and sum of squared differences from the mean of an array, reduced over some axes. Chunks are combined using the pairwise update of Chan et al., so the result is the same as reducing the full array, up to rounding.
+
+  Attributes
+  ----------
+  axis : int, tuple of ints or None
+    The axes to reduce over. Must include the first axis.
+  count : int
+    The number of values that went into each mean.
+  mean : np.ndarray or None
+    The mean along the axes.
+  m2 : np.ndarray or None
+    The sum of the squared differences from the mean along the axes.
+
+  """
+
+  def __init__(self, axis=None):
+    """Start with no chunks seen."""
+    self.axis = axis
+    self.count = 0
+    self.mean = None
+    self.m2 = None
+
+  @property
+  def var(self):
+    """The (population) variance along the axes."""
+    return self.m2 / self.count
+
+  @property
+  def std(self):
+    """The (population) standard deviation along the axes."""
+    return np.sqrt(self.var)
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    axes = reduced_axes(self.axis, array.ndim)
+    count = int(np.prod([array.shape[a] for a in axes]))
+    if not count:
+      return
+
+    mean = np.add.reduce(array, axis=axes, keepdims=True) / float(count)
+    m2 = np.add.reduce(np.square(array - mean), axis=axes)
+    self._merge(count, mean.reshape(m2.shape), m2)
+
+  def merge(self, other):
+    """Add in the chunks seen by another Moments."""
+    if other.count:
+      self._merge(other.count, other.mean, other.m2)
+
+  def _merge(self, count, mean, m2):
+    if not self.count:
+      self.count, self.mean, self.m2 = count, mean, m2
+      return
+
+    total = self.count + count
+    delta = mean - self.mean
+    self.mean = self.mean + delta * (float(count) / total)
+    self.m2 = self.m2 + m2 + np.square(delta) * (float(self.count) * count / total)
+    self.count = total
+
+
+class MinMax(object):
+  """The running minimum and maximum of an array, reduced over some axes.
+
+  Attributes
+  ----------
+  axis : int, tuple of ints or None
+    The axes to reduce over. Must include the first axis.
+  min : np.ndarray or None
+    The minimum along the axes.
+  max : np.ndarray or None
+    The maximum along the axes.
+
+  """
+
+  def __init__(self, axis=None):
+    """Start with no chunks seen."""
+    self.axis = axis
+    self.min = None
+    self.max = None
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    axes = reduced_axes(self.axis, array.ndim)
+    if not array.size:
+      return
+    self._merge(np.min(array, axis=axes), np.max(array, axis=axes))
+
+  def merge(self, other):
+    """Add in the chunks seen by another MinMax."""
+    if other.min is not None:
+      self._merge(other.min, other.max)
+
+  def _merge(self, min_val, max_val):
+    if self.min is None:
+      self.min, self.max = min_val, max_val
+    else:
+      self.min = np.minimum(self.min, min_val)
+      self.max = np.maximum(self.max, max_val)
+
+
+class Max(object):
+  """The running maximum of some python values.
+
+  Attributes
+  ----------
+  max : object
+    The largest value seen, or None if none have been.
+
+  """
+
+  def __init__(self):
+    """Start with no values seen."""
+    self.max = None
+
+  def add(self, values):
+    """Add some values."""
+    for value in values:
+      if self.max is None or value > self.max:
+        self.max = value
+
+  def merge(self, other):
+    """Add in the values seen by another Max."""
+    if other.max is not None:
+      self.add([other.max])
+
+
+class CategoryCounts(object):
+  """The number of times each value appears in an array, counted separately for every position along the axes that aren't reduced over. The values are kept sorted with their counts in a single array, so the memory used is proportional to the number of distinct values (times the number of positions), no matter how many chunks are added.
+
+  Attributes
+  ----------
+  axis : int, tuple of ints or None
+    The axes to count over. Must include the first axis.
+  values : np.ndarray or None
+    The sorted distinct values seen. NaNs are all counted as one value.
+  counts : np.ndarray of ints or None
+    The number of times each value appears at each position of the axes that aren't counted over. The first dimension lines up with values.
+  num_positions : int
+    The number of elements that were counted over for each position.
+
+  """
+
+  def __init__(self, axis=None):
+    """Start with no chunks seen."""
+    self.axis = axis
+    self.values = None
+    self.counts = None
+    self.num_positions = 0
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    axes = reduced_axes(self.axis, array.ndim)
+    if not array.size:
+      return
+    kept_shape = [s for a, s in enumerate(array.shape) if a not in axes]
+    kept_size = int(np.prod(kept_shape))
+
+    values, inverse = np.unique(array, return_inverse=True)
+    inverse = inverse.flatten()
+
+    # np.unique keeps every NaN separately at the end, fold them into one.
+    if values.dtype.kind == 'f' and len(values) and np.isnan(values[-1]):
+      first_nan = np.searchsorted(values, np.nan)
+      values = values[:first_nan + 1]
+      inverse = np.minimum(inverse, first_nan)
+
+    # Give every element the index of its position along the axes that aren't
+    # reduced over, so that all the counts can be done with one bincount.
+    positions = np.arange(kept_size).reshape([1 if a in axes else s for a, s in enumerate(array.shape)])
+    positions = np.broadcast_to(positions, array.shape).flatten()
+    counts = np.bincount(inverse * kept_size + positions, minlength=len(values) * kept_size)
+
+    self._merge(values, counts.reshape([len(values)] + kept_shape))
+    self.num_positions += array.size / kept_size
+
+  def get_counts(self, values):
+    """Get the counts of some values, which are zero for any value that hasn't been seen.
+
+    Parameters
+    ----------
+    values : list
+      The values to get the counts of.
+
+    Returns
+    -------
+    np.ndarray of ints
+      The counts of each value at each position, the first dimension lines up with values.
+
+    """
+    index = dict([(value, num) for num, value in enumerate(self.values)])
+    counts = np.zeros([len(values)] + list(self.counts.shape[1:]), dtype=self.counts.dtype)
+    for num, value in enumerate(values):
+      if value in index:
+        counts[num] = self.counts[index[value]]
+    return counts
+
+  def merge(self, other):
+    """Add in the chunks seen by another CategoryCounts."""
+    if other.values is not None:
+      self._merge(other.values, other.counts)
+    self.num_positions += other.num_positions
+
+  def _merge(self, values, counts):
+    if self.values is None:
+      self.values, self.counts = values, counts
+      return
+
+    all_values = np.union1d(self.values, values)
+    if all_values.dtype.kind == 'f' and len(all_values) and np.isnan(all_values[-1]):
+      all_values = all_values[:np.searchsorted(all_values, np.nan) + 1]
+
+    all_counts = np.zeros([len(all_values)] + list(counts.shape[1:]), dtype=np.int64)
+    all_counts[np.searchsorted(all_values, self.values)] += self.counts
+    all_counts[np.searchsorted(all_values, values)] += counts
+    self.values, self.counts = all_values, all_counts
+
+
+class HeavyHitters(CategoryCounts):
+  """CategoryCounts which only keeps track of the most frequent values, so the memory used is bounded by the capacity rather than by the number of distinct values. Whenever there are more than capacity values, the estimated totals of all of them are reduced by the (capacity + 1)th largest one and those that drop to zero are forgotten, as in the mergeable Misra-Gries summary. Any value that makes up more than 1 / (capacity + 1) of the data is guaranteed to be kept.
+
+  Attributes
+  ----------
+  capacity : int
+    The maximum number of values to keep.
+  axis : int, tuple of ints or None
+    The axes to count over. Must include the first axis.
+  values : np.ndarray or None
+    The sorted values being kept.
+  counts : np.ndarray of ints or None
+    The number of times each value appeared at each position since it was last added to the kept values. Exact for any value that was never forgotten.
+  totals : np.ndarray of ints or None
+    The estimated totals used to decide which values to forget. Never more than the true totals.
+  num_positions : int
+    The number of elements that were counted over for each position.
+
+  """
+
+  def __init__(self, capacity, axis=None):
+    """Start with no chunks seen."""
+    super(HeavyHitters, self).__init__(axis=axis)
+    if capacity < 1:
+      raise ValueError("HeavyHitters capacity must be at least one, got " + str(capacity))
+    self.capacity = capacity
+    self.totals = None
+
+  def merge(self, other):
+    """Add in the chunks seen by another HeavyHitters."""
+    if other.values is not None:
+      self._merge(other.values, other.counts, other.totals)
+    self.num_positions += other.num_positions
+
+  def _merge(self, values, counts, totals=None):
+    if totals is None:
+      totals = counts.reshape([len(values), -1]).sum(axis=1)
+
+    old_values, old_totals = self.values, self.totals
+    super(HeavyHitters, self)._merge(values, counts)
+    if old_values is None:
+      self.totals = totals
+    else:
+      all_totals = np.zeros([len(self.values)], dtype=np.int64)
+      all_totals[np.searchsorted(self.values, old_values)] += old_totals
+      all_totals[np.searchsorted(self.values, values)] += totals
+      self.totals = all_totals
+
+    if len(self.values) > self.capacity:
+      threshold = np.partition(self.totals, -(self.capacity + 1))[-(self.capacity + 1)]
+      keep = self.totals > threshold
+      self.values = self.values[keep]
+      self.counts = self.counts[keep]
+      self.totals = self.totals[keep] - threshold
+
+
+class Quantiles(object):
+  """An approximate quantile sketch of an array, kept separately for every position along the axes that aren't reduced over. Follows KLL (Karnin, Lang and Liberty): the values are kept in levels where a value on level h stands in for 2 ** h of the original ones. Whenever a level gets too big it's sorted and every other value, starting at a random offset, is promoted to the level above. The capacities shrink geometrically going down from the top level, so the memory used is about 3 * k values per position no matter how many chunks are added, and the rank of any estimated quantile is off by roughly n / k at the most.
+
+  Attributes
+  ----------
+  k : int
+    The capacity of the top level, which sets the accuracy.
+  axis : int, tuple of ints or None
+    The axes to reduce over. Must include the first axis.
+  levels : list of np.ndarrays
+    The values kept on each level, each of shape [num_values, num_kept_positions]. Every position has the same number of values on each level.
+  kept_shape : list of ints or None
+    The shape of the axes that aren't reduced over.
+  count : int
+    The number of values that went into each sketch.
+  min : np.ndarray or None
+    The exact minimum along the axes.
+  max : np.ndarray or None
+    The exact maximum along the axes.
+
+  """
+
+  def __init__(self, k=200, axis=None, seed=0):
+    """Start with no chunks seen."""
+    if k < 2:
+      raise ValueError("Quantiles k must be at least two, got " + str(k))
+    self.k = k
+    self.axis = axis
+    self.levels = []
+    self.kept_shape = None
+    self.count = 0
+    self.min = None
+    self.max = None
+    self._random = np.random.RandomState(seed)
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    axes = reduced_axes(self.axis, array.ndim)
+    if not array.size:
+      return
+    kept_axes = [a for a in xrange(array.ndim) if a not in axes]
+    kept_shape = [array.shape[a] for a in kept_axes]
+
+    # Line up the values of each position in a column.
+    values = np.transpose(array, list(axes) + kept_axes).reshape([-1, int(np.prod(kept_shape))])
+    self._merge([values], kept_shape, len(values), np.min(values, axis=0), np.max(values, axis=0))
+
+  def merge(self, other):
+    """Add in the chunks seen by another Quantiles."""
+    if other.count:
+      self._merge(other.levels, other.kept_shape, other.count, other.min, other.max)
+
+  def quantiles(self, probs):
+    """Get the estimated quantiles.
+
+    Parameters
+    ----------
+    probs : list of floats
+      The probabilities, between 0 and 1, to get the quantiles of. 0 and 1 give the exact min and max.
+
+    Returns
+    -------
+    np.ndarray
+      The quantiles, of shape [len(probs)] + kept_shape.
+
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    items = np.concatenate(self.levels)
+    weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+
+    order = np.argsort(items, axis=0, kind='mergesort')
+    items = np.take_along_axis(items, order, axis=0)
+    cum_weights = np.cumsum(weights[order], axis=0)
+
+    # The first value whose cumulative weight reaches the desired rank.
+    indices = (cum_weights[np.newaxis] < (probs * self.count)[:, np.newaxis, np.newaxis]).sum(axis=1)
+    quantiles = np.take_along_axis(items, np.minimum(indices, len(items) - 1), axis=0)
+    quantiles[probs <= 0] = self.min
+    quantiles[probs >= 1] = self.max
+    return quantiles.reshape([len(probs)] + list(self.kept_shape))
+
+  def _capacity(self, level):
+    return max(2, int(np.ceil(self.k * (2. / 3.) ** (len(self.levels) - 1 - level))))
+
+  def _merge(self, levels, kept_shape, count, min_val, max_val):
+    if self.kept_shape is None:
+      self.kept_shape = list(kept_shape)
+    elif self.kept_shape != list(kept_shape):
+      raise ValueError("All chunks must have the same shape along the axes that aren't reduced over. Got " + str(list(kept_shape)) + " and " + str(self.kept_shape) + ".")
+
+    for h, level in enumerate(levels):
+      if h < len(self.levels):
+        self.levels[h] = np.concatenate([self.levels[h], level])
+      else:
+        self.levels.append(level)
+
+    if self.min is None:
+      self.min, self.max = min_val, max_val
+    else:
+      self.min = np.minimum(self.min, min_val)
+      self.max = np.maximum(self.max, max_val)
+    self.count += count
+    self._compress()
+
+  def _compress(self):
+    h = 0
+    while h < len(self.levels):
+      level = self.levels[h]
+      if len(level) > self._capacity(h):
+        # Promote every other value of the sorted level, leaving one behind if
+        # there's an odd number so that the total weight doesn't change.
+        level = np.sort(level, axis=0)
+        num_promoted = len(level) - len(level) % 2
+        promoted = level[self._random.randint(2): num_promoted: 2]
+        self.levels[h] = level[num_promoted:]
+        if h + 1 < len(self.levels):
+          self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+        else:
+          self.levels.append(promoted)
+      h += 1
+
+
+class Reservoir(object):
+  """A uniform random sample, without replacement, of the rows of an array that is seen in chunks. Every row is given a random key and the rows with the smallest keys are kept, so two reservoirs can be merged into a uniform sample of all the rows either has seen.
+
+  Attributes
+  ----------
+  size : int
+    The number of rows to keep.
+  rows : np.ndarray or None
+    The sampled rows, in the order they were seen.
+  keys : np.ndarray or None
+    The random keys of the sampled rows.
+  num_rows : int
+    The number of rows seen.
+
+  """
+
+  def __init__(self, size, seed=None):
+    """Start with no chunks seen."""
+    if size < 1:
+      raise ValueError("Reservoir size must be at least one, got " + str(size))
+    self.size = size
+    self.rows = None
+    self.keys = None
+    self.num_rows = 0
+    self._random = np.random.RandomState(seed)
+
+  def add(self, array):
+    """Add a chunk of the array."""
+    self._merge(array, self._random.random_sample(len(array)), len(array))
+
+  def merge(self, other):
+    """Add in the rows seen by another Reservoir."""
+    if other.rows is not None:
+      self._merge(other.rows, other.keys, other.num_rows)
+    else:
+      self.num_rows += other.num_rows
+
+  def _merge(self, rows, keys, num_rows):
+    self.num_rows += num_rows
+
+    # Once the reservoir is full, only the rows with smaller keys than the
+    # largest one kept can get in.
+    if self.rows is not None and len(self.rows) >= self.size:
+      candidates = keys < self.keys.max()
+      rows, keys = rows[candidates], keys[candidates]
+    if self.rows is not None:
+      rows = np.concatenate([self.rows, rows])
+      keys = np.concatenate([self.keys, keys])
+
+    if len(rows) > self.size:
+      keep = np.sort(np.argpartition(keys, self.size - 1)[:self.size])
+      rows, keys = rows[keep], keys[keep]
+    self.rows, self.keys = rows, keys
@@ -9,14 +9,20 @@ import unittest
 import shutil
 import tempfile
 import wtrwrks.waterworks.waterwork as wa
+import wtrwrks.waterworks.strict_ownership as so
 import pprint
 
 class WWTest(unittest.TestCase):
   def setUp(self):
       self.temp_dir = tempfile.mkdtemp()
 
+      # Catch any tank that changes an array it doesn't own.
+      self.strict_ownership = so.StrictOwnership()
+      self.strict_ownership.__enter__()
+
   def tearDown(self):
       shutil.rmtree(self.temp_dir)
+      self.strict_ownership.__exit__(None, None, None)
 
   def equals(self, first, second, test_type=True):
 
@@ -0,0 +1,128 @@
+import unittest
+import wtrwrks.utils.accumulators as acc
+import numpy as np
+
+
+class TestAccumulators(unittest.TestCase):
+  def setUp(self):
+    self.array = np.random.RandomState(0).normal(loc=1000., size=(40, 3, 2))
+    self.chunks = [self.array[:5], self.array[5:6], self.array[6:30], self.array[30:]]
+
+  def test_moments(self):
+    for axis in [0, None, (0, 2), -3]:
+      moments = acc.Moments(axis=axis)
+      other = acc.Moments(axis=axis)
+      moments.add(self.chunks[0])
+      moments.add(self.chunks[1])
+      other.add(self.chunks[2])
+      other.add(self.chunks[3])
+      moments.merge(other)
+
+      self.assertTrue(np.allclose(moments.mean, np.mean(self.array, axis=axis)))
+      self.assertTrue(np.allclose(moments.std, np.std(self.array, axis=axis)))
+
+    with self.assertRaises(ValueError):
+      acc.Moments(axis=1).add(self.array)
+
+  def test_min_max(self):
+    min_max = acc.MinMax(axis=(0, 1))
+    for chunk in self.chunks:
+      min_max.add(chunk)
+    self.assertTrue(np.array_equal(min_max.min, np.min(self.array, axis=(0, 1))))
+    self.assertTrue(np.array_equal(min_max.max, np.max(self.array, axis=(0, 1))))
+
+  def test_category_counts(self):
+    array = np.array([['a', 'b'], ['a', 'c'], ['b', 'b']])
+    counts = acc.CategoryCounts(axis=0)
+    other = acc.CategoryCounts(axis=0)
+    counts.add(array[:1])
+    other.add(array[1:])
+    counts.merge(other)
+
+    self.assertEqual(counts.num_positions, 3)
+    self.assertEqual(list(counts.values), ['a', 'b', 'c'])
+    self.assertTrue(np.array_equal(counts.counts, [[2, 0], [1, 2], [0, 1]]))
+    self.assertTrue(np.array_equal(counts.get_counts(['c', 'd']), [[0, 1], [0, 0]]))
+
+    # All the NaNs are counted as a single value.
+    counts = acc.CategoryCounts(axis=None)
+    counts.add(np.array([1.0, np.nan, np.nan]))
+    counts.add(np.array([np.nan, 2.0]))
+    self.assertEqual(len(counts.values), 3)
+    self.assertTrue(np.array_equal(counts.counts, [1, 1, 3]))
+
+  def test_heavy_hitters(self):
+    rs = np.random.RandomState(0)
+    array = np.concatenate([np.full(300, -1), np.full(200, -2), np.arange(1000)])
+    array = array[rs.permutation(len(array))]
+
+    heavy_hitters = acc.HeavyHitters(capacity=5)
+    other = acc.HeavyHitters(capacity=5)
+    for start in xrange(0, 800, 100):
+      heavy_hitters.add(array[start: start + 100])
+    for start in xrange(800, len(array), 100):
+      other.add(array[start: start + 100])
+    heavy_hitters.merge(other)
+
+    self.assertLessEqual(len(heavy_hitters.values), 5)
+    self.assertEqual(list(heavy_hitters.values[:2]), [-2, -1])
+    self.assertTrue(np.all(heavy_hitters.totals <= heavy_hitters.counts))
+    self.assertEqual(heavy_hitters.num_positions, len(array))
+
+  def test_quantiles(self):
+    array = np.random.RandomState(1).standard_cauchy(size=(20000, 2))
+    quantiles = acc.Quantiles(k=100, axis=0)
+    other = acc.Quantiles(k=100, axis=0)
+    for start in xrange(0, 15000, 1000):
+      quantiles.add(array[start: start + 1000])
+    other.add(array[15000:])
+    quantiles.merge(other)
+
+    self.assertEqual(quantiles.count, len(array))
+    self.assertLess(sum([len(level) for level in quantiles.levels]), 400)
+
+    probs = np.linspace(0, 1, 11)
+    estimates = quantiles.quantiles(probs)
+    self.assertEqual(estimates.shape, (11, 2))
+    self.assertTrue(np.array_equal(estimates[0], np.min(array, axis=0)))
+    self.assertTrue(np.array_equal(estimates[-1], np.max(array, axis=0)))
+    for col in xrange(2):
+      ranks = np.searchsorted(np.sort(array[:, col]), estimates[:, col]) / float(len(array))
+      self.assertLess(np.abs(ranks - probs).max(), 0.03)
+
+  def test_reservoir(self):
+    reservoir = acc.Reservoir(size=10, seed=0)
+    other = acc.Reservoir(size=10, seed=1)
+    reservoir.add(self.chunks[0])
+    reservoir.add(self.chunks[1])
+    other.add(self.chunks[2])
+    other.add(self.chunks[3])
+    reservoir.merge(other)
+    self.assertEqual(reservoir.num_rows, 40)
+    self.assertEqual(reservoir.rows.shape, (10, 3, 2))
+
+    # The rows are all distinct rows of the array, kept in order.
+    rows = [np.where((self.array == row).all(axis=(1, 2)))[0][0] for row in reservoir.rows]
+    self.assertEqual(rows, sorted(set(rows)))
+
+    # Every row is equally likely to be sampled.
+    hits = np.zeros(40)
+    for seed in xrange(500):
+      reservoir = acc.Reservoir(size=10, seed=seed)
+      for start, end in [(0, 5), (5, 6), (6, 30), (30, 40)]:
+        reservoir.add(np.arange(start, end))
+      hits[reservoir.rows] += 1
+    self.assertLess(np.abs(hits / 500. - 0.25).max(), 0.1)
+
+  def test_array_info(self):
+    info = acc.ArrayInfo()
+    info.add(np.zeros((2, 3), dtype=np.int64))
+    info.add(np.zeros((4, 3), dtype=np.float32))
+    self.assertEqual(info.shape, (6, 3))
+    self.assertEqual(info.dtype, np.float64)
+
+    with self.assertRaises(ValueError):
+      info.add(np.zeros((2, 4)))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,117 @@
+"""CompiledWaterwork definition."""
+import wtrwrks.waterworks.plan as pl
+import wtrwrks.tanks.utils as ut
+
+
+class CompiledWaterwork(object):
+  """Plain python functions generated from a waterwork's plan. Each function calls the tanks' _pour or _pump methods one after the other, passing values around as local variables. There is no validation of the inputs, no routing through the execution context and nothing is stored on the slots or tubes, so they are the lowest overhead way of running a waterwork, e.g. when transforming one request at a time.
+
+  All the functions take a single dictionary keyed by the names of the funnels (or taps for pump) and return a dictionary keyed by the names of the taps (or funnels). Plugged funnels and taps are filled by their plugs and left out of the outputs. Funnels and taps that were given a value when the waterwork was defined fall back to that value, as it was when the waterwork was compiled.
+
+  Attributes
+  ----------
+  pour : function
+    Runs the waterwork in the pour direction.
+  pump : function
+    Runs the waterwork in the pump direction.
+  pour_forward : function
+    Runs the waterwork in the pour direction, skipping the side channels of the tanks. The same as Waterwork.pour with forward_only set to True.
+  pour_source : str
+    The generated source of the pour function.
+  pump_source : str
+    The generated source of the pump function.
+  pour_forward_source : str
+    The generated source of the pour_forward function.
+
+  """
+
+  def __init__(self, plan):
+    """Generate and compile the functions for a plan.
+
+    Parameters
+    ----------
+    plan : Plan
+      The plan of the waterwork to compile.
+
+    """
+    pour_taps = [(t, r) for t, r in plan.taps if t.plug is None]
+    pump_funnels = [(f, r) for f, r in plan.funnels if f.plug is None]
+    forward_taps = [(t, r) for t, r in plan.forward_taps if t.plug is None]
+
+    self.pour_source, self.pour = _compile(
+      'pour', plan.funnels, plan.pour_steps, plan.pour_releases, pour_taps
+    )
+    self.pump_source, self.pump = _compile(
+      'pump', plan.taps, plan.pump_steps, plan.pump_releases, pump_funnels
+    )
+    self.pour_forward_source, self.pour_forward = _compile(
+      'pour_forward', plan.funnels, plan.forward_steps, plan.forward_releases, forward_taps
+    )
+
+
+# The tank method each of the plan's execute functions stands for.
+_methods = {
+  pl._execute_pour: '_pour',
+  pl._execute_pour_forward: '_pour_forward',
+  pl._execute_pump: '_pump',
+}
+
+
+def _compile(name, inputs, steps, releases, outputs):
+  """Generate the source of a function that runs the steps and compile it.
+
+  Parameters
+  ----------
+  name : str
+    The name of the function.
+  inputs : list of (Slot or Tube, int) tuples
+    The funnels (or taps) of the waterwork, along with their registers.
+  steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers.
+  releases : list of lists of ints
+    The registers that are no longer needed after each step.
+  outputs : list of (Slot or Tube, int) tuples
+    The taps (or funnels) to return, along with their registers.
+
+  Returns
+  -------
+  str
+    The source of the function.
+  function
+    The compiled function.
+
+  """
+  # Anything that isn't a local variable (tanks, plugs and default values) is
+  # put in the function's globals. The inputs belong to the caller, so the
+  # tanks only get read only views of them.
+  namespace = {'read_only': ut.read_only}
+  lines = ['def ' + name + '(inputs):']
+
+  for part, register in inputs:
+    var = 'v' + str(register)
+    if part.plug is not None:
+      namespace['p' + str(register)] = part.plug
+      lines.append('  ' + var + ' = read_only(p' + str(register) + '(inputs))')
+    elif part.get_val() is not None:
+      namespace['c' + str(register)] = ut.read_only(part.get_val())
+      lines.append('  ' + var + ' = read_only(inputs[' + repr(part.name) + ']) if ' + repr(part.name) + ' in inputs else c' + str(register))
+    else:
+      lines.append('  ' + var + ' = read_only(inputs[' + repr(part.name) + '])')
+
+  for step_num, (tank, execute, step_inputs, step_outputs) in enumerate(steps):
+    namespace['t' + str(step_num)] = tank
+    args = ', '.join([k + '=v' + str(r) for k, r in step_inputs])
+    lines.append('  r = t' + str(step_num) + '.' + _methods[execute] + '(' + args + ')')
+
+    for key, register in step_outputs:
+      lines.append('  v' + str(register) + ' = r[' + repr(key) + ']')
+
+    if releases[step_num]:
+      lines.append('  del ' + ', '.join(['v' + str(r) for r in releases[step_num]]))
+
+  items = ', '.join([repr(part.name) + ': v' + str(r) for part, r in outputs])
+  lines.append('  return {' + items + '}')
+
+  source = '\n'.join(lines) + '\n'
+  exec compile(source, '<waterwork ' + name + '>', 'exec') in namespace
+  return source, namespace[name]
@@ -74,6 +74,10 @@ class Empty(wp.WaterworkPart):
     import wtrwrks.tanks.tank_defs as td
     return td.mul(a=other, b=self)
 
+  def __reduce__(self):
+    """Unpickle as the module level empty object, since it's compared by identity."""
+    return 'empty'
+
   def __rsub__(self, other):
     """Define an add tank (operation) between two tubes."""
     import wtrwrks.tanks.tank_defs as td
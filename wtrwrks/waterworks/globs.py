@@ -1,2 +1,3 @@
 _default_waterwork = None
 _name_space = None
+_strict_ownership = False
@@ -12,6 +12,8 @@ class NameSpace(object):
     The prefix to append to the names of waterwork parts.
   all_name_spaces : list of strs
     The names of the hierarchy of namespaces this namespace belongs to.
+  name_string : str
+    The full prefix, i.e. the names of all_name_spaces joined together. Calculated once when the namespace is entered since every part created inside of it needs it.
 
   """
 
@@ -26,6 +28,7 @@ class NameSpace(object):
     """
     self.name = name
     self.all_name_spaces = []
+    self.name_string = name
 
   def __enter__(self):
     """When entering, set the global _name_space."""
@@ -34,6 +37,9 @@ class NameSpace(object):
     else:
       self.all_name_spaces = gl._name_space.all_name_spaces + [self]
 
+    name_strings = [ns.name for ns in self.all_name_spaces]
+    self.name_string = os.path.join(*name_strings)
+
     gl._name_space = self
     return self
 
@@ -45,9 +51,7 @@ class NameSpace(object):
       gl._name_space = None
 
   def _get_name_string(self):
-    name_strings = [ns.name for ns in self.all_name_spaces]
-    name_string = os.path.join(*name_strings)
-    return name_string
+    return self.name_string
 
   def __str__(self):
     """Print out the full namespace name."""
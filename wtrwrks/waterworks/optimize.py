@@ -0,0 +1,259 @@
+"""Rewrites of waterworks into equivalent ones with fewer full array temporaries."""
+import wtrwrks.waterworks.name_space as ns
+import wtrwrks.tanks.sub as su
+import wtrwrks.tanks.div as dv
+import wtrwrks.tanks.transpose as tr
+import wtrwrks.tanks.partition as pa
+import wtrwrks.tanks.iterate as it
+import wtrwrks.tanks.sub_div as sd
+import wtrwrks.tanks.column_partition as cp
+from wtrwrks.waterworks.empty import empty
+import os
+
+
+def optimize(waterwork):
+  """Replace groups of tanks in the waterwork with fused tanks that do the same thing with fewer copies of the data. The funnels and taps keep their names, and their (tank name, key) tuples keep working, so the waterwork is poured and pumped exactly as before.
+
+  The rewrites are:
+    * a Sub tank whose target is divided by a Div tank becomes a SubDiv tank, if the values being subtracted and divided by are funnels.
+    * a Transpose tank followed by a Partition, an IterList and a Transpose of every part (as built by the DatasetTransform) becomes a ColumnPartition tank, if the axes and indices are funnels.
+
+  Parameters
+  ----------
+  waterwork : Waterwork
+    The waterwork to rewrite in place.
+
+  Returns
+  -------
+  int
+    The number of rewrites made.
+
+  """
+  num_rewrites = 0
+  for tank in sorted(waterwork.tanks.values(), key=lambda t: t.name):
+    # Earlier rewrites may have already removed the tank.
+    if waterwork.tanks.get(tank.name) is not tank:
+      continue
+
+    if type(tank) is su.Sub and _fuse_sub_div(waterwork, tank):
+      num_rewrites += 1
+    elif type(tank) is pa.Partition and _fuse_column_partition(waterwork, tank):
+      num_rewrites += 1
+
+  return num_rewrites
+
+
+def _fuse_sub_div(waterwork, sub):
+  """Replace a Sub tank and the Div tank it feeds with a SubDiv tank, if possible.
+
+  Parameters
+  ----------
+  waterwork : Waterwork
+    The waterwork the tanks belong to.
+  sub : Sub
+    The Sub tank.
+
+  Returns
+  -------
+  bool
+    Whether or not the tanks were replaced.
+
+  """
+  slot = sub.tubes['target'].slot
+  if slot is empty or type(slot.tank) is not dv.Div or slot.key != 'a':
+    return False
+  div = slot.tank
+
+  # The other operands have to be funnels, otherwise they could depend on the
+  # outputs of the Sub tank.
+  if not _is_funnel(sub.slots['b']) or not _is_funnel(div.slots['b']):
+    return False
+
+  name = _sibling_name(waterwork, sub.name, 'SubDiv')
+  _replace_tanks(
+    waterwork, [sub, div], sd.SubDiv, name,
+    {
+      'a': sub.slots['a'],
+      'sub': sub.slots['b'],
+      'div': div.slots['b'],
+    },
+    {
+      'target': div.tubes['target'],
+      'sub_smaller_size_array': sub.tubes['smaller_size_array'],
+      'sub_a_is_smaller': sub.tubes['a_is_smaller'],
+      'div_smaller_size_array': div.tubes['smaller_size_array'],
+      'div_a_is_smaller': div.tubes['a_is_smaller'],
+      'missing_vals': div.tubes['missing_vals'],
+      'remainder': div.tubes['remainder'],
+    }
+  )
+  return True
+
+
+def _fuse_column_partition(waterwork, partition):
+  """Replace a Partition tank along with the Transpose tank feeding it, the IterList tank splitting up its parts and the Transpose tanks on each part, with a ColumnPartition tank, if possible.
+
+  Parameters
+  ----------
+  waterwork : Waterwork
+    The waterwork the tanks belong to.
+  partition : Partition
+    The Partition tank.
+
+  Returns
+  -------
+  bool
+    Whether or not the tanks were replaced.
+
+  """
+  tube = partition.slots['a'].tube
+  if tube is empty or type(tube.tank) is not tr.Transpose or tube.key != 'target':
+    return False
+  transpose = tube.tank
+
+  slot = partition.tubes['target'].slot
+  if slot is empty or not isinstance(slot.tank, it.IterList):
+    return False
+  iter_list = slot.tank
+
+  part_transposes = []
+  for key in iter_list.tube_keys:
+    slot = iter_list.tubes[key].slot
+    if slot is empty or type(slot.tank) is not tr.Transpose or slot.key != 'a':
+      return False
+    part_transposes.append(slot.tank)
+
+  funnels = [transpose.slots['axes'], partition.slots['indices']]
+  funnels.extend([t.slots['axes'] for t in part_transposes])
+  if not all([_is_funnel(s) for s in funnels]):
+    return False
+
+  num_parts = len(part_transposes)
+  part_keys = [str(num) for num in xrange(num_parts)]
+
+  slot_map = {
+    'a': transpose.slots['a'],
+    'axes': transpose.slots['axes'],
+    'indices': partition.slots['indices'],
+  }
+  tube_map = {
+    'axes': transpose.tubes['axes'],
+    'indices': partition.tubes['indices'],
+    'missing_cols': partition.tubes['missing_cols'],
+    'missing_array': partition.tubes['missing_array'],
+  }
+  for key, part_transpose in zip(part_keys, part_transposes):
+    slot_map['axes_' + key] = part_transpose.slots['axes']
+    tube_map['target_' + key] = part_transpose.tubes['target']
+    tube_map['axes_' + key] = part_transpose.tubes['axes']
+
+  name = _sibling_name(waterwork, partition.name, 'ColumnPartition')
+  _replace_tanks(
+    waterwork, [transpose, partition, iter_list] + part_transposes,
+    cp.ColumnPartition, name, slot_map, tube_map, num_parts=num_parts
+  )
+  return True
+
+
+def _is_funnel(slot):
+  """Whether the slot isn't connected to any tube."""
+  return slot.tube is empty
+
+
+def _sibling_name(waterwork, name, base_name):
+  """Get an unused tank name of the form <base_name>_<num> in the same name space as the tank name."""
+  prefix = os.path.dirname(name)
+  num = 0
+  full_name = os.path.join(prefix, base_name + '_' + str(num))
+  while full_name in waterwork.tanks:
+    num += 1
+    full_name = os.path.join(prefix, base_name + '_' + str(num))
+  return full_name
+
+
+def _replace_tanks(waterwork, old_tanks, cls, name, slot_map, tube_map, **kwargs):
+  """Replace some tanks of the waterwork with a single new tank. The slots and tubes of the new tank take over the names, connections, values and plugs of the old slots and tubes they're mapped to. Any other slots and tubes of the old tanks must only be connected to each other.
+
+  Parameters
+  ----------
+  waterwork : Waterwork
+    The waterwork the tanks belong to.
+  old_tanks : list of Tanks
+    The tanks to remove.
+  cls : type
+    The Tank subclass of the new tank.
+  name : str
+    The full name of the new tank.
+  slot_map : dict(
+    keys - strs. The slot keys of the new tank.
+    values - Slots. The slots of the old tanks they replace.
+  )
+    The slots to take over.
+  tube_map : dict(
+    keys - strs. The tube keys of the new tank.
+    values - Tubes. The tubes of the old tanks they replace.
+  )
+    The tubes to take over.
+  kwargs : dict
+    Any other arguments to create the new tank with.
+
+  Returns
+  -------
+  Tank
+    The new tank.
+
+  """
+  for tank in old_tanks:
+    del waterwork.tanks[tank.name]
+    for slot in tank.slots.values():
+      del waterwork.slots[slot.name]
+      waterwork.funnels.pop(slot.name, None)
+    for tube in tank.tubes.values():
+      del waterwork.tubes[tube.name]
+      waterwork.taps.pop(tube.name, None)
+
+  with ns.NameSpace(''):
+    tank = cls(name=name, waterwork=waterwork, **kwargs)
+
+  for key in slot_map:
+    old_slot = slot_map[key]
+    slot = tank.slots[key]
+    del waterwork.slots[slot.name]
+    del waterwork.funnels[slot.name]
+
+    slot.name = old_slot.name
+    slot.name_space = old_slot.name_space
+    slot.val = old_slot.val
+    slot.plug = old_slot.plug
+    slot.tube = old_slot.tube
+    waterwork.slots[slot.name] = slot
+    if slot.tube is empty:
+      waterwork.funnels[slot.name] = slot
+    else:
+      slot.tube.slot = slot
+
+    if old_slot.get_tuple() != slot.get_tuple():
+      waterwork.slot_aliases[old_slot.get_tuple()] = slot.name
+
+  for key in tube_map:
+    old_tube = tube_map[key]
+    tube = tank.tubes[key]
+    del waterwork.tubes[tube.name]
+    del waterwork.taps[tube.name]
+
+    tube.name = old_tube.name
+    tube.name_space = old_tube.name_space
+    tube.val = old_tube.val
+    tube.plug = old_tube.plug
+    tube.slot = old_tube.slot
+    waterwork.tubes[tube.name] = tube
+    if tube.slot is empty:
+      waterwork.taps[tube.name] = tube
+    else:
+      tube.slot.tube = tube
+
+    if old_tube.get_tuple() != tube.get_tuple():
+      waterwork.tube_aliases[old_tube.get_tuple()] = tube.name
+
+  waterwork._invalidate_plan()
+  return tank
@@ -0,0 +1,778 @@
+"""Plan definition."""
+from wtrwrks.waterworks.empty import empty
+import wtrwrks.tanks.utils as ut
+import collections
+import cPickle as pickle
+import Queue
+
+
+class Plan(object):
+  """The compiled form of a waterwork's graph. Stores the order the tanks need to be run in for both the pour and pump directions, along with where each tank's inputs come from and where its outputs go, so that the graph does not need to be rediscovered on every call to pour or pump. A plan is only valid for as long as the waterwork is not altered, the waterwork is in charge of throwing it away when a tank, slot or tube is added or changed.
+
+  Values are not stored on the plan. Every slot and tube is assigned a 'register', i.e. an index into a list of values that is created fresh for every call to pour or pump (the execution context). A tube and the slot it is connected to share the same register. This way the same plan can be used by many calls at once.
+
+  Attributes
+  ----------
+  pour_order : list of Tanks
+    The tanks in the order they need to be run in the pour direction.
+  pump_order : list of Tanks
+    The tanks in the order they need to be run in the pump direction.
+  pour_steps : list of (Tank, function, list, list) tuples
+    For each tank in pour_order, the tank, the function that runs it, its (slot key, register) pairs and its (tube key, register) pairs.
+  pump_steps : list of (Tank, function, list, list) tuples
+    For each tank in pump_order, the tank, the function that runs it, its (tube key, register) pairs and its (slot key, register) pairs.
+  forward_steps : list of (Tank, function, list, list) tuples
+    The pour_steps needed to calculate the forward_taps. Tanks that only feed side channels are left out, and tanks whose side channels aren't used by any other tank are run without calculating them.
+  pour_dependencies : (list of lists of ints, list of ints)
+    For each step in pour_steps, the indices of the steps that use its outputs, along with the number of steps it needs to wait on.
+  pump_dependencies : (list of lists of ints, list of ints)
+    The same as pour_dependencies but for pump_steps.
+  forward_dependencies : (list of lists of ints, list of ints)
+    The same as pour_dependencies but for forward_steps.
+  pour_releases : list of lists of ints
+    For each step in pour_steps, the registers that are no longer needed once it has run. Since every register is read by exactly one tank, these are just the step's input registers, minus any that need to be returned.
+  pump_releases : list of lists of ints
+    The same as pour_releases but for pump_steps.
+  forward_releases : list of lists of ints
+    The same as pour_releases but for forward_steps.
+  funnels : list of (Slot, int) tuples
+    All the funnels of the waterwork, sorted by name, along with their registers.
+  taps : list of (Tube, int) tuples
+    All the taps of the waterwork, sorted by name, along with their registers.
+  forward_taps : list of (Tube, int) tuples
+    The taps which are not side channels of their tank, i.e. the outputs of a forward only pour.
+  slot_registers : dict(
+    keys - strs. The names of the slots.
+    values - ints. The registers of the slots.
+  )
+    The register of every slot in the waterwork.
+  tube_registers : dict(
+    keys - strs. The names of the tubes.
+    values - ints. The registers of the tubes.
+  )
+    The register of every tube in the waterwork.
+  num_registers : int
+    The number of values an execution context needs to hold.
+  funnel_lookup : dict(
+    keys - strs or tuples. The name or the (tank name, slot key) pair of the funnel.
+    values - Slot objects.
+  )
+    Used to find the funnel that a key in a funnel_dict refers to.
+  tap_lookup : dict(
+    keys - strs or tuples. The name or the (tank name, tube key) pair of the tap.
+    values - Tube objects.
+  )
+    Used to find the tap that a key in a tap_dict refers to.
+  funnel_tuples : dict(
+    keys - strs. The names of the funnels.
+    values - tuples. The (tank name, slot key) pair the funnel is known by.
+  )
+    Used to key the outputs of pump by tuple.
+  tap_tuples : dict(
+    keys - strs. The names of the taps.
+    values - tuples. The (tank name, tube key) pair the tap is known by.
+  )
+    Used to key the outputs of pour by tuple.
+  pour_sources : list of frozensets of ints
+    For each step in pour_steps, the registers of the funnels it depends on, directly or through other tanks. Used to find the steps that can be constant folded.
+  pump_sources : list of frozensets of ints
+    The same as pour_sources but for pump_steps and the taps.
+  forward_sources : list of frozensets of ints
+    The same as pour_sources but for forward_steps.
+  selections : dict(
+    keys - frozensets of ints. The registers of some of the taps.
+    values - (list, tuple, list, list) tuples. The steps, dependencies, releases and sources needed to calculate just those taps.
+  )
+    The parts of the pour_steps that have been selected with select, so they only need to be worked out once.
+  folds : dict(
+    keys - (str or frozenset of ints, frozenset of ints) tuples. The direction ('pour', 'pump', 'forward' or a selection) and the folded steps.
+    values - Fold objects.
+  )
+    The results of the constant folded steps, calculated the first time they're needed.
+
+  """
+
+  def __init__(self, waterwork):
+    """Compile the waterwork's current graph into a plan.
+
+    Parameters
+    ----------
+    waterwork : Waterwork
+      The waterwork to create the plan for.
+
+    """
+    tanks = [waterwork.tanks[k] for k in sorted(waterwork.tanks)]
+    slot_tanks = {tank: tank.get_slot_tanks() for tank in tanks}
+    tube_tanks = {tank: tank.get_tube_tanks() for tank in tanks}
+
+    self.pour_order = _topological_sort(tanks, slot_tanks, tube_tanks)
+    self.pump_order = _topological_sort(tanks, tube_tanks, slot_tanks)
+
+    # Give every tube a register and have the slot it's connected to share it.
+    # Funnels get registers of their own.
+    self.slot_registers = {}
+    self.tube_registers = {}
+    self.num_registers = 0
+    for tank in tanks:
+      for key in sorted(tank.tubes):
+        tube = tank.tubes[key]
+        self.tube_registers[tube.name] = self.num_registers
+        if tube.slot is not empty:
+          self.slot_registers[tube.slot.name] = self.num_registers
+        self.num_registers += 1
+
+    for tank in tanks:
+      for key in sorted(tank.slots):
+        slot = tank.slots[key]
+        if slot.tube is empty:
+          self.slot_registers[slot.name] = self.num_registers
+          self.num_registers += 1
+
+    self.pour_steps = []
+    for tank in self.pour_order:
+      self.pour_steps.append((
+        tank,
+        _execute_pour,
+        [(k, self.slot_registers[tank.slots[k].name]) for k in sorted(tank.slots)],
+        [(k, self.tube_registers[tank.tubes[k].name]) for k in sorted(tank.tubes)]
+      ))
+
+    self.pump_steps = []
+    for tank in self.pump_order:
+      self.pump_steps.append((
+        tank,
+        _execute_pump,
+        [(k, self.tube_registers[tank.tubes[k].name]) for k in sorted(tank.tubes)],
+        [(k, self.slot_registers[tank.slots[k].name]) for k in sorted(tank.slots)]
+      ))
+
+    self.pour_dependencies = _step_dependencies(self.pour_steps)
+    self.pump_dependencies = _step_dependencies(self.pump_steps)
+
+    # Only the taps need to be kept around after a pour, and only the funnels
+    # after a pump. Everything else can be dropped as soon as the tank that
+    # reads it has run.
+    tap_registers = set([self.tube_registers[k] for k in waterwork.taps])
+    funnel_registers = set([self.slot_registers[k] for k in waterwork.funnels])
+    self.pour_releases = [
+      [r for _, r in inputs if r not in tap_registers]
+      for _, _, inputs, _ in self.pour_steps
+    ]
+    self.pump_releases = [
+      [r for _, r in inputs if r not in funnel_registers]
+      for _, _, inputs, _ in self.pump_steps
+    ]
+
+    self.funnels = []
+    self.funnel_lookup = {}
+    for name in sorted(waterwork.funnels):
+      funnel = waterwork.funnels[name]
+      self.funnels.append((funnel, self.slot_registers[name]))
+      self.funnel_lookup[name] = funnel
+      self.funnel_lookup[funnel.get_tuple()] = funnel
+
+    self.taps = []
+    self.tap_lookup = {}
+    for name in sorted(waterwork.taps):
+      tap = waterwork.taps[name]
+      self.taps.append((tap, self.tube_registers[name]))
+      self.tap_lookup[name] = tap
+      self.tap_lookup[tap.get_tuple()] = tap
+
+    # Funnels and taps whose tanks were replaced by optimize are still referred
+    # to by their original tuples.
+    self.funnel_tuples = dict([(f.name, f.get_tuple()) for f, _ in self.funnels])
+    for key, name in waterwork.slot_aliases.items():
+      if name in waterwork.funnels:
+        self.funnel_lookup[key] = waterwork.funnels[name]
+        self.funnel_tuples[name] = key
+    self.tap_tuples = dict([(t.name, t.get_tuple()) for t, _ in self.taps])
+    for key, name in waterwork.tube_aliases.items():
+      if name in waterwork.taps:
+        self.tap_lookup[key] = waterwork.taps[name]
+        self.tap_tuples[name] = key
+
+    self.forward_taps = [
+      (tap, r) for tap, r in self.taps
+      if tap.key not in tap.tank.side_channel_keys
+    ]
+    self.forward_steps = _forward_steps(self.pour_steps, self.forward_taps)
+    self.forward_dependencies = _step_dependencies(self.forward_steps)
+    forward_registers = set([r for _, r in self.forward_taps])
+    self.forward_releases = [
+      [r for _, r in inputs if r not in forward_registers]
+      for _, _, inputs, _ in self.forward_steps
+    ]
+
+    funnel_registers = [r for _, r in self.funnels]
+    tap_registers = [r for _, r in self.taps]
+    self.pour_sources = _step_sources(self.pour_steps, funnel_registers)
+    self.pump_sources = _step_sources(self.pump_steps, tap_registers)
+    self.forward_sources = _step_sources(self.forward_steps, funnel_registers)
+    self.selections = {}
+    self.folds = {}
+
+    self._parts = []
+    for name in waterwork.slots:
+      self._parts.append((waterwork.slots[name], self.slot_registers[name]))
+    for name in waterwork.tubes:
+      self._parts.append((waterwork.tubes[name], self.tube_registers[name]))
+
+  def new_context(self):
+    """Create an empty execution context, i.e. the list of values for every register of the plan.
+
+    Returns
+    -------
+    list
+      A list of Nones, one for each register.
+
+    """
+    return [None] * self.num_registers
+
+  def select(self, taps):
+    """Work out the pour steps needed to calculate only some of the taps. Tanks that aren't needed for any of them are left out, and the side channels of the rest are skipped unless they're needed.
+
+    Parameters
+    ----------
+    taps : list of (Tube, int) tuples
+      The taps to calculate, along with their registers.
+
+    Returns
+    -------
+    frozenset of ints
+      The key of the selection, to pass to run_pour.
+
+    """
+    key = frozenset([r for _, r in taps])
+    if key not in self.selections:
+      steps = _forward_steps(self.pour_steps, taps)
+      releases = [
+        [r for _, r in inputs if r not in key]
+        for _, _, inputs, _ in steps
+      ]
+      sources = _step_sources(steps, [r for _, r in self.funnels])
+      self.selections[key] = (steps, _step_dependencies(steps), releases, sources)
+    return key
+
+  def run_pour(self, context, executor=None, release=True, forward_only=False, defaults=None, selection=None):
+    """Run all the tanks in the pour direction, reading their inputs from and writing their outputs to the execution context.
+
+    Parameters
+    ----------
+    context : list
+      The execution context, with the registers of all the funnels filled.
+    executor : concurrent.futures.Executor or None
+      If given, run each tank on the executor as soon as all the tanks it depends on have finished, rather than one after the other.
+    release : bool
+      Whether or not to drop intermediate values from the context as soon as they are no longer needed. If False every register is left filled.
+    forward_only : bool
+      Whether or not to only run the forward_steps, leaving the registers of the side channels empty.
+    selection : frozenset of ints or None
+      If given, only run the steps needed for the taps chosen with select, rather than the forward_steps or pour_steps.
+    defaults : dict(
+      keys - ints. The registers of the funnels.
+      values - objects. The values the funnels were given when the waterwork was defined.
+    ) or None
+      The funnels that were filled with their own values rather than ones passed in by the caller. Tanks which only depend on these are constant folded, i.e. their outputs are calculated once and reused by every call. Ignored if release is False, since the folded values would be missing from the context.
+
+    """
+    if selection is not None:
+      direction = selection
+      steps, dependencies, releases, _ = self.selections[selection]
+    elif forward_only:
+      direction = 'forward'
+      steps, dependencies, releases = self.forward_steps, self.forward_dependencies, self.forward_releases
+    else:
+      direction = 'pour'
+      steps, dependencies, releases = self.pour_steps, self.pour_dependencies, self.pour_releases
+
+    if release and defaults:
+      fold = self._get_fold(direction, defaults)
+      if fold is not None:
+        steps, dependencies, releases = fold.fill(context)
+
+    if not release:
+      releases = None
+    if executor is None:
+      _run_serial(steps, releases, context)
+    else:
+      _run_parallel(steps, dependencies, releases, context, executor)
+
+  def run_pump(self, context, executor=None, release=True, defaults=None):
+    """Run all the tanks in the pump direction, reading their inputs from and writing their outputs to the execution context.
+
+    Parameters
+    ----------
+    context : list
+      The execution context, with the registers of all the taps filled.
+    executor : concurrent.futures.Executor or None
+      If given, run each tank on the executor as soon as all the tanks it depends on have finished, rather than one after the other.
+    release : bool
+      Whether or not to drop intermediate values from the context as soon as they are no longer needed. If False every register is left filled.
+    defaults : dict(
+      keys - ints. The registers of the taps.
+      values - objects. The values the taps were given when the waterwork was defined.
+    ) or None
+      The same as in run_pour, but for the taps.
+
+    """
+    steps, dependencies, releases = self.pump_steps, self.pump_dependencies, self.pump_releases
+    if release and defaults:
+      fold = self._get_fold('pump', defaults)
+      if fold is not None:
+        steps, dependencies, releases = fold.fill(context)
+
+    if not release:
+      releases = None
+    if executor is None:
+      _run_serial(steps, releases, context)
+    else:
+      _run_parallel(steps, dependencies, releases, context, executor)
+
+  def retain(self, context):
+    """Copy the values of an execution context onto the slots and tubes of the waterwork, so that they can be inspected using get_val. Only meant for debugging, since it is not safe to do while other calls are using the waterwork.
+
+    Parameters
+    ----------
+    context : list
+      The execution context of a finished pour or pump.
+
+    """
+    for part, register in self._parts:
+      part.set_val(context[register])
+
+  def _get_fold(self, direction, defaults):
+    """Find the steps which only depend on funnels (or taps) filled with their own values and get their folded outputs, calculating them if this is the first time or if any of those values has been changed since.
+
+    Parameters
+    ----------
+    direction : str ('pour', 'pump' or 'forward') or frozenset of ints
+      Which of the plan's steps are being run, either one of the directions or the key of a selection.
+    defaults : dict(
+      keys - ints. The registers of the funnels (or taps).
+      values - objects. The values the funnels (or taps) were given when the waterwork was defined.
+    )
+      The funnels (or taps) that were filled with their own values.
+
+    Returns
+    -------
+    Fold or None
+      The folded steps, or None if there are no steps to fold.
+
+    """
+    if direction in self.selections:
+      steps, _, releases, sources = self.selections[direction]
+      outputs = [(None, r) for r in direction]
+    elif direction == 'pump':
+      steps, releases, sources, outputs = self.pump_steps, self.pump_releases, self.pump_sources, self.funnels
+    elif direction == 'forward':
+      steps, releases, sources, outputs = self.forward_steps, self.forward_releases, self.forward_sources, self.forward_taps
+    else:
+      steps, releases, sources, outputs = self.pour_steps, self.pour_releases, self.pour_sources, self.taps
+
+    folded = frozenset([n for n, s in enumerate(sources) if s.issubset(defaults)])
+    if not folded:
+      return None
+
+    fold = self.folds.get((direction, folded))
+    if fold is None or not fold.is_valid(defaults):
+      fold = Fold(steps, releases, sources, folded, defaults, [r for _, r in outputs])
+      self.folds[(direction, folded)] = fold
+    return fold
+
+
+class Fold(object):
+  """The constant folded part of a plan's steps, i.e. the steps whose inputs only depend on values that were set when the waterwork was defined. They are run once when the fold is created, and the values they pass on to the rest of the steps are stored so that every call can just copy them into its execution context. The stored arrays are read only, since they're shared by every call.
+
+  Attributes
+  ----------
+  constants : list of (int, object) tuples
+    The registers the folded steps depend on, along with the values they were calculated from. If any of the values are changed the fold has to be recalculated.
+  values : list of (int, object) tuples
+    The outputs of the folded steps which are needed by the other steps or returned, along with their registers.
+  released : list of ints
+    The registers which were only needed by the folded steps.
+  steps : list of (Tank, function, list, list) tuples
+    The steps that still need to be run.
+  dependencies : (list of lists of ints, list of ints)
+    The children and the number of parents of each of the steps that still need to be run.
+  releases : list of lists of ints
+    The registers to empty after each of the steps that still need to be run.
+
+  """
+
+  def __init__(self, steps, releases, sources, folded, defaults, output_registers):
+    """Run the folded steps and store their outputs.
+
+    Parameters
+    ----------
+    steps : list of (Tank, function, list, list) tuples
+      All of the steps.
+    releases : list of lists of ints
+      The registers to empty after each step.
+    sources : list of frozensets of ints
+      The registers of the funnels (or taps) each step depends on.
+    folded : frozenset of ints
+      The indices of the steps to fold.
+    defaults : dict(
+      keys - ints. The registers of the funnels (or taps).
+      values - objects. The values the funnels (or taps) were given when the waterwork was defined.
+    )
+      The values to calculate the folded steps from.
+    output_registers : list of ints
+      The registers that are returned at the end of the call.
+
+    """
+    used = set()
+    for step_num in folded:
+      used.update(sources[step_num])
+    self.constants = [(r, defaults[r]) for r in sorted(used)]
+
+    context = {}
+    for register, val in self.constants:
+      context[register] = ut.read_only(val)
+    folded_steps = [steps[n] for n in sorted(folded)]
+    for tank, execute, inputs, outputs in folded_steps:
+      r_dict = execute(tank, {k: context[r] for k, r in inputs})
+      for key, register in outputs:
+        context[register] = r_dict[key]
+
+    # Only keep the values that are read by a step that isn't folded, or that
+    # are returned.
+    self.steps = [s for n, s in enumerate(steps) if n not in folded]
+    self.dependencies = _step_dependencies(self.steps)
+    self.releases = [r for n, r in enumerate(releases) if n not in folded]
+
+    needed = set(output_registers)
+    for _, _, inputs, _ in self.steps:
+      needed.update([r for _, r in inputs])
+    self.values = []
+    for _, _, _, outputs in folded_steps:
+      for _, register in outputs:
+        if register in needed:
+          self.values.append((register, ut.read_only(context[register])))
+
+    self.released = []
+    for _, _, inputs, _ in folded_steps:
+      self.released.extend([r for _, r in inputs if r not in needed])
+
+  def is_valid(self, defaults):
+    """Whether the folded values were calculated from the same objects as the defaults."""
+    for register, val in self.constants:
+      if defaults.get(register) is not val:
+        return False
+    return True
+
+  def fill(self, context):
+    """Copy the folded values into an execution context and empty the registers only the folded steps needed.
+
+    Parameters
+    ----------
+    context : list
+      The execution context.
+
+    Returns
+    -------
+    list of (Tank, function, list, list) tuples
+      The steps that still need to be run.
+    (list of lists of ints, list of ints)
+      Their dependencies.
+    list of lists of ints
+      Their releases.
+
+    """
+    for register, val in self.values:
+      context[register] = val
+    for register in self.released:
+      context[register] = None
+    return self.steps, self.dependencies, self.releases
+
+
+def _execute_pour(tank, kwargs):
+  """Run a tank in the pour direction. Defined at the module level so that it can be sent to a process pool."""
+  return tank._execute_pour(kwargs)
+
+
+def _execute_pour_forward(tank, kwargs):
+  """Run a tank in the pour direction without its side channels. Defined at the module level so that it can be sent to a process pool."""
+  return tank._execute_pour(kwargs, forward_only=True)
+
+
+def _execute_pump(tank, kwargs):
+  """Run a tank in the pump direction. Defined at the module level so that it can be sent to a process pool."""
+  return tank._execute_pump(kwargs)
+
+
+def _execute_pickled(pickled):
+  """Run a step that was pickled by the caller. See _run_parallel."""
+  execute, tank, kwargs = pickle.loads(pickled)
+  return execute(tank, kwargs)
+
+
+def _forward_steps(pour_steps, forward_taps):
+  """Work backwards from the forward taps to find which pour steps are needed to calculate them, and which of those can skip their side channels.
+
+  Parameters
+  ----------
+  pour_steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers, in pour order.
+  forward_taps : list of (Tube, int) tuples
+    The taps that need to be calculated, along with their registers.
+
+  Returns
+  -------
+  list of (Tank, function, list, list) tuples
+    The needed steps, in pour order, with only the needed outputs.
+
+  """
+  needed = set([r for _, r in forward_taps])
+
+  steps = []
+  for tank, _, inputs, outputs in reversed(pour_steps):
+    outputs = [(k, r) for k, r in outputs if r in needed]
+    if not outputs:
+      continue
+
+    # If another tank reads one of the side channels, then the tank has to be
+    # fully run.
+    if any([k in tank.side_channel_keys for k, _ in outputs]):
+      execute = _execute_pour
+    else:
+      execute = _execute_pour_forward
+
+    needed.update([r for _, r in inputs])
+    steps.append((tank, execute, inputs, outputs))
+
+  steps.reverse()
+  return steps
+
+
+def _run_serial(steps, releases, context):
+  """Run the steps one after the other in the current thread.
+
+  Parameters
+  ----------
+  steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers.
+  releases : list of lists of ints or None
+    The registers to empty after each step. If None nothing is emptied, and the steps only get read only views of their inputs (see _step_inputs).
+  context : list
+    The execution context.
+
+  """
+  for step_num, (tank, execute, inputs, outputs) in enumerate(steps):
+    r_dict = execute(tank, _step_inputs(inputs, releases, context))
+
+    for key, register in outputs:
+      context[register] = r_dict[key]
+
+    if releases is not None:
+      for register in releases[step_num]:
+        context[register] = None
+
+
+def _run_parallel(steps, dependencies, releases, context, executor, poll_interval=1.0):
+  """Run each step on the executor as soon as all the steps it depends on have finished. The context is only ever read and written from the calling thread, the executor only sees the tank and its inputs.
+
+  Any error in submitting or running a step is raised to the caller, after cancelling the steps that haven't started. Process pools pickle their work in a background thread, which in python 2 swallows any error and leaves the step unfinished forever, so for them each step is pickled in the calling thread instead. Their workers are also checked every poll_interval seconds, since one that dies leaves its step unfinished as well.
+
+  Parameters
+  ----------
+  steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers.
+  dependencies : (list of lists of ints, list of ints)
+    The children and the number of parents of each step.
+  releases : list of lists of ints or None
+    The registers to empty after each step. If None nothing is emptied, and the steps only get read only views of their inputs (see _step_inputs).
+  context : list
+    The execution context.
+  executor : concurrent.futures.Executor
+    Anything with a submit method that returns a future supporting add_done_callback. Process pools require the tanks and their inputs to be picklable.
+  poll_interval : float
+    The number of seconds between checks that a process pool's workers are still alive.
+
+  """
+  children, num_parents = dependencies
+  num_parents = list(num_parents)
+  finished = Queue.Queue()
+  processes = _get_processes(executor)
+  running = set()
+
+  def submit(step_num):
+    tank, execute, inputs, _ = steps[step_num]
+    kwargs = _step_inputs(inputs, releases, context)
+    if processes is not None:
+      future = executor.submit(_execute_pickled, pickle.dumps((execute, tank, kwargs), pickle.HIGHEST_PROTOCOL))
+    else:
+      future = executor.submit(execute, tank, kwargs)
+    running.add(future)
+    future.add_done_callback(lambda f: finished.put((step_num, f)))
+
+  try:
+    for step_num in xrange(len(steps)):
+      if not num_parents[step_num]:
+        submit(step_num)
+
+    for _ in xrange(len(steps)):
+      step_num, future = _get_finished(finished, processes, poll_interval)
+      running.discard(future)
+      r_dict = future.result()
+
+      for key, register in steps[step_num][3]:
+        context[register] = r_dict[key]
+
+      if releases is not None:
+        for register in releases[step_num]:
+          context[register] = None
+
+      for child_num in children[step_num]:
+        num_parents[child_num] -= 1
+        if not num_parents[child_num]:
+          submit(child_num)
+  except BaseException:
+    for future in running:
+      future.cancel()
+    raise
+
+
+def _step_inputs(inputs, releases, context):
+  """Get the keyword arguments of a step from the context. If the registers aren't being released, e.g. because the values are retained on the slots and tubes, any array the step gets is still in the context after it runs. So it's given a read only view instead, which makes tanks that would otherwise change their inputs in place (see wtrwrks.tanks.utils.writable) copy them first."""
+  if releases is None:
+    return {k: ut.read_only(context[r]) for k, r in inputs}
+  return {k: context[r] for k, r in inputs}
+
+
+def _get_processes(executor):
+  """Get the (set or dict of) worker processes of the executor if it's a concurrent.futures process pool, otherwise None. The pool adds its workers to it as they're started."""
+  try:
+    import concurrent.futures as futures
+  except ImportError:
+    return None
+  if not isinstance(executor, futures.ProcessPoolExecutor):
+    return None
+  return executor._processes
+
+
+def _get_finished(finished, processes, poll_interval):
+  """Wait for the next (step number, future) pair to be put on the finished queue, raising a RuntimeError if any of the worker processes dies in the meantime."""
+  if processes is None:
+    return finished.get()
+
+  while True:
+    try:
+      return finished.get(timeout=poll_interval)
+    except Queue.Empty:
+      workers = processes.values() if isinstance(processes, dict) else list(processes)
+      if any([not worker.is_alive() for worker in workers]):
+        raise RuntimeError("A worker process of the executor died before finishing its step.")
+
+
+def _step_dependencies(steps):
+  """Find which steps depend on which by matching the input registers of each step with the output registers of the others.
+
+  Parameters
+  ----------
+  steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers.
+
+  Returns
+  -------
+  list of lists of ints
+    For each step, the indices of the steps that use its outputs.
+  list of ints
+    For each step, the number of steps it needs to wait on.
+
+  """
+  producers = {}
+  for step_num, (_, _, _, outputs) in enumerate(steps):
+    for _, register in outputs:
+      producers[register] = step_num
+
+  children = [[] for _ in steps]
+  num_parents = [0] * len(steps)
+  for step_num, (_, _, inputs, _) in enumerate(steps):
+    parents = set([producers[r] for _, r in inputs if r in producers])
+    for parent_num in sorted(parents):
+      children[parent_num].append(step_num)
+    num_parents[step_num] = len(parents)
+
+  return children, num_parents
+
+
+def _step_sources(steps, source_registers):
+  """Find the funnels (or taps) each step depends on, either directly or through the steps before it.
+
+  Parameters
+  ----------
+  steps : list of (Tank, function, list, list) tuples
+    The tanks along with how to run them and their input and output registers, in the order they're run.
+  source_registers : list of ints
+    The registers of the funnels (or taps).
+
+  Returns
+  -------
+  list of frozensets of ints
+    For each step, the registers of the funnels (or taps) it depends on.
+
+  """
+  source_registers = set(source_registers)
+  register_sources = {}
+  step_sources = []
+  for tank, _, inputs, outputs in steps:
+    sources = set()
+    # Tanks with random outputs depend on a register that is never filled
+    # with a default, so that they, and everything after them, are never
+    # folded.
+    if not tank.deterministic:
+      sources.add(-1)
+    for _, register in inputs:
+      if register in source_registers:
+        sources.add(register)
+      else:
+        sources.update(register_sources.get(register, ()))
+    sources = frozenset(sources)
+
+    step_sources.append(sources)
+    for _, register in outputs:
+      register_sources[register] = sources
+  return step_sources
+
+
+def _topological_sort(tanks, parents, children):
+  """Order the tanks so that every tank comes after all the tanks it depends on. Ties are broken by the tank's name so the order is deterministic.
+
+  Parameters
+  ----------
+  tanks : list of Tanks
+    All the tanks of the waterwork, sorted by name.
+  parents : dict(
+    keys - Tanks
+    values - sets of Tanks
+  )
+    The tanks that need to be run before the key tank.
+  children : dict(
+    keys - Tanks
+    values - sets of Tanks
+  )
+    The tanks that depend on the key tank.
+
+  Returns
+  -------
+  list of Tanks
+    The ordered tanks.
+
+  """
+  num_parents = {tank: len(parents[tank]) for tank in tanks}
+  queue = collections.deque([tank for tank in tanks if not num_parents[tank]])
+
+  sorted_tanks = []
+  while queue:
+    tank = queue.popleft()
+    sorted_tanks.append(tank)
+
+    for child_tank in sorted(children[tank], key=lambda t: t.name):
+      num_parents[child_tank] -= 1
+      if not num_parents[child_tank]:
+        queue.append(child_tank)
+
+  return sorted_tanks
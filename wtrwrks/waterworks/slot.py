@@ -19,6 +19,8 @@ class Slot(wp.WaterworkPart):
   name : str
     The string used to identify the slot within the entire waterwork. Must be unique among all other slots of this waterwork.
   """
+  __slots__ = ['key', 'tank', 'tube', 'val', 'plug']
+
   def __init__(self, tank, key, val=None, tube=empty, plug=None):
     """Initialize the slot.
     Attributes
@@ -59,7 +61,7 @@ class Slot(wp.WaterworkPart):
 
   def _get_default_name(self, prefix=''):
     """Set a default name. Must be defined by subclass."""
-    return os.path.join(self.tank.name, 'slots', self.key)
+    return self.tank.name + '/slots/' + self.key
 
   def _save_dict(self):
     save_dict = {}
@@ -93,6 +95,7 @@ class Slot(wp.WaterworkPart):
     else:
       func_plug = plug
     self.plug = func_plug
+    self.waterwork._invalidate_plan()
 
   def set_name(self, name):
     """Set the name of the slot within the waterwork."""
@@ -113,6 +116,7 @@ class Slot(wp.WaterworkPart):
 
     del self.waterwork.slots[old_name]
     self.waterwork.slots[self.name] = self
+    self.waterwork._invalidate_plan()
 
     if old_name in self.waterwork.funnels:
       del self.waterwork.funnels[old_name]
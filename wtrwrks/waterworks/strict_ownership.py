@@ -0,0 +1,29 @@
+"""StrictOwnership definition."""
+import wtrwrks.waterworks.globs as gl
+
+
+class StrictOwnership(object):
+  """Context manager which turns on strict checking of which arrays the tanks share with each other. Meant for tests, since it slows everything down.
+
+  While it's on, every array a tank outputs is made read only once the tank has run, so any tank that changes one of its inputs in place without first making its own copy (see wtrwrks.tanks.utils.writable) raises an error. It also checks that any output which shares memory with an input, or with another output, is read only and that the tank declared it in its alias_keys.
+
+  Attributes
+  ----------
+  was_strict : bool
+    Whether or not strict checking was already on when the context was entered.
+
+  """
+
+  def __init__(self):
+    """Define the context."""
+    self.was_strict = False
+
+  def __enter__(self):
+    """When entering, turn on strict checking."""
+    self.was_strict = gl._strict_ownership
+    gl._strict_ownership = True
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    """When exiting, set strict checking back to what it was."""
+    gl._strict_ownership = self.was_strict
@@ -4,6 +4,8 @@ import wtrwrks.waterworks.waterwork_part as wp
 from wtrwrks.waterworks.empty import empty
 import wtrwrks.waterworks.slot as sl
 import wtrwrks.waterworks.tube as tu
+import wtrwrks.tanks.utils as ut
+import numpy as np
 import os
 import sys
 
@@ -33,11 +35,23 @@ class Tank(wp.WaterworkPart):
     values - Slot object.
   )
     The tube objects that define the pour direction outputs (or pump direction inputs) of the tank.
+  side_channel_keys : list of str
+    The tube keys whose only purpose is to make the pump direction possible (e.g. diffs, replaced values, copies of the inputs). They are skipped when the waterwork is poured in forward only mode.
+  alias_keys : dict(
+    keys - strs. Tube keys.
+    values - lists of strs. Slot keys.
+  )
+    The tubes whose arrays may share memory with the arrays of some of the slots, in either direction, rather than being copies of them. Those arrays must be read only (see wtrwrks.tanks.utils.share), so that a tank further down the line which wants to change them in place has to copy them first.
+  deterministic : bool
+    Whether or not the outputs of the tank only depend on its inputs. Tanks which are not, e.g. ones that draw random numbers, are never constant folded.
 
   """
 
   slot_keys = None
   tube_keys = None
+  side_channel_keys = []
+  alias_keys = {}
+  deterministic = True
 
   def __init__(self, waterwork=None, name=None, **input_dict):
     """Create a Tank. Eagerly run the pour function if all the input values are known at creation.
@@ -81,12 +95,15 @@ class Tank(wp.WaterworkPart):
     # inputted in as an argument (input_dict).
     self._join_tubes_to_slots(input_dict, self.waterwork)
 
+    # The graph has changed so any compiled plan is no longer valid.
+    self.waterwork._invalidate_plan()
+
     # If all the slots of the tank are 'filled', i.e. are either connected to a
     # tube with a non None val or are given a valid datum as input, then
     # eagerly run the tank's pour function and output the results to the tank's
-    # tubes' vals.
+    # tubes' vals. Unless the waterwork has eager execution turned off.
 
-    all_slots_filled = self._check_slots_filled(input_dict)
+    all_slots_filled = self.waterwork.eager and self._check_slots_filled(input_dict)
 
     for key in input_dict:
       if type(input_dict[key]) is sl.Slot:
@@ -226,15 +243,19 @@ class Tank(wp.WaterworkPart):
         The name of the tank.
 
     """
-    num = 0
-    cls_name = self.__class__.__name__
+    base_name = os.path.join(prefix, self.__class__.__name__ + '_')
 
     # Start with the name being '<TankSubClass>_0'. If that is already taken,
-    # keep increasing the number from 0 until an unused name is found.
-    full_name = os.path.join(prefix, cls_name + '_' + str(num))
-    while full_name in gl._default_waterwork.tanks:
+    # keep increasing the number until an unused name is found. The waterwork
+    # remembers where it left off for each base name, so that creating n tanks
+    # of the same type doesn't take n^2 steps.
+    name_counts = self.waterwork.default_name_counts
+    num = name_counts.get(base_name, 0)
+    full_name = base_name + str(num)
+    while full_name in self.waterwork.tanks:
       num += 1
-      full_name = os.path.join(prefix, cls_name + '_' + str(num))
+      full_name = base_name + str(num)
+    name_counts[base_name] = num + 1
 
     return full_name
 
@@ -318,6 +339,10 @@ class Tank(wp.WaterworkPart):
     """Make sure pump function is set by subclass. The backward transformation of outputs."""
     raise ValueError("'_pump' method not defined for " + str(type(self)))
 
+  def _pour_forward(self, **kwargs):
+    """The forward transformation of inputs, without the side channel tubes. Defaults to the full _pour, subclasses override it when the side channels are expensive to compute."""
+    return self._pour(**kwargs)
+
   def _save_dict(self):
     save_dict = {}
     save_dict['__class__'] = str(self.__class__.__name__)
@@ -348,23 +373,25 @@ class Tank(wp.WaterworkPart):
     tubes.update(self.tubes)
     return tubes
 
-  def pour(self, **input_dict):
-    """Execute the forward transformation of the input_dict inputted to the tank to get the dictionary of tube objects who's val's have been filled.
+  def _execute_pour(self, input_dict, forward_only=False):
+    """Check the inputs and run the forward transformation without storing anything on the tank's tubes.
 
     Parameters
     ----------
-    **input_dict : kwargs = {
+    input_dict : dict(
         keys - Slot keys. Must be the same as the attribute slot_keys.
         values - valid input data types
-      }
+      )
       The inputs to the tank.
+    forward_only : bool
+      Whether or not to skip calculating the tubes in side_channel_keys. If True the returned dictionary may not have them.
 
     Returns
     -------
-    kwargs = {
+    dict(
         keys - Tube keys. The same as the keys from attribute tube_keys.
         values - The data_types outputted by the tank.
-      }
+      )
         All of the ouputs the tank gives in the 'pour' (i.e. forward) direction.
 
     """
@@ -376,7 +403,111 @@ class Tank(wp.WaterworkPart):
       if not self._slot_is_valid_type(key, val):
         raise TypeError("Got invalid type for (tank, slot): " + str((self.name, key)) + ". ")
     # Run the function defined by the subclass
-    tube_dict = self._pour(**input_dict)
+    if forward_only:
+      tube_dict = self._pour_forward(**input_dict)
+    else:
+      tube_dict = self._pour(**input_dict)
+
+    if gl._strict_ownership:
+      self._check_ownership(tube_dict, input_dict, self.alias_keys)
+    return tube_dict
+
+  def _execute_pump(self, kwargs):
+    """Check the inputs and run the backward transformation without storing anything on the tank's slots.
+
+    Parameters
+    ----------
+    kwargs : dict(
+        keys - Tube keys. Must be the same as the keys from attribute tube_keys.
+        values - valid data types
+      )
+      The inputs to the backward transformation of the tank.
+
+    Returns
+    -------
+    dict(
+        keys - Slot keys. The same as the attribute slot_keys.
+        values - The data_types outputted by the tank.
+      )
+        All of the ouputs the tank gives in the 'pump' (i.e. backward) direction.
+
+    """
+    # Check that the inputs are valid
+    if set(kwargs.keys()) != set(self.tube_keys):
+      raise ValueError("Must pass " + str(kwargs.keys()) + " as arguments, got " + str(self.tube_keys))
+
+    for key, val in kwargs.iteritems():
+      if not self._tube_is_valid_type(key, val):
+        raise TypeError("Got invalid type for (tank, tube): " + str((self.name, key)) + ". ")
+    # Run the function defined by the subclass
+    slot_dict = self._pump(**kwargs)
+
+    if gl._strict_ownership:
+      aliases = {}
+      for tube_key in self.alias_keys:
+        for slot_key in self.alias_keys[tube_key]:
+          aliases.setdefault(slot_key, []).append(tube_key)
+      self._check_ownership(slot_dict, kwargs, aliases)
+    return slot_dict
+
+  def _check_ownership(self, outputs, inputs, aliases):
+    """Check that any output arrays which share memory with the inputs or with each other are read only and declared in alias_keys, and then make all of the output arrays read only. Only run in strict ownership mode.
+
+    Parameters
+    ----------
+    outputs : dict
+      The outputs of the tank, keyed by slot or tube key.
+    inputs : dict
+      The inputs to the tank, keyed by slot or tube key.
+    aliases : dict(
+      keys - strs. Output keys.
+      values - lists of strs. The input keys they are allowed to share memory with.
+    )
+      The tank's alias_keys, oriented in the direction the tank was run.
+
+    """
+    arrays = [(k, v) for k, v in outputs.iteritems() if type(v) is np.ndarray and v.size]
+    input_arrays = [(k, v) for k, v in inputs.iteritems() if type(v) is np.ndarray and v.size]
+
+    for num, (key, val) in enumerate(arrays):
+      for other_key, other_val in arrays[num + 1:]:
+        if np.may_share_memory(val, other_val) and (val.flags.writeable or other_val.flags.writeable):
+          raise ValueError(str((self.name, key)) + " and " + str((self.name, other_key)) + " share memory but are not read only.")
+
+      for input_key, input_val in input_arrays:
+        if not np.may_share_memory(val, input_val):
+          continue
+        if input_key not in aliases.get(key, []):
+          raise ValueError(str((self.name, key)) + " shares memory with " + str((self.name, input_key)) + " but is not declared in alias_keys.")
+        if val.flags.writeable:
+          raise ValueError(str((self.name, key)) + " shares memory with " + str((self.name, input_key)) + " but is not read only.")
+
+    for key, val in arrays:
+      val.setflags(write=False)
+
+  def pour(self, **input_dict):
+    """Execute the forward transformation of the input_dict inputted to the tank to get the dictionary of tube objects who's val's have been filled.
+
+    Parameters
+    ----------
+    **input_dict : kwargs = {
+        keys - Slot keys. Must be the same as the attribute slot_keys.
+        values - valid input data types
+      }
+      The inputs to the tank.
+
+    Returns
+    -------
+    kwargs = {
+        keys - Tube keys. The same as the keys from attribute tube_keys.
+        values - The data_types outputted by the tank.
+      }
+        All of the ouputs the tank gives in the 'pour' (i.e. forward) direction.
+
+    """
+    # The inputs belong to the caller, so hand them to the tank read only.
+    input_dict = dict([(k, ut.read_only(v)) for k, v in input_dict.iteritems()])
+    tube_dict = self._execute_pour(input_dict)
 
     # Set the vals
     for key in tube_dict:
@@ -404,15 +535,9 @@ class Tank(wp.WaterworkPart):
         All of the ouputs the tank gives in the 'pump' (i.e. backward) direction.
 
     """
-    # Check that the inputs are valid
-    if set(kwargs.keys()) != set(self.tube_keys):
-      raise ValueError("Must pass " + str(kwargs.keys()) + " as arguments, got " + str(self.tube_keys))
-
-    for key, val in kwargs.iteritems():
-      if not self._tube_is_valid_type(key, val):
-        raise TypeError("Got invalid type for (tank, tube): " + str((self.name, key)) + ". ")
-    # Run the function defined by the subclass
-    slot_dict = self._pump(**kwargs)
+    # The inputs belong to the caller, so hand them to the tank read only.
+    kwargs = dict([(k, ut.read_only(v)) for k, v in kwargs.iteritems()])
+    slot_dict = self._execute_pump(kwargs)
 
     # Set the vals
     for key in slot_dict:
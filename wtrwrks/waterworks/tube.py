@@ -20,6 +20,8 @@ class Tube(wp.WaterworkPart):
     The string used to identify the tube within the entire waterwork. Must be unique among all other tubes of this waterwork.
 
   """
+  __slots__ = ['key', 'tank', 'slot', 'val', 'plug']
+
 
   def __init__(self, tank, key, val=None, slot=empty, plug=None):
     """Initialize the tube.
@@ -103,7 +105,7 @@ class Tube(wp.WaterworkPart):
 
   def _get_default_name(self, prefix=''):
     """Set a default name. Must be defined by subclass."""
-    return os.path.join(self.tank.name, 'tubes', self.key)
+    return self.tank.name + '/tubes/' + self.key
 
   def _save_dict(self):
     save_dict = {}
@@ -137,6 +139,7 @@ class Tube(wp.WaterworkPart):
     else:
       func_plug = plug
     self.plug = func_plug
+    self.waterwork._invalidate_plan()
 
   def set_name(self, name):
     """Set the name of the tube within the waterwork."""
@@ -157,6 +160,7 @@ class Tube(wp.WaterworkPart):
 
     del self.waterwork.tubes[old_name]
     self.waterwork.tubes[self.name] = self
+    self.waterwork._invalidate_plan()
 
     if old_name in self.waterwork.taps:
       del self.waterwork.taps[old_name]
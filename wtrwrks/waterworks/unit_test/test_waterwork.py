@@ -4,10 +4,18 @@ import unittest
 import wtrwrks.utils.test_helpers as th
 import wtrwrks.tanks.tank_defs as td
 import wtrwrks.waterworks.waterwork as wa
+import wtrwrks.waterworks.plan as pl
+import wtrwrks.waterworks.tank as ta
+import wtrwrks.waterworks.strict_ownership as so
+import wtrwrks.waterworks.globs as gl
 from wtrwrks.waterworks.empty import empty
 import numpy as np
 import pprint
 import os
+import threading
+import pickle
+import Queue
+import concurrent.futures as futures
 
 class TestWaterwork(unittest.TestCase):
   def setUp(self):
@@ -212,6 +220,526 @@ class TestWaterwork(unittest.TestCase):
       ww.save_to_file(pickle_name)
       ww = wa.Waterwork(from_file=pickle_name)
 
+  def test_plan_invalidation(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+
+    funnel_dict = {
+      ('Add_0', 'a'): np.array([1, 2]),
+      ('Add_0', 'b'): np.array([3, 4])
+    }
+    tap_dict = ww.pour(funnel_dict, key_type='str')
+    plan = ww.plan
+    self.assertTrue(plan is not None)
+
+    # The plan should be reused as long as the graph doesn't change.
+    ww.pour(funnel_dict, key_type='str')
+    self.assertTrue(ww.plan is plan)
+
+    # Adding a tank should force the plan to be rebuilt.
+    with ww:
+      add1_tubes, add1_slots = add0_tubes['target'] + empty
+    self.assertTrue(ww.plan is None)
+
+    funnel_dict[('Add_1', 'b')] = np.array([1, 1])
+    tap_dict = ww.pour(funnel_dict, key_type='str')
+    self.assertEqual([str(t) for t in ww._pour_tank_order()], ['Add_0', 'Add_1'])
+    th.assert_arrays_equal(self, tap_dict['Add_1/tubes/target'], np.array([5, 7]))
+    self.assertFalse('Add_0/tubes/target' in tap_dict)
+
+    # Renaming a tap should as well.
+    plan = ww.plan
+    add1_tubes['target'].set_name('output')
+    self.assertTrue(ww.plan is None)
+    tap_dict = ww.pour(funnel_dict, key_type='str')
+    th.assert_arrays_equal(self, tap_dict['output'], np.array([5, 7]))
+
+  def test_execution_context(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+      add1_tubes, add1_slots = add0_tubes['target'] * empty
+
+    def pour_pump(num, results):
+      for _ in xrange(50):
+        funnel_dict = {
+          add0_slots['a']: np.arange(num, num + 100),
+          add0_slots['b']: np.ones(100, dtype=int),
+          add1_slots['b']: np.full(100, num)
+        }
+        tap_dict = ww.pour(funnel_dict)
+        if not (tap_dict[add1_tubes['target']] == (np.arange(num, num + 100) + 1) * num).all():
+          results[num] = False
+          return
+        pumped = ww.pump(tap_dict)
+        if not (pumped[add0_slots['a']] == np.arange(num, num + 100)).all():
+          results[num] = False
+          return
+      results[num] = True
+
+    # Several threads can pour and pump through the same waterwork at once.
+    results = {}
+    threads = [threading.Thread(target=pour_pump, args=(num, results)) for num in xrange(1, 9)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(results, {num: True for num in xrange(1, 9)})
+
+    # Nothing is left on the graph unless asked for.
+    for d in [ww.slots, ww.tubes]:
+      for key in d:
+        self.assertEqual(d[key].get_val(), None)
+
+    funnel_dict = {
+      add0_slots['a']: np.array([1, 2]),
+      add0_slots['b']: np.array([3, 4]),
+      add1_slots['b']: np.array([2, 2])
+    }
+    ww.pour(funnel_dict, retain_vals=True)
+    th.assert_arrays_equal(self, add0_tubes['target'].get_val(), np.array([4, 6]))
+    th.assert_arrays_equal(self, add1_slots['a'].get_val(), np.array([4, 6]))
+    th.assert_arrays_equal(self, add1_tubes['target'].get_val(), np.array([8, 12]))
+
+  def test_executor(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+      cl0_tubes, _ = td.clone(a=add0_tubes['target'])
+      add1_tubes, add1_slots = cl0_tubes['a'] + empty
+      mul0_tubes, mul0_slots = cl0_tubes['b'] * empty
+      sub0_tubes, sub0_slots = empty - empty
+
+    funnel_dict = {
+      add0_slots['a']: np.array([1, 2]),
+      add0_slots['b']: np.array([3, 4]),
+      add1_slots['b']: np.array([5, 6]),
+      mul0_slots['b']: np.array([2, 3]),
+      sub0_slots['a']: np.array([1.5, 2.5]),
+      sub0_slots['b']: np.array([0.5, 0.5]),
+    }
+    serial_tap_dict = ww.pour(funnel_dict, key_type='str')
+    serial_funnel_dict = ww.pump(serial_tap_dict, key_type='str')
+
+    executor = futures.ThreadPoolExecutor(max_workers=4)
+    try:
+      for _ in xrange(5):
+        tap_dict = ww.pour(funnel_dict, key_type='str', executor=executor)
+        self.assertEqual(set(tap_dict.keys()), set(serial_tap_dict.keys()))
+        for key in tap_dict:
+          th.assert_arrays_equal(self, tap_dict[key], serial_tap_dict[key])
+
+        pumped = ww.pump(tap_dict, key_type='str', executor=executor)
+        self.assertEqual(set(pumped.keys()), set(serial_funnel_dict.keys()))
+        for key in pumped:
+          th.assert_arrays_equal(self, pumped[key], serial_funnel_dict[key])
+    finally:
+      executor.shutdown()
+
+  def test_process_pool(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+      cl0_tubes, _ = td.clone(a=add0_tubes['target'])
+      add1_tubes, add1_slots = cl0_tubes['a'] + empty
+      mul0_tubes, mul0_slots = cl0_tubes['b'] * empty
+
+    funnel_dict = {
+      add0_slots['a']: np.array([1, 2]),
+      add0_slots['b']: np.array([3, 4]),
+      add1_slots['b']: np.array([5, 6]),
+      mul0_slots['b']: np.array([2, 3]),
+    }
+    serial_tap_dict = ww.pour(funnel_dict, key_type='str')
+
+    executor = futures.ProcessPoolExecutor(max_workers=2)
+    try:
+      tap_dict = ww.pour(funnel_dict, key_type='str', executor=executor)
+      for key in serial_tap_dict:
+        th.assert_arrays_equal(self, tap_dict[key], serial_tap_dict[key])
+      pumped = ww.pump(tap_dict, key_type='str', executor=executor)
+      th.assert_arrays_equal(self, pumped['Add_0/slots/a'], np.array([1, 2]))
+
+      # Inputs that can't be sent to the workers raise rather than hang.
+      unpicklable = dict(funnel_dict)
+      unpicklable[add1_slots['b']] = threading.Lock()
+      with self.assertRaises((pickle.PicklingError, TypeError)):
+        ww.pour(unpicklable, key_type='str', executor=executor)
+      tap_dict = ww.pour(funnel_dict, key_type='str', executor=executor)
+      th.assert_arrays_equal(self, tap_dict['Mul_0/tubes/target'], serial_tap_dict['Mul_0/tubes/target'])
+    finally:
+      executor.shutdown()
+
+    # So does a worker dying. (An actual dead worker hangs the pool's own exit
+    # handler, so use a stand in.)
+    class DeadWorker(object):
+      def is_alive(self):
+        return False
+    with self.assertRaises(RuntimeError):
+      pl._get_finished(Queue.Queue(), set([DeadWorker()]), 0.01)
+
+  def test_release(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+      cl0_tubes, _ = td.clone(a=add0_tubes['target'])
+      add1_tubes, add1_slots = cl0_tubes['a'] + empty
+      mul0_tubes, mul0_slots = cl0_tubes['b'] * add1_tubes['target']
+
+    plan = ww._get_plan()
+    tap_registers = set([r for _, r in plan.taps])
+    funnel_registers = set([r for _, r in plan.funnels])
+
+    funnel_dict = {
+      add0_slots['a']: np.array([1, 2]),
+      add0_slots['b']: np.array([3, 4]),
+      add1_slots['b']: np.array([5, 6]),
+    }
+    for release in [True, False]:
+      context = plan.new_context()
+      for funnel, register in plan.funnels:
+        context[register] = funnel_dict[funnel]
+      plan.run_pour(context, release=release)
+
+      # Only the taps should be left in the context after a pour.
+      filled = set([r for r, v in enumerate(context) if v is not None])
+      if release:
+        self.assertEqual(filled, tap_registers)
+      else:
+        self.assertEqual(filled, set(range(plan.num_registers)))
+
+      taps = {tap: context[register] for tap, register in plan.taps}
+      context = plan.new_context()
+      for tap, register in plan.taps:
+        context[register] = taps[tap]
+      plan.run_pump(context, release=release)
+
+      # Only the funnels should be left after a pump.
+      filled = set([r for r, v in enumerate(context) if v is not None])
+      if release:
+        self.assertEqual(filled, funnel_registers)
+      else:
+        self.assertEqual(filled, set(range(plan.num_registers)))
+      for funnel, register in plan.funnels:
+        th.assert_arrays_equal(self, context[register], funnel_dict[funnel])
+
+  def test_forward_only(self):
+    with wa.Waterwork() as ww:
+      lc_tubes, lc_slots = td.lower_case(empty)
+      cti_tubes, _ = td.cat_to_index(lc_tubes['target'], {'a': 0, 'b': 1})
+      sub_tubes, sub_slots = empty - 1.0
+      div_tubes, _ = sub_tubes['target'] / 2.0
+      # The missing_vals side channel is read by another tank, so the div tank
+      # still has to calculate it.
+      cast_tubes, _ = td.cast(div_tubes['missing_vals'], np.int64)
+
+    funnel_dict = {
+      lc_slots['strings']: np.array(['A', 'b', 'C']),
+      sub_slots['a']: np.array([1.0, 3.0, 7.0])
+    }
+    full = ww.pour(funnel_dict, key_type='tuple')
+    forward = ww.pour(funnel_dict, key_type='tuple', forward_only=True)
+
+    self.assertIsInstance(forward, wa.ForwardOutputs)
+    self.assertEqual(set(forward.keys()), set([
+      ('CatToIndex_0', 'target'),
+      ('Div_0', 'target'),
+      ('Cast_0', 'target'),
+    ]))
+    for key in forward:
+      th.assert_arrays_equal(self, forward[key], full[key])
+
+    plan = ww._get_plan()
+    full_tanks = set([t.name for t, e, _, _ in plan.forward_steps if e is pl._execute_pour])
+    self.assertEqual(full_tanks, set(['Div_0']))
+
+    # The same goes for the parallel scheduler.
+    executor = futures.ThreadPoolExecutor(max_workers=2)
+    try:
+      parallel = ww.pour(funnel_dict, key_type='tuple', forward_only=True, executor=executor)
+    finally:
+      executor.shutdown()
+    self.assertEqual(set(parallel.keys()), set(forward.keys()))
+    for key in forward:
+      th.assert_arrays_equal(self, parallel[key], forward[key])
+
+    with self.assertRaises(ValueError):
+      ww.pump(forward, key_type='tuple')
+
+  def test_select_taps(self):
+    with wa.Waterwork() as ww:
+      lc_tubes, lc_slots = td.lower_case(empty)
+      cti_tubes, _ = td.cat_to_index(lc_tubes['target'], {'a': 0, 'b': 1})
+      sub_tubes, sub_slots = empty - 1.0
+      div_tubes, _ = sub_tubes['target'] / 2.0
+      cast_tubes, _ = td.cast(div_tubes['missing_vals'], np.int64)
+
+    funnel_dict = {
+      lc_slots['strings']: np.array(['A', 'b', 'C']),
+      sub_slots['a']: np.array([1.0, 3.0, 7.0])
+    }
+    full = ww.pour(funnel_dict, key_type='tuple')
+
+    # Only the tanks needed for the taps are run, without their side channels.
+    selected = ww.pour(funnel_dict, key_type='tuple', taps=['Div_0/tubes/target'])
+    self.assertIsInstance(selected, wa.ForwardOutputs)
+    self.assertEqual(selected.keys(), [('Div_0', 'target')])
+    th.assert_arrays_equal(self, selected[('Div_0', 'target')], full[('Div_0', 'target')])
+
+    plan = ww._get_plan()
+    steps = plan.selections[plan.select([(div_tubes['target'], plan.tube_registers['Div_0/tubes/target'])])][0]
+    self.assertEqual([(t.name, e) for t, e, _, _ in steps], [('Sub_0', pl._execute_pour_forward), ('Div_0', pl._execute_pour_forward)])
+
+    # Side channels are calculated when they're asked for.
+    selected = ww.pour(funnel_dict, key_type='tuple', taps=[('Cast_0', 'target'), cti_tubes['target']])
+    self.assertEqual(set(selected.keys()), set([('Cast_0', 'target'), ('CatToIndex_0', 'target')]))
+    for key in selected:
+      th.assert_arrays_equal(self, selected[key], full[key])
+
+    with self.assertRaises(ValueError):
+      ww.pour(funnel_dict, taps=['Sub_0/tubes/whatever'])
+
+  def test_compile(self):
+    with wa.Waterwork() as ww:
+      add0_tubes, add0_slots = empty + empty
+      add0_slots['b'].set_plug(np.array([3, 4]))
+      add0_tubes['a_is_smaller'].set_plug(False)
+
+      add1_tubes, add1_slots = add0_tubes['target'] + empty
+      add1_slots['b'].set_plug(
+        lambda d: 0.5 * d['Add_0/slots/a'] + np.array([0.5, 1.0])
+      )
+
+      cl0_tubes, _ = td.clone(a=add0_tubes['smaller_size_array'])
+      mul0_tubes, mul0_slots = cl0_tubes['a'] * 2
+      cl0_tubes['b'].set_name('output_1')
+
+    compiled = ww.compile()
+    self.assertIs(ww.compile(), compiled)
+
+    funnel_dict = {'Add_0/slots/a': np.array([1, 2])}
+    tap_dict = ww.pour(funnel_dict, key_type='str')
+    compiled_tap_dict = compiled.pour(funnel_dict)
+    self.assertEqual(set(compiled_tap_dict.keys()), set(tap_dict.keys()))
+    for key in tap_dict:
+      th.assert_arrays_equal(self, compiled_tap_dict[key], tap_dict[key])
+
+    forward = ww.pour(funnel_dict, key_type='str', forward_only=True)
+    compiled_forward = compiled.pour_forward(funnel_dict)
+    self.assertEqual(set(compiled_forward.keys()), set(forward.keys()))
+    for key in forward:
+      th.assert_arrays_equal(self, compiled_forward[key], forward[key])
+
+    funnel_dict = ww.pump(tap_dict, key_type='str')
+    compiled_funnel_dict = compiled.pump(tap_dict)
+    self.assertEqual(set(compiled_funnel_dict.keys()), set(funnel_dict.keys()))
+    for key in funnel_dict:
+      th.assert_arrays_equal(self, compiled_funnel_dict[key], funnel_dict[key])
+    th.assert_arrays_equal(self, compiled_funnel_dict['Add_0/slots/a'], np.array([1, 2]))
+
+    # Nothing is left on the slots or tubes.
+    self.assertEqual(add1_tubes['target'].get_val(), None)
+
+    # Changing the waterwork throws away the generated functions.
+    with ww:
+      td.add(a=mul0_tubes['target'], b=1)
+    self.assertIsNot(ww.compile(), compiled)
+    self.assertIn('Add_2/tubes/target', ww.compile().pour({'Add_0/slots/a': np.array([1, 2])}))
+
+  def test_optimize(self):
+    def define(axes):
+      a = np.array([[1.0, 2.0, np.nan, 4.0], [5.0, 6.0, 7.0, 8.0], [9.0, 10.0, 11.0, 12.0], [13.0, 14.0, 15.0, 16.0]])
+      transp, _ = td.transpose(a=a, axes=axes)
+      parts, _ = td.partition(a=transp['target'], indices=[[0, 1], [2, 4]])
+      parts_list, _ = td.iter_list(parts['target'], num_entries=2)
+      trans_back, _ = td.transpose(a=parts_list[0], axes=axes)
+      trans_back['target'].set_name('first')
+      trans_back, _ = td.transpose(a=parts_list[1], axes=axes)
+
+      # Float division with a zero, integer division and broadcasting.
+      shape = [-1] if axes == [1, 0] else [-1, 1]
+      sub0, _ = trans_back['target'] - np.array([1.0, 0.0]).reshape(shape)
+      div0, _ = sub0['target'] / np.array([0.0, 4.0]).reshape(shape)
+      sub1, _ = td.sub(a=np.array([[7, 8], [9, 10]]), b=np.array(1))
+      div1, _ = sub1['target'] / np.array([2, 3])
+
+      cl0, _ = td.clone(a=div0['target'])
+
+    swapped_results = None
+    for axes in [[1, 0], [0, 1]]:
+      results = []
+      for optimize in [False, True]:
+        with wa.Waterwork() as ww:
+          define(axes)
+
+        funnels, taps = sorted(ww.funnels), sorted(ww.taps)
+        if optimize:
+          self.assertEqual(ww.optimize(), 3)
+          self.assertEqual(sorted(ww.funnels), funnels)
+          self.assertEqual(sorted(ww.taps), taps)
+          self.assertEqual(
+            sorted([type(t).__name__ for t in ww.tanks.values()]),
+            ['Clone', 'ColumnPartition', 'SubDiv', 'SubDiv']
+          )
+
+          # The fused tanks can be pickled and saved like any other.
+          column_partition = [t for t in ww.tanks.values() if type(t).__name__ == 'ColumnPartition'][0]
+          self.assertEqual(pickle.loads(pickle.dumps(column_partition)).tube_keys, column_partition.tube_keys)
+          pickle_name = os.path.join(self.temp_dir, 'ww.pickle')
+          ww.save_to_file(pickle_name)
+          self.assertEqual(wa.Waterwork(from_file=pickle_name).tanks[column_partition.name].num_parts, 2)
+
+          # The original tuples still refer to the same funnels and taps.
+          self.assertIs(ww.maybe_get_tube('Div_0', 'missing_vals'), ww.taps['Div_0/tubes/missing_vals'])
+          self.assertIs(ww.maybe_get_slot('Transpose_1', 'axes'), ww.funnels['Transpose_1/slots/axes'])
+          tuple_dict = ww.pour(key_type='tuple')
+          th.assert_arrays_equal(self, tuple_dict[('Sub_1', 'smaller_size_array')], np.array(1))
+          th.assert_arrays_equal(self, ww.pump(tuple_dict, key_type='tuple')[('Transpose_0', 'a')], funnel_dict['Transpose_0/slots/a'])
+
+        tap_dict = ww.pour(key_type='str')
+        funnel_dict = ww.pump(tap_dict, key_type='str')
+        results.append((tap_dict, funnel_dict))
+
+      (tap_dict, funnel_dict), (opt_tap_dict, opt_funnel_dict) = results
+      self.assertEqual(set(opt_tap_dict.keys()), set(tap_dict.keys()))
+      for key in tap_dict:
+        th.assert_arrays_equal(self, opt_tap_dict[key], tap_dict[key])
+        self.assertEqual(np.array(opt_tap_dict[key]).dtype, np.array(tap_dict[key]).dtype)
+
+      self.assertEqual(set(opt_funnel_dict.keys()), set(funnel_dict.keys()))
+      for key in funnel_dict:
+        th.assert_arrays_equal(self, opt_funnel_dict[key], funnel_dict[key])
+
+      # The clone's outputs are read only views rather than copies.
+      self.assertFalse(opt_tap_dict['Clone_0/tubes/a'].flags.writeable)
+      self.assertFalse(opt_tap_dict['Clone_0/tubes/b'].flags.writeable)
+      if axes == [1, 0]:
+        swapped_results = results
+
+    th.assert_arrays_equal(self, swapped_results[1][0]['Div_0/tubes/missing_vals'], np.array([np.nan, 6.0, 10.0, 14.0]))
+    th.assert_arrays_equal(self, swapped_results[1][1]['Transpose_0/slots/a'], np.array([[1.0, 2.0, np.nan, 4.0], [5.0, 6.0, 7.0, 8.0], [9.0, 10.0, 11.0, 12.0], [13.0, 14.0, 15.0, 16.0]]))
+
+  def test_ownership(self):
+    with wa.Waterwork() as ww:
+      rep0, _ = td.replace(a=empty, mask=empty, replace_with=0.0)
+      cl0, _ = td.clone(a=rep0['target'])
+
+    # The tanks never change the arrays passed in by the caller, in either
+    # direction or when compiled.
+    a = np.array([1.0, np.nan, 3.0])
+    mask = np.isnan(a)
+    funnel_dict = {'Replace_0/slots/a': a, 'Replace_0/slots/mask': mask}
+    for pour in [lambda f: ww.pour(f, key_type='str'), ww.compile().pour]:
+      tap_dict = pour(funnel_dict)
+      th.assert_arrays_equal(self, a, np.array([1.0, np.nan, 3.0]))
+      th.assert_arrays_equal(self, tap_dict['Clone_0/tubes/a'], np.array([1.0, 0.0, 3.0]))
+
+      target = tap_dict['Clone_0/tubes/a']
+      self.assertFalse(target.flags.writeable)
+      self.assertTrue(np.may_share_memory(target, tap_dict['Clone_0/tubes/b']))
+
+      tap_dict['Clone_0/tubes/a'] = np.array([1.0, 0.0, 3.0])
+      th.assert_arrays_equal(self, ww.pump(tap_dict, key_type='str')['Replace_0/slots/a'], a)
+      th.assert_arrays_equal(self, tap_dict['Clone_0/tubes/a'], np.array([1.0, 0.0, 3.0]))
+
+    class PassOn(ta.Tank):
+      slot_keys = ['a']
+      tube_keys = ['target']
+
+      def _pour(self, a):
+        return {'target': a[1:]}
+
+      def _pump(self, target):
+        return {'a': np.array(target)}
+
+    # Strict mode catches any tank that shares an array without declaring it.
+    with wa.Waterwork() as ww:
+      PassOn(a=empty)
+    with so.StrictOwnership():
+      self.assertRaises(ValueError, ww.pour, {'PassOn_0/slots/a': np.array([1, 2])}, key_type='str')
+    self.assertFalse(gl._strict_ownership)
+
+    PassOn.alias_keys = {'target': ['a']}
+    with so.StrictOwnership():
+      target = ww.pour({'PassOn_0/slots/a': np.array([1, 2])}, key_type='str')['PassOn_0/tubes/target']
+    th.assert_arrays_equal(self, target, np.array([2]))
+    self.assertFalse(target.flags.writeable)
+
+  def test_retain_ownership(self):
+    with wa.Waterwork() as ww:
+      add0, _ = td.add(a=np.array([1., 2., 3.]), b=np.array([1., 1., 1.]))
+      rep0, _ = td.replace(add0['target'], mask=np.array([True, False, True]), replace_with=np.array([0., 0.]))
+      add1, _ = rep0['target'] + np.array([1., 1., 1.])
+
+    # The values kept on the slots and tubes aren't changed by the tanks that
+    # run after them, in either direction and with or without an executor.
+    thread_pool = futures.ThreadPoolExecutor(max_workers=2)
+    for executor in [None, thread_pool]:
+      tap_dict = ww.pour({}, key_type='str', retain_vals=True, executor=executor)
+      th.assert_arrays_equal(self, ww.tubes['Add_0/tubes/target'].get_val(), np.array([2., 3., 4.]))
+      th.assert_arrays_equal(self, ww.slots['Replace_0/slots/a'].get_val(), np.array([2., 3., 4.]))
+      th.assert_arrays_equal(self, ww.tubes['Replace_0/tubes/target'].get_val(), np.array([0., 3., 0.]))
+
+      ww.pump(tap_dict, key_type='str', retain_vals=True, executor=executor)
+      th.assert_arrays_equal(self, ww.tubes['Replace_0/tubes/target'].get_val(), np.array([0., 3., 0.]))
+      th.assert_arrays_equal(self, ww.slots['Add_1/slots/a'].get_val(), np.array([0., 3., 0.]))
+      th.assert_arrays_equal(self, ww.slots['Replace_0/slots/a'].get_val(), np.array([2., 3., 4.]))
+      th.assert_arrays_equal(self, ww.tubes['Add_0/tubes/target'].get_val(), np.array([2., 3., 4.]))
+    thread_pool.shutdown()
+
+  def test_fold_constants(self):
+    with wa.Waterwork() as ww:
+      add0, _ = td.add(a=np.array([1.0, 2.0]), b=np.array([3.0, 4.0]))
+      mul0, _ = add0['target'] * 2.0
+      add1, _ = td.add(a=empty, b=mul0['target'])
+      add1['target'].set_name('target')
+
+    plan = ww._get_plan()
+    executor = futures.ThreadPoolExecutor(2)
+    for _ in xrange(2):
+      tap_dict = ww.pour({'Add_1/slots/a': np.array([1.0, 1.0])}, key_type='str', executor=executor)
+      th.assert_arrays_equal(self, tap_dict['target'], np.array([9.0, 13.0]))
+      th.assert_arrays_equal(self, tap_dict['Add_0/tubes/smaller_size_array'], np.array([3.0, 4.0]))
+      funnel_dict = ww.pump(tap_dict, key_type='str')
+      th.assert_arrays_equal(self, funnel_dict['Add_0/slots/a'], np.array([1.0, 2.0]))
+      th.assert_arrays_equal(self, funnel_dict['Add_1/slots/a'], np.array([1.0, 1.0]))
+
+    # Only the Add and Mul tanks that don't depend on the input are folded.
+    self.assertEqual(plan.folds.keys(), [('pour', frozenset([0, 1]))])
+    fold = plan.folds.values()[0]
+    self.assertEqual([t.name for t, _, _, _ in fold.steps], ['Add_1'])
+
+    # Passing in a constant skips the fold and changing a constant redoes it.
+    tap_dict = ww.pour({'Add_1/slots/a': np.array([1.0, 1.0]), 'Add_0/slots/a': np.array([0.0, 0.0])}, key_type='str')
+    th.assert_arrays_equal(self, tap_dict['target'], np.array([7.0, 9.0]))
+    ww.funnels['Add_0/slots/a'].set_val(np.array([10.0, 10.0]))
+    tap_dict = ww.pour({'Add_1/slots/a': np.array([1.0, 1.0])}, key_type='str')
+    th.assert_arrays_equal(self, tap_dict['target'], np.array([27.0, 29.0]))
+    self.assertIsNot(plan.folds.values()[0], fold)
+
+    # Turning folding off, or retaining the values, runs every tank.
+    ww.fold_constants = False
+    th.assert_arrays_equal(self, ww.pour({'Add_1/slots/a': np.array([1.0, 1.0])}, key_type='str')['target'], np.array([27.0, 29.0]))
+    ww.fold_constants = True
+    ww.pour({'Add_1/slots/a': np.array([1.0, 1.0])}, retain_vals=True)
+    th.assert_arrays_equal(self, mul0['target'].get_val(), np.array([26.0, 28.0]))
+
+  def test_construction(self):
+    with wa.Waterwork(eager=False) as ww:
+      tubes, slots = td.add(a=np.array([1, 2]), b=np.array([3, 4]))
+      for _ in xrange(5):
+        tubes, _ = tubes['target'] + 1
+
+    # Nothing is run while the waterwork is being built.
+    self.assertEqual(tubes['target'].get_val(), None)
+    self.assertEqual(sorted(ww.tanks), ['Add_' + str(i) for i in xrange(6)])
+
+    tap_dict = ww.pour(key_type='str')
+    th.assert_arrays_equal(self, tap_dict['Add_5/tubes/target'], np.array([9, 11]))
+
+    # Slots and tubes don't have a __dict__ but can still be pickled.
+    self.assertFalse(hasattr(slots['a'], '__dict__'))
+    self.assertFalse(hasattr(tubes['target'], '__dict__'))
+    ww.compile()
+    ww_copy = pickle.loads(pickle.dumps(ww))
+    th.assert_arrays_equal(self, ww_copy.pour(key_type='str')['Add_5/tubes/target'], np.array([9, 11]))
+
 
 if __name__ == "__main__":
     unittest.main()
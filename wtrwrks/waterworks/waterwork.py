@@ -1,16 +1,27 @@
 import wtrwrks.waterworks.globs as gl
 import wtrwrks.waterworks.waterwork_part as wp
 import wtrwrks.waterworks.name_space as ns
+import wtrwrks.waterworks.plan as pl
+import wtrwrks.waterworks.codegen as cg
+import wtrwrks.waterworks.optimize as op
+import wtrwrks.tanks.utils as ut
 import wtrwrks.utils.dir_functions as d
 from wtrwrks.waterworks.empty import empty
 import wtrwrks.read_write.tf_features as feat
 import os
+import gc
 import pprint
 import importlib
 import dill as pickle
 import tensorflow as tf
 import numpy as np
 
+
+class ForwardOutputs(dict):
+  """The outputs of a forward only pour. Behaves exactly like a dict, but since the side channels needed to run the transformation backwards were never calculated, it is rejected by pump."""
+  pass
+
+
 class Waterwork(object):
   """The full graph of tanks (i.e. operations) on the data, along with all slots and tubes which define the inputs/outputs of operations and hold their values. Can be thought of as a larger reversible operation that are composed of many smaller reversible operations.
 
@@ -41,9 +52,34 @@ class Waterwork(object):
     values - Tube objects.
   )
     All of the tanks (or operations) defined within the waterwork.
+  plan : Plan or None
+    The compiled order and routing of the tanks. Built the first time the waterwork is poured or pumped and thrown away whenever the graph changes.
+  compiled : CompiledWaterwork or None
+    The generated pour and pump functions. Built by compile and thrown away along with the plan.
+  eager : bool
+    Whether or not tanks are run as they are added to the waterwork when all their inputs are known. Turning it off makes building very large waterworks much faster.
+  default_name_counts : dict(
+    keys - strs. The default names of tanks, without the number at the end.
+    values - ints. The next number to try.
+  )
+    Used to quickly find an unused default name when a tank is added.
+  slot_aliases : dict(
+    keys - (tank name, slot key) tuples of slots whose tanks were replaced by optimize.
+    values - strs. The names of the slots that replaced them.
+  )
+    Lets slots still be referred to by their original tuples after the waterwork is optimized.
+  tube_aliases : dict(
+    keys - (tank name, tube key) tuples of tubes whose tanks were replaced by optimize.
+    values - strs. The names of the tubes that replaced them.
+  )
+    Lets tubes still be referred to by their original tuples after the waterwork is optimized.
+  retain_vals : bool
+    Whether or not pour and pump should leave the values they calculate on the slots and tubes so they can be inspected with get_val. By default values only live in a per call execution context, which is what allows several threads to pour/pump through the same waterwork at once. Only meant for debugging.
+  fold_constants : bool
+    Whether or not pour and pump should constant fold the tanks which only depend on funnels (or taps) that are left to the values they were given when the waterwork was defined. The outputs of those tanks are calculated once and reused until the graph or any of those values change. Plugged funnels and taps are never folded, since the plug can depend on the other inputs.
   """
 
-  def __init__(self, name='', from_file=None):
+  def __init__(self, name='', from_file=None, retain_vals=False, eager=True, fold_constants=True):
     """Initialize the waterwork to have empty funnels, slots, tanks, and taps."""
     self.funnels = {}
     self.tubes = {}
@@ -51,6 +87,14 @@ class Waterwork(object):
     self.tanks = {}
     self.taps = {}
     self.name = name
+    self.plan = None
+    self.compiled = None
+    self.retain_vals = retain_vals
+    self.eager = eager
+    self.fold_constants = fold_constants
+    self.default_name_counts = {}
+    self.slot_aliases = {}
+    self.tube_aliases = {}
 
     if from_file is not None:
       save_dict = d.read_from_file(from_file)
@@ -73,6 +117,14 @@ class Waterwork(object):
     gl._default_waterwork = None
     self.name_space.__exit__(exc_type, exc_val, exc_tb)
 
+  def __getstate__(self):
+    """Leave out the plan and the generated functions when pickling. They are rebuilt when needed."""
+    state = {}
+    state.update(self.__dict__)
+    state['plan'] = None
+    state['compiled'] = None
+    return state
+
   def _from_save_dict(self, save_dict):
     with ns.NameSpace(''):
       self.name = save_dict['name']
@@ -81,7 +133,7 @@ class Waterwork(object):
         mod = importlib.import_module(tank_dict['__module__'])
         cls = getattr(mod, tank_dict['__class__'])
 
-        tank = cls(name=tank_name, waterwork=self)
+        tank = cls(name=tank_name, waterwork=self, **tank_dict.get('init_kwargs', {}))
         self.tanks[tank_name] = tank
 
       for slot_name in save_dict['slots']:
@@ -128,6 +180,37 @@ class Waterwork(object):
       for tap_name in save_dict['taps']:
         self.taps[tap_name] = self.tubes[tap_name]
 
+      self.slot_aliases = dict(save_dict.get('slot_aliases', []))
+      self.tube_aliases = dict(save_dict.get('tube_aliases', []))
+
+    self._invalidate_plan()
+
+  def _get_plan(self):
+    """Get the compiled plan of the waterwork, building it if the graph has changed since it was last built.
+
+    Returns
+    -------
+    Plan
+      The order and routing of the tanks for the current graph.
+
+    """
+    if self.plan is None:
+      # Building the plan creates a lot of objects but no garbage, so pause the
+      # garbage collector rather than have it repeatedly scan the whole graph.
+      gc_enabled = gc.isenabled()
+      gc.disable()
+      try:
+        self.plan = pl.Plan(self)
+      finally:
+        if gc_enabled:
+          gc.enable()
+    return self.plan
+
+  def _invalidate_plan(self):
+    """Throw away the compiled plan. Must be called whenever a tank, slot or tube is added, renamed, (un)plugged or reconnected."""
+    self.plan = None
+    self.compiled = None
+
   def _pour_tank_order(self):
     """Get the order to calculate the tanks in the pour direction.
 
@@ -137,25 +220,7 @@ class Waterwork(object):
         The tanks ordered in such a way that they are guaranteed to have all the information to perform the operation.
 
     """
-    tanks = sorted([self.tanks[t] for t in self.tanks if not self.tanks[t].get_slot_tanks()])
-    visited = set(tanks)
-    sorted_tanks = []
-
-    while tanks:
-      tank = tanks.pop(0)
-      sorted_tanks.append(tank)
-
-      child_tanks = tank.get_tube_tanks() - visited
-      for child_tank in child_tanks:
-        # If there are any tanks child_tank depnends on , that haven't been
-        # visited, then continue.
-        if child_tank.get_slot_tanks() - visited:
-          continue
-
-        tanks.append(child_tank)
-        visited.add(child_tank)
-
-    return sorted_tanks
+    return list(self._get_plan().pour_order)
 
   def _pump_tank_order(self):
     """Get the order to calculate the tanks in the pump direction.
@@ -166,32 +231,15 @@ class Waterwork(object):
         The tanks ordered in such a way that they are guaranteed to have all the information to perform the operation.
 
     """
-    tanks = sorted([self.tanks[t] for t in self.tanks if not self.tanks[t].get_tube_tanks()])
-    visited = set(tanks)
-    sorted_tanks = []
-
-    while tanks:
-      tank = tanks.pop(0)
-      sorted_tanks.append(tank)
-
-      child_tanks = tank.get_slot_tanks() - visited
-      for child_tank in child_tanks:
-        # If there are any tanks child_tank depnends on , that haven't been
-        # visited, then continue.
-        if child_tank.get_tube_tanks() - visited:
-          continue
-
-        tanks.append(child_tank)
-        visited.add(child_tank)
-    # tanks = sorted([self.tanks[t] for t in self.tanks])
-    # return sorted(tanks, cmp=lambda a, b: 0 if b in a.get_pump_dependencies() else -1)
-    return sorted_tanks
+    return list(self._get_plan().pump_order)
 
   def _save_dict(self):
     save_dict = {}
     save_dict['name'] = self.name
     save_dict['funnels'] = sorted(self.funnels.keys())
     save_dict['taps'] = sorted(self.taps.keys())
+    save_dict['slot_aliases'] = sorted(self.slot_aliases.items())
+    save_dict['tube_aliases'] = sorted(self.tube_aliases.items())
 
     save_dict['tanks'] = {}
     save_dict['slots'] = {}
@@ -211,6 +259,28 @@ class Waterwork(object):
 
     return save_dict
 
+  def _lookup(self, lookup, key, fallback):
+    """Find the funnel or tap referred to by a key of a funnel_dict or tap_dict using the plan's lookup tables, falling back to a full search for keys of other forms.
+
+    Parameters
+    ----------
+    lookup : dict
+      The plan's funnel_lookup or tap_lookup.
+    key : Slot, Tube, str or tuple
+      The key from the funnel_dict or tap_dict.
+    fallback : function
+      Either maybe_get_slot or maybe_get_tube.
+
+    Returns
+    -------
+    Slot, Tube or None
+      The part the key refers to, or None if it couldn't be found.
+
+    """
+    if type(key) in (str, unicode, tuple) and key in lookup:
+      return lookup[key]
+    return fallback(key)
+
   def maybe_get_slot(self, *args):
     """Get a particular tank's if it exists, otherwise return None. Can take a variety input types.
 
@@ -240,6 +310,10 @@ class Waterwork(object):
     else:
       return None
 
+    # The tank may have been replaced when the waterwork was optimized.
+    if (tank, key) in self.slot_aliases:
+      return self.slots[self.slot_aliases[(tank, key)]]
+
     # Pull out the relevant tank object.
     if type(tank) in (str, unicode) and tank in self.tanks:
       tank = self.tanks[tank]
@@ -283,6 +357,10 @@ class Waterwork(object):
     else:
       return None
 
+    # The tank may have been replaced when the waterwork was optimized.
+    if (tank, key) in self.tube_aliases:
+      return self.tubes[self.tube_aliases[(tank, key)]]
+
     # Pull out the relevant tank object.
     if type(tank) in (str, unicode) and tank in self.tanks:
       tank = self.tanks[tank]
@@ -297,6 +375,30 @@ class Waterwork(object):
 
     return None
 
+  def compile(self):
+    """Generate plain python pour and pump functions for the waterwork. They skip all the input validation and bookkeeping of pour and pump and just call each tank's _pour or _pump in order, so they are the fastest way to run the waterwork on small inputs.
+
+    Returns
+    -------
+    CompiledWaterwork
+      Holds the pour, pump and pour_forward functions. Each takes a dictionary keyed by the names of the funnels (taps for pump) and returns a dictionary keyed by the names of the taps (funnels for pump). Rebuilt whenever the waterwork changes.
+
+    """
+    if self.compiled is None:
+      self.compiled = cg.CompiledWaterwork(self._get_plan())
+    return self.compiled
+
+  def optimize(self):
+    """Rewrite the waterwork so that it does the same thing with fewer copies of the data, by fusing groups of tanks into single tanks (e.g. a Sub followed by a Div becomes a SubDiv). The funnels and taps keep their names, so it is poured and pumped exactly as before.
+
+    Returns
+    -------
+    int
+      The number of rewrites made.
+
+    """
+    return op.optimize(self)
+
   def get_slot(self, tank, key):
     """Get a particular tank's slot.
 
@@ -339,7 +441,7 @@ class Waterwork(object):
 
     return self.tanks[tank.name].tubes[key]
 
-  def pour(self, funnel_dict=None, key_type='tube', return_plugged=False):
+  def pour(self, funnel_dict=None, key_type='tube', return_plugged=False, retain_vals=None, executor=None, forward_only=False, taps=None):
     """Run all the operations of the waterwork in the pour (or forward) direction.
 
     Parameters
@@ -348,9 +450,17 @@ class Waterwork(object):
       keys - Slot objects or Placeholder objects. The 'funnels' (i.e. unconnected slots) of the waterwork.
       values - valid input data types
     )
-        The inputs to the waterwork's full pour function.
+        The inputs to the waterwork's full pour function. Funnels that are left out use the value they were given when the waterwork was defined, if any.
     key_type : str ('tube', 'tuple', 'name')
       The type of keys to return in the return dictionary. Can either be the tube objects themselves (tube), the tank, output key pair (tuple) or the name (str) of the tube.
+    retain_vals : bool or None
+      Whether or not to leave the calculated values on the slots and tubes. Defaults to the waterwork's retain_vals attribute.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the tanks on. Tanks are submitted as soon as all the tanks they depend on have finished, so independent branches run at the same time. If None, the tanks are run one after the other.
+    forward_only : bool
+      Whether or not to skip the taps that are side channels of their tanks (see Tank.side_channel_keys), i.e. the information only needed to run the pump. Tanks which only feed side channels are not run at all. The result is a ForwardOutputs dict which cannot be pumped.
+    taps : list of Tubes, strs or tuples, or None
+      If given, only calculate these taps. Tanks which aren't needed for any of them are not run at all, and the rest skip their side channels unless they're needed. The result is a ForwardOutputs dict which cannot be pumped.
 
     Returns
     -------
@@ -362,63 +472,88 @@ class Waterwork(object):
     """
     if funnel_dict is None:
       funnel_dict = {}
+    if retain_vals is None:
+      retain_vals = self.retain_vals
+
+    plan = self._get_plan()
+    context = plan.new_context()
 
     # Set all the values of the funnels from the inputted arguments.
     stand_funnel_dict = {}
     for ph, val in funnel_dict.iteritems():
-      sl_obj = self.maybe_get_slot(ph)
+      sl_obj = self._lookup(plan.funnel_lookup, ph, self.maybe_get_slot)
       if sl_obj is not None:
         if sl_obj.plug is not None:
           raise ValueError(str(sl_obj) + ' has a plug. Cannot set the value of a funnel with a plug.')
 
         stand_funnel_dict[sl_obj.name] = val
-        sl_obj.set_val(val)
-        if sl_obj.tube is not empty:
-          sl_obj.tube.set_val(val)
+        context[plan.slot_registers[sl_obj.name]] = val
       else:
         raise ValueError(str(ph) + ' is not a supported input into pour function')
 
     # Check that all funnels have a value
-    for funnel_key in self.funnels:
-      funnel = self.funnels[funnel_key]
+    defaults = {}
+    for funnel, register in plan.funnels:
       if funnel.plug is not None:
-        funnel.set_val(funnel.plug(stand_funnel_dict))
-      elif funnel.get_val() is None:
-        raise ValueError("All funnels must have a set value. " + str(funnel) + " is not set.")
+        context[register] = funnel.plug(stand_funnel_dict)
+      elif funnel.name not in stand_funnel_dict:
+        context[register] = funnel.get_val()
+        defaults[register] = context[register]
 
-    # Run all the tanks (operations) in the pour direction, filling all slots'
-    # and tubes' val attributes as you go.
-    tanks = self._pour_tank_order()
-    for tank in tanks:
-      kwargs = {k: tank.slots[k].get_val() for k in tank.slots}
-      tube_dict = tank.pour(**kwargs)
-
-      for key in tube_dict:
-        slot = tank.tubes[key].slot
-
-        if slot is not empty:
-          slot.set_val(tube_dict[key])
+      if context[register] is None:
+        raise ValueError("All funnels must have a set value. " + str(funnel) + " is not set.")
+      # The values belong to the caller, so only let the tanks read them.
+      context[register] = ut.read_only(context[register])
+
+    # Run all the tanks (operations) in the pour direction, filling the
+    # context as you go. Unless the values are being retained, everything but
+    # the taps is dropped as soon as the last tank that needs it has run.
+    # Any tanks which only depend on the funnels' own values are constant
+    # folded.
+    if not self.fold_constants:
+      defaults = None
+    selection = None
+    if taps is not None:
+      selected = []
+      for key in taps:
+        tap = self._lookup(plan.tap_lookup, key, self.maybe_get_tube)
+        if tap is None or tap.name not in self.taps:
+          raise ValueError(str(key) + ' is not a tap of the waterwork.')
+        selected.append((tap, plan.tube_registers[tap.name]))
+      selection = plan.select(selected)
+
+    plan.run_pour(context, executor, release=not retain_vals, forward_only=forward_only, defaults=defaults, selection=selection)
+
+    if retain_vals:
+      plan.retain(context)
 
     # Create the dictionary to return
-    r_dict = {}
-    for tap_name in self.taps:
-      tap = self.taps[tap_name]
+    if selection is not None:
+      r_dict = ForwardOutputs()
+      taps = selected
+    elif forward_only:
+      r_dict = ForwardOutputs()
+      taps = plan.forward_taps
+    else:
+      r_dict = {}
+      taps = plan.taps
 
+    for tap, register in taps:
       if tap.plug is not None and not return_plugged:
         continue
 
       if key_type == 'tube':
-        r_dict[tap] = tap.get_val()
+        r_dict[tap] = context[register]
       elif key_type == 'tuple':
-        r_dict[tap.get_tuple()] = tap.get_val()
+        r_dict[plan.tap_tuples[tap.name]] = context[register]
       elif key_type == 'str':
-        r_dict[tap.name] = tap.get_val()
+        r_dict[tap.name] = context[register]
       else:
         raise ValueError(str(key_type) + " is an invalid key_type.")
 
     return r_dict
 
-  def pump(self, tap_dict=None, key_type='slot', return_plugged=False):
+  def pump(self, tap_dict=None, key_type='slot', return_plugged=False, retain_vals=None, executor=None):
     """Run all the operations of the waterwork in the pump (or backward) direction.
 
     Parameters
@@ -426,9 +561,13 @@ class Waterwork(object):
     funnel_dict : dict(
       keys - Tube objects. The 'taps' (i.e. unconnected tubes) of the waterwork.
     )
-        The inputs of the waterwork's full pump function
+        The inputs of the waterwork's full pump function. Taps that are left out use the value left on the tube, if any.
     key_type : str ('tube', 'tuple', 'name')
       The type of keys to return in the return dictionary. Can either be the tube objects themselves (tube), the tank, output key pair (tuple) or the name (str) of the tube.
+    retain_vals : bool or None
+      Whether or not to leave the calculated values on the slots and tubes. Defaults to the waterwork's retain_vals attribute.
+    executor : concurrent.futures.Executor or None
+      A thread or process pool to run the tanks on. Tanks are submitted as soon as all the tanks they depend on have finished, so independent branches run at the same time. If None, the tanks are run one after the other.
 
     Returns
     -------
@@ -441,55 +580,63 @@ class Waterwork(object):
     """
     if tap_dict is None:
       tap_dict = {}
+    if isinstance(tap_dict, ForwardOutputs):
+      raise ValueError("Cannot pump the outputs of a forward only pour, the side channels needed to undo it were never calculated.")
+    if retain_vals is None:
+      retain_vals = self.retain_vals
+
+    plan = self._get_plan()
+    context = plan.new_context()
 
     stand_tap_dict = {}
     # Set all the values of the taps from the inputted arguments.
     for tap, val in tap_dict.iteritems():
-      tu_obj = self.maybe_get_tube(tap)
+      tu_obj = self._lookup(plan.tap_lookup, tap, self.maybe_get_tube)
       if tu_obj is not None:
         if tu_obj.plug is not None:
           raise ValueError(str(tu_obj) + ' has a plug. Cannot set the value of a funnel with a plug.')
 
         stand_tap_dict[tu_obj.name] = val
-        tu_obj.set_val(val)
+        context[plan.tube_registers[tu_obj.name]] = val
       else:
         raise ValueError(str(tap) + ' is not a supported form of input into pump function')
 
     # Check that all funnels have a value
-    for tap_key in self.taps:
-      tap = self.taps[tap_key]
+    defaults = {}
+    for tap, register in plan.taps:
       if tap.plug is not None:
-        tap.set_val(tap.plug(stand_tap_dict))
-      elif tap.get_val() is None:
-        raise ValueError("All taps must have a set value. " + str(tap) + " is not set.")
+        context[register] = tap.plug(stand_tap_dict)
+      elif tap.name not in stand_tap_dict:
+        context[register] = tap.get_val()
+        defaults[register] = context[register]
 
-    # Run all the tanks (operations) in the pump direction, filling all slots'
-    # and tubes' val attributes as you go.
-    tanks = self._pump_tank_order()
-    for tank in tanks:
-      kwargs = {k: tank.tubes[k].get_val() for k in tank.tubes}
-      slot_dict = tank.pump(**kwargs)
+      if context[register] is None:
+        raise ValueError("All taps must have a set value. " + str(tap) + " is not set.")
+      # The values belong to the caller, so only let the tanks read them.
+      context[register] = ut.read_only(context[register])
 
-      for key in slot_dict:
-        tube = tank.slots[key].tube
+    # Run all the tanks (operations) in the pump direction, filling the
+    # context as you go. Unless the values are being retained, everything but
+    # the funnels is dropped as soon as the last tank that needs it has run.
+    if not self.fold_constants:
+      defaults = None
+    plan.run_pump(context, executor, release=not retain_vals, defaults=defaults)
 
-        if tube is not empty:
-          tube.set_val(slot_dict[key])
+    if retain_vals:
+      plan.retain(context)
 
     # Create the dictionary to return
     r_dict = {}
-    for funnel_name in self.funnels:
-      funnel = self.funnels[funnel_name]
-
+    for funnel, register in plan.funnels:
       if funnel.plug is not None and not return_plugged:
         continue
 
       if key_type == 'slot':
-        r_dict[funnel] = funnel.get_val()
+        r_dict[funnel] = context[register]
       elif key_type == 'tuple':
-        r_dict[funnel.get_tuple()] = funnel.get_val()
+        r_dict[plan.funnel_tuples[funnel.name]] = context[register]
       elif key_type == 'str':
-        r_dict[funnel.name] = funnel.get_val()
+        r_dict[funnel.name] = context[register]
       else:
         raise ValueError(str(key_type) + " is an invalid key_type.")
 
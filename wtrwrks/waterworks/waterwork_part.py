@@ -15,6 +15,10 @@ class WaterworkPart(object):
 
   """
 
+  # Waterworks can have hundreds of thousands of parts, so they're stored
+  # without a __dict__.
+  __slots__ = ['waterwork', 'name_space', 'name']
+
   def __init__(self, waterwork, name):
     """Define a WaterworkPart, assign it to a Waterwork and set its name within the Waterwork.
 
@@ -44,8 +48,25 @@ class WaterworkPart(object):
       )
     elif type(name) not in (str, unicode):
       raise TypeError("'name' must be of type str or unicode. Got " + str(type(name)))
-    elif not self.name.startswith(self.name_space._get_name_string()):
-      self.name = os.path.join(self.name_space._get_name_string(), self.name)
+    else:
+      name_string = self.name_space._get_name_string()
+      if not self.name.startswith(name_string):
+        self.name = os.path.join(name_string, self.name)
+
+  def __getstate__(self):
+    """Get all the attributes of the part, so that it can be pickled even though it doesn't have a __dict__."""
+    state = {}
+    for cls in type(self).__mro__:
+      for key in getattr(cls, '__slots__', []):
+        if hasattr(self, key):
+          state[key] = getattr(self, key)
+    state.update(getattr(self, '__dict__', {}))
+    return state
+
+  def __setstate__(self, state):
+    """Set all the attributes of the part when unpickling."""
+    for key in state:
+      setattr(self, key, state[key])
 
   def _get_default_name(self):
     """Set a default name. Must be defined by subclass."""